@@ -1 +1,4 @@
 from .dynamodb.backend import DynamodbBackend
+from .memory.backend import InMemoryBackend
+from .sqlite.backend import SqliteBackend
+from .caching import CachingBackend
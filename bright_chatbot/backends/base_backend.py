@@ -1,11 +1,126 @@
 import abc
-from typing import List, Union
+from concurrent.futures import Executor
+from datetime import datetime
+import inspect
+from typing import Callable, Iterable, List, Union
 
-from bright_chatbot.models import User, UserSession, MessagePrompt, MessageResponse
+from bright_chatbot.models import (
+    User,
+    UserSession,
+    MessagePrompt,
+    MessageResponse,
+    SessionSummary,
+)
 from bright_chatbot.configs import settings
+from bright_chatbot.utils.aio import run_in_executor
+
+
+def messages_since(
+    messages: Iterable[Union[MessagePrompt, MessageResponse]], since: datetime
+) -> List[Union[MessagePrompt, MessageResponse]]:
+    """
+    Returns the messages created after `since`.
+    """
+    # The timestamps read from the backends may be timezone aware or not:
+    since = since.timestamp()
+    return [m for m in messages if m.created_at.timestamp() > since]
+
+
+def message_key(message: Union[MessagePrompt, MessageResponse]) -> tuple:
+    """
+    Returns the key that identifies a message among the messages of a session.
+    """
+    # The messages read from the backend do not compare equal to the original
+    # ones (e.g. their timestamps are timezone aware), so match on the content:
+    return (type(message), message.body, round(message.created_at.timestamp(), 3))
+
+
+def newest_messages(
+    messages: Iterable[Union[MessagePrompt, MessageResponse]],
+    max_messages: int = None,
+    max_characters: int = None,
+) -> List[Union[MessagePrompt, MessageResponse]]:
+    """
+    Returns the newest messages, in the order they were created,
+    up to `max_messages` messages and `max_characters` characters in total.
+
+    The messages must be given newest first, they are only consumed
+    until one of the limits is reached.
+    """
+    selected = []
+    if max_messages is not None and max_messages <= 0:
+        return selected
+    characters = 0
+    for message in messages:
+        characters += len(message.body)
+        if max_characters is not None and characters > max_characters:
+            break
+        selected.append(message)
+        # Stop before the next message, it may need another read:
+        if max_messages is not None and len(selected) >= max_messages:
+            break
+    selected.reverse()
+    return selected
+
+
+def takes_history_limits(get_history: Callable) -> bool:
+    """
+    Whether a `get_session_chat_history` method takes the `max_messages` and
+    `max_characters` limits, the backends written before them only take the session.
+    """
+    try:
+        parameters = inspect.signature(get_history).parameters
+    except (TypeError, ValueError):
+        return True
+    if any(p.kind == p.VAR_KEYWORD for p in parameters.values()):
+        return True
+    return "max_messages" in parameters and "max_characters" in parameters
+
+
+def read_chat_history(
+    backend: "BaseDataBackend",
+    session: UserSession,
+    max_messages: int = None,
+    max_characters: int = None,
+) -> List[Union[MessagePrompt, MessageResponse]]:
+    """
+    Reads the chat history of a session from a backend, only passing
+    the limits that are set. If the backend does not take them,
+    the newest messages are selected from the whole chat history.
+    """
+    if max_messages is None and max_characters is None:
+        return backend.get_session_chat_history(session)
+    if takes_history_limits(backend.get_session_chat_history):
+        return backend.get_session_chat_history(
+            session, max_messages=max_messages, max_characters=max_characters
+        )
+    messages = backend.get_session_chat_history(session)
+    return newest_messages(reversed(messages), max_messages, max_characters)
+
+
+async def aread_chat_history(
+    backend: "AsyncBaseDataBackend",
+    session: UserSession,
+    max_messages: int = None,
+    max_characters: int = None,
+) -> List[Union[MessagePrompt, MessageResponse]]:
+    """
+    Asynchronous version of `read_chat_history` for an asynchronous backend.
+    """
+    if max_messages is None and max_characters is None:
+        return await backend.get_session_chat_history(session)
+    if takes_history_limits(backend.get_session_chat_history):
+        return await backend.get_session_chat_history(
+            session, max_messages=max_messages, max_characters=max_characters
+        )
+    messages = await backend.get_session_chat_history(session)
+    return newest_messages(reversed(messages), max_messages, max_characters)
 
 
 class BaseDataBackend(abc.ABC):
+    stores_session_summaries: bool = False
+    """ Whether the backend stores the summaries of the sessions. """
+
     @abc.abstractmethod
     def get_latest_user_session(self, user: User) -> Union[UserSession, None]:
         """
@@ -54,13 +169,33 @@ class BaseDataBackend(abc.ABC):
 
     @abc.abstractmethod
     def get_session_chat_history(
-        self, session: UserSession
+        self,
+        session: UserSession,
+        max_messages: int = None,
+        max_characters: int = None,
     ) -> List[Union[MessagePrompt, MessageResponse]]:
         """
         Returns the chat history of a session.
+
+        If `max_messages` or `max_characters` are given, only the newest messages
+        are returned, up to that number of messages and of characters in total.
+        Backends that only take the `session` are still supported,
+        the limits are then applied to the whole history (see `read_chat_history`).
         """
         raise NotImplementedError()
 
+    def get_session_chat_history_since(
+        self, session: UserSession, since: datetime
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        """
+        Returns the messages of a session created after `since`,
+        e.g. to bring up to date a chat history read before.
+
+        Filters the whole chat history by default, backends that can query
+        the messages by their creation time should override it.
+        """
+        return messages_since(self.get_session_chat_history(session), since)
+
     @abc.abstractmethod
     def save_message_prompt(
         self, prompt: MessagePrompt, user_session: UserSession
@@ -78,3 +213,249 @@ class BaseDataBackend(abc.ABC):
         Saves a message response to the database.
         """
         raise NotImplementedError()
+
+    def save_messages(
+        self,
+        messages: Iterable[Union[MessagePrompt, MessageResponse]],
+        user_session: UserSession,
+    ) -> None:
+        """
+        Saves several messages of a session, e.g. a prompt and its response.
+
+        Saves them one by one by default, backends that can write them
+        together (e.g. in a single transaction) should override it.
+        """
+        for message in messages:
+            if isinstance(message, MessagePrompt):
+                self.save_message_prompt(message, user_session)
+            else:
+                self.save_message_response(message, user_session)
+
+    def save_session_summary(
+        self, user_session: UserSession, summary: SessionSummary
+    ) -> None:
+        """
+        Saves the summary of a session, unless it already has a summary
+        of newer messages. Only backends that store the summaries
+        of the sessions implement it.
+        """
+        raise NotImplementedError()
+
+
+class AsyncBaseDataBackend(abc.ABC):
+    """
+    Asynchronous counterpart of `BaseDataBackend`.
+
+    All the methods are coroutines so that a backend with a native
+    asynchronous driver can be awaited from the event loop without
+    blocking it.
+    """
+
+    stores_session_summaries: bool = False
+    """ Whether the backend stores the summaries of the sessions. """
+
+    @abc.abstractmethod
+    async def get_latest_user_session(self, user: User) -> Union[UserSession, None]:
+        """
+        Returns the latest active session of an user.
+        Returns None if the user has no active sessions.
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def create_user_session(
+        self, user: User, sess_quota: int = settings.MAX_REQUESTS_PER_SESSION
+    ) -> UserSession:
+        """
+        Creates a new session for an user.
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def end_user_session(self, user: User) -> None:
+        """
+        Forcefully ends a user's latest session.
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def does_user_exist(self, user: User) -> bool:
+        """
+        Checks if a user exists in the database.
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def get_count_of_active_sessions(self) -> int:
+        """
+        Returns the total number of active sessions
+        across all users.
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def get_count_of_session_prompts(self, session: UserSession) -> int:
+        """
+        Returns the number of prompts that the user has sent in the current session.
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def get_session_chat_history(
+        self,
+        session: UserSession,
+        max_messages: int = None,
+        max_characters: int = None,
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        """
+        Returns the chat history of a session.
+
+        If `max_messages` or `max_characters` are given, only the newest messages
+        are returned, up to that number of messages and of characters in total.
+        Backends that only take the `session` are still supported,
+        the limits are then applied to the whole history (see `aread_chat_history`).
+        """
+        raise NotImplementedError()
+
+    async def get_session_chat_history_since(
+        self, session: UserSession, since: datetime
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        """
+        Returns the messages of a session created after `since`,
+        e.g. to bring up to date a chat history read before.
+
+        Filters the whole chat history by default, backends that can query
+        the messages by their creation time should override it.
+        """
+        return messages_since(await self.get_session_chat_history(session), since)
+
+    @abc.abstractmethod
+    async def save_message_prompt(
+        self, prompt: MessagePrompt, user_session: UserSession
+    ) -> None:
+        """
+        Saves a message prompt to the database.
+        """
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def save_message_response(
+        self, response: MessageResponse, user_session: UserSession
+    ) -> None:
+        """
+        Saves a message response to the database.
+        """
+        raise NotImplementedError()
+
+    async def save_messages(
+        self,
+        messages: Iterable[Union[MessagePrompt, MessageResponse]],
+        user_session: UserSession,
+    ) -> None:
+        """
+        Saves several messages of a session, e.g. a prompt and its response.
+
+        Saves them one by one by default, backends that can write them
+        together (e.g. in a single transaction) should override it.
+        """
+        for message in messages:
+            if isinstance(message, MessagePrompt):
+                await self.save_message_prompt(message, user_session)
+            else:
+                await self.save_message_response(message, user_session)
+
+    async def save_session_summary(
+        self, user_session: UserSession, summary: SessionSummary
+    ) -> None:
+        """
+        Saves the summary of a session, unless it already has a summary
+        of newer messages. Only backends that store the summaries
+        of the sessions implement it.
+        """
+        raise NotImplementedError()
+
+
+class AsyncBackendAdapter(AsyncBaseDataBackend):
+    """
+    Exposes a synchronous backend through the asynchronous interface
+    by running its blocking calls in an executor.
+
+    If no executor is given, the default executor of the running loop is used.
+    """
+
+    def __init__(self, backend: BaseDataBackend, executor: Executor = None):
+        self._backend = backend
+        self._executor = executor
+
+    @property
+    def backend(self) -> BaseDataBackend:
+        """
+        Synchronous backend wrapped by the adapter.
+        """
+        return self._backend
+
+    @property
+    def stores_session_summaries(self) -> bool:
+        return self.backend.stores_session_summaries
+
+    async def _run(self, func, *args, **kwargs):
+        return await run_in_executor(self._executor, func, *args, **kwargs)
+
+    async def get_latest_user_session(self, user: User) -> Union[UserSession, None]:
+        return await self._run(self.backend.get_latest_user_session, user)
+
+    async def create_user_session(self, user: User, **kwargs) -> UserSession:
+        return await self._run(self.backend.create_user_session, user, **kwargs)
+
+    async def end_user_session(self, user: User) -> None:
+        return await self._run(self.backend.end_user_session, user)
+
+    async def does_user_exist(self, user: User) -> bool:
+        return await self._run(self.backend.does_user_exist, user)
+
+    async def get_count_of_active_sessions(self) -> int:
+        return await self._run(self.backend.get_count_of_active_sessions)
+
+    async def get_count_of_session_prompts(self, session: UserSession) -> int:
+        return await self._run(self.backend.get_count_of_session_prompts, session)
+
+    async def get_session_chat_history(
+        self,
+        session: UserSession,
+        max_messages: int = None,
+        max_characters: int = None,
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        return await self._run(
+            read_chat_history, self.backend, session, max_messages, max_characters
+        )
+
+    async def get_session_chat_history_since(
+        self, session: UserSession, since: datetime
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        return await self._run(
+            self.backend.get_session_chat_history_since, session, since
+        )
+
+    async def save_message_prompt(
+        self, prompt: MessagePrompt, user_session: UserSession
+    ) -> None:
+        return await self._run(self.backend.save_message_prompt, prompt, user_session)
+
+    async def save_message_response(
+        self, response: MessageResponse, user_session: UserSession
+    ) -> None:
+        return await self._run(
+            self.backend.save_message_response, response, user_session
+        )
+
+    async def save_messages(
+        self,
+        messages: Iterable[Union[MessagePrompt, MessageResponse]],
+        user_session: UserSession,
+    ) -> None:
+        return await self._run(self.backend.save_messages, messages, user_session)
+
+    async def save_session_summary(
+        self, user_session: UserSession, summary: SessionSummary
+    ) -> None:
+        return await self._run(self.backend.save_session_summary, user_session, summary)
@@ -0,0 +1,226 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Union
+
+from bright_chatbot.models import (
+    User,
+    UserSession,
+    MessagePrompt,
+    MessageResponse,
+    SessionSummary,
+)
+from bright_chatbot.backends.base_backend import (
+    BaseDataBackend,
+    newest_messages,
+    read_chat_history,
+)
+from bright_chatbot.configs import settings
+from bright_chatbot.utils import get_utc_timestamp_now
+from bright_chatbot.utils.cache import TTLCache
+from bright_chatbot.utils.metrics import metrics
+
+
+class CachingBackend(BaseDataBackend):
+    """
+    Wraps a backend to serve the repeated reads of the sessions
+    and their chat histories from memory.
+
+    The caches are bounded by `maxsize` entries each and their entries
+    are read again from the wrapped backend after `ttl` seconds.
+    The writes made through this backend update the cached entries,
+    but the writes made by other processes are only seen once
+    the entries expire (e.g. a session ended by another process).
+
+    The usage of the sessions and their prompt counts are never cached,
+    so the quotas are always checked against the writes of every process:
+    the sessions served from memory have no `session_usage`.
+
+    The hits and misses of each cache are counted in the process metrics
+    as `backend_cache.<cache>.hits` and `backend_cache.<cache>.misses`.
+    """
+
+    def __init__(
+        self, backend: BaseDataBackend, maxsize: int = None, ttl: float = None
+    ):
+        self._backend = backend
+        maxsize = maxsize or settings.BACKEND_CACHE_MAX_SIZE
+        ttl = settings.BACKEND_CACHE_TTL_SECONDS if ttl is None else ttl
+        # Sessions by hashed user id, they hold their configuration too:
+        self._sessions = TTLCache(maxsize, ttl)
+        # Chat histories by session id:
+        self._histories = TTLCache(maxsize, ttl)
+        # Users known to exist, they do not stop existing:
+        self._users = TTLCache(maxsize, ttl)
+
+    @property
+    def backend(self) -> BaseDataBackend:
+        """
+        Backend wrapped by the cache.
+        """
+        return self._backend
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the counts of hits and misses of the caches.
+        """
+        return metrics.snapshot("backend_cache.")
+
+    def clear(self) -> None:
+        for cache in (
+            self._sessions,
+            self._histories,
+            self._users,
+        ):
+            cache.clear()
+
+    def _lookup(self, name: str, cache: TTLCache, key: str):
+        found, value = cache.lookup(key)
+        metrics.increment(f"backend_cache.{name}.{'hits' if found else 'misses'}")
+        return found, value
+
+    def get_latest_user_session(self, user: User) -> Union[UserSession, None]:
+        found, session = self._lookup("sessions", self._sessions, user.hashed_user_id)
+        if found and session.session_end.timestamp() > get_utc_timestamp_now():
+            return session
+        session = self.backend.get_latest_user_session(user)
+        if session is not None:
+            self._cache_session(session)
+        return session
+
+    def create_user_session(self, user: User, **kwargs) -> UserSession:
+        session = self.backend.create_user_session(user, **kwargs)
+        self._cache_session(session)
+        self._histories.set(session.session_id, (None, None, []))
+        return session
+
+    def _cache_session(self, session: UserSession) -> None:
+        # The usage changes with the prompts of every process,
+        # so it is read again instead of being served from memory:
+        self._sessions.set(
+            session.user.hashed_user_id, session.copy(update={"session_usage": None})
+        )
+
+    def end_user_session(self, user: User) -> None:
+        self.backend.end_user_session(user)
+        self._sessions.pop(user.hashed_user_id)
+
+    def does_user_exist(self, user: User) -> bool:
+        found, _ = self._lookup("users", self._users, user.hashed_user_id)
+        if found:
+            return True
+        exists = self.backend.does_user_exist(user)
+        if exists:
+            self._users.set(user.hashed_user_id, True)
+        return exists
+
+    def get_count_of_active_sessions(self) -> int:
+        # Counts the sessions of every process, so it is never cached:
+        return self.backend.get_count_of_active_sessions()
+
+    def get_count_of_session_prompts(self, session: UserSession) -> int:
+        # The quota of the session is checked against it, so it is never cached:
+        return self.backend.get_count_of_session_prompts(session)
+
+    def get_session_chat_history(
+        self,
+        session: UserSession,
+        max_messages: int = None,
+        max_characters: int = None,
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        limits = (max_messages, max_characters)
+        found, cached = self._lookup("histories", self._histories, session.session_id)
+        if not found or not self._covers(cached[:2], limits):
+            history = read_chat_history(self.backend, session, *limits)
+            self._histories.set(session.session_id, (*limits, history))
+            return list(history)
+        return newest_messages(reversed(cached[2]), *limits)
+
+    def get_session_chat_history_since(
+        self, session: UserSession, since: datetime
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        # Reads the messages saved by other processes too, so it is never cached:
+        return self.backend.get_session_chat_history_since(session, since)
+
+    @staticmethod
+    def _covers(cached_limits: tuple, limits: tuple) -> bool:
+        """
+        Whether a history read with `cached_limits` holds
+        all the messages of one read with `limits`.
+        """
+        return all(
+            cached is None or (limit is not None and limit <= cached)
+            for cached, limit in zip(cached_limits, limits)
+        )
+
+    def save_message_prompt(self, message: MessagePrompt, session: UserSession) -> None:
+        self.backend.save_message_prompt(message, session)
+        self._add_to_history(message, session)
+        self._users.set(session.user.hashed_user_id, True)
+
+    def save_message_response(
+        self, message: MessageResponse, session: UserSession
+    ) -> None:
+        self.backend.save_message_response(message, session)
+        self._add_to_history(message, session)
+
+    def save_messages(
+        self,
+        messages: Iterable[Union[MessagePrompt, MessageResponse]],
+        session: UserSession,
+    ) -> None:
+        messages = list(messages)
+        self.backend.save_messages(messages, session)
+        for message in messages:
+            self._add_to_history(message, session)
+            if isinstance(message, MessagePrompt):
+                self._users.set(session.user.hashed_user_id, True)
+
+    @property
+    def stores_session_summaries(self) -> bool:
+        return self.backend.stores_session_summaries
+
+    def save_session_summary(
+        self, session: UserSession, summary: SessionSummary
+    ) -> None:
+        self.backend.save_session_summary(session, summary)
+        self._sessions.update(
+            session.user.hashed_user_id,
+            lambda cached: self._add_summary(cached, session, summary),
+        )
+
+    def _add_to_history(
+        self, message: Union[MessagePrompt, MessageResponse], session: UserSession
+    ) -> None:
+        self._histories.update(
+            session.session_id,
+            lambda cached: self._add_message(cached, message),
+        )
+
+    @staticmethod
+    def _add_message(
+        cached: tuple, message: Union[MessagePrompt, MessageResponse]
+    ) -> tuple:
+        """
+        Returns the cached history with the message saved to it, still holding
+        the newest messages within the limits it was read with.
+        """
+        max_messages, max_characters, history = cached
+        # Messages can be saved out of order by the writes in the background:
+        history = sorted(history + [message], key=lambda m: m.created_at.timestamp())
+        if max_messages is not None or max_characters is not None:
+            history = newest_messages(reversed(history), max_messages, max_characters)
+        return max_messages, max_characters, history
+
+    @staticmethod
+    def _add_summary(
+        cached: UserSession, session: UserSession, summary: SessionSummary
+    ) -> UserSession:
+        """
+        Returns the cached session with the summary saved to it,
+        unless it has a summary of newer messages.
+        """
+        if cached.session_id != session.session_id:
+            return cached
+        previous = cached.session_summary
+        if previous and previous.includes_summary(summary):
+            return cached
+        return cached.copy(update={"session_summary": summary})
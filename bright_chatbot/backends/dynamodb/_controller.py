@@ -1,4 +1,7 @@
+from typing import Any, Dict, List
+
 import boto3
+from botocore.exceptions import ClientError
 
 from bright_chatbot.backends.dynamodb.tables import (
     SessionsTableController,
@@ -6,12 +9,33 @@ from bright_chatbot.backends.dynamodb.tables import (
     ChatsTableController,
     ChatMessagesTableController,
 )
+from bright_chatbot.backends.dynamodb.tables.base import (
+    MAX_TRANSACT_ITEMS,
+    is_condition_failed,
+    transact_write_items,
+)
 
 
 class DynamoTablesController:
+    MAX_TRANSACT_ITEMS = MAX_TRANSACT_ITEMS
+
     def __init__(self, **client_kwargs):
         self.client = boto3.client("dynamodb", **client_kwargs)
         self.sessions = SessionsTableController(self.client)
         self.image_responses = ImageResponsesTableController(self.client)
         self.chats = ChatsTableController(self.client)
         self.chat_messages = ChatMessagesTableController(self.client)
+
+    def transact_write_items(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Writes items of any of the tables in a single transaction.
+        """
+        return transact_write_items(self.client, items)
+
+    @staticmethod
+    def is_condition_failed(error: ClientError, index: int) -> bool:
+        """
+        Whether a transaction was cancelled because the condition
+        of its item at `index` failed.
+        """
+        return is_condition_failed(error, index)
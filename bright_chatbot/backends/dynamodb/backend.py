@@ -1,5 +1,8 @@
 import json
-from typing import List, Union
+from datetime import datetime
+from typing import Iterable, List, Union
+
+from botocore.exceptions import ClientError
 
 from bright_chatbot.models import (
     User,
@@ -7,8 +10,10 @@ from bright_chatbot.models import (
     MessagePrompt,
     MessageResponse,
     UserSessionConfig,
+    SessionUsage,
+    SessionSummary,
 )
-from bright_chatbot.backends.base_backend import BaseDataBackend
+from bright_chatbot.backends.base_backend import BaseDataBackend, newest_messages
 from bright_chatbot.backends.dynamodb._controller import DynamoTablesController
 from bright_chatbot.configs import settings
 
@@ -18,6 +23,8 @@ class DynamodbBackend(BaseDataBackend):
     Backend that uses DynamoDB to store and retrieve data.
     """
 
+    stores_session_summaries = True
+
     def __init__(self, **client_kwargs):
         self._controller = DynamoTablesController(**client_kwargs)
 
@@ -41,9 +48,31 @@ class DynamodbBackend(BaseDataBackend):
             session_config=UserSessionConfig(
                 **json.loads(session_obj["SessionConfig"]["S"])
             ),
+            session_usage=self._parse_session_usage(session_obj),
+            session_summary=self._parse_session_summary(session_obj),
         )
         return user_session
 
+    @staticmethod
+    def _parse_session_summary(session_obj: dict) -> Union[SessionSummary, None]:
+        if "SessionSummary" not in session_obj:
+            return None
+        return SessionSummary(
+            text=session_obj["SessionSummary"]["S"],
+            summarized_until=session_obj["SummarizedUntil"]["N"],
+        )
+
+    @staticmethod
+    def _parse_session_usage(session_obj: dict) -> Union[SessionUsage, None]:
+        # Sessions recorded before their usage was counted do not have it:
+        if "UsageCounted" not in session_obj:
+            return None
+        return SessionUsage(
+            prompts=session_obj.get("PromptsCount", {}).get("N", 0),
+            images=session_obj.get("ImagesCount", {}).get("N", 0),
+            tokens=session_obj.get("TokensCount", {}).get("N", 0),
+        )
+
     def create_user_session(self, user: User) -> UserSession:
         session_obj = self.controller.sessions.record_user_session(
             user.hashed_user_id,
@@ -59,6 +88,7 @@ class DynamodbBackend(BaseDataBackend):
             session_config=UserSessionConfig(
                 **json.loads(session_obj["SessionConfig"]["S"])
             ),
+            session_usage=self._parse_session_usage(session_obj),
         )
         return user_session
 
@@ -75,6 +105,12 @@ class DynamodbBackend(BaseDataBackend):
         return self.controller.sessions.count_active_sessions()
 
     def get_count_of_session_prompts(self, session: UserSession) -> int:
+        session_obj = self.controller.sessions.get_session(
+            session.session_id, attributes=["UsageCounted", "PromptsCount"]
+        )
+        session_usage = self._parse_session_usage(session_obj or {})
+        if session_usage is not None:
+            return session_usage.prompts
         user_chat_messages = self.controller.chat_messages.get_user_chat_session(
             session_id=session.session_id
         )
@@ -82,86 +118,175 @@ class DynamodbBackend(BaseDataBackend):
             list(filter(lambda x: x["ChatAgent"]["S"] == "user", user_chat_messages))
         )
 
+    # Messages read per page of the history when only its newest messages are read:
+    HISTORY_PAGE_SIZE = 20
+
     def get_session_chat_history(
-        self, session: UserSession
+        self,
+        session: UserSession,
+        max_messages: int = None,
+        max_characters: int = None,
     ) -> List[Union[MessagePrompt, MessageResponse]]:
-        user_chat_messages = self.controller.chat_messages.get_user_chat_session(
-            session_id=session.session_id
+        if max_messages is None and max_characters is None:
+            user_chat_messages = self.controller.chat_messages.get_user_chat_session(
+                session_id=session.session_id
+            )
+            return [
+                self._parse_message(message, session.user)
+                for message in user_chat_messages
+            ]
+        # Read the newest messages first, and only the pages that are needed:
+        page_size = self.HISTORY_PAGE_SIZE
+        if max_messages is not None:
+            page_size = max(1, min(max_messages, page_size))
+        user_chat_messages = self.controller.chat_messages.iter_latest_session_messages(
+            session_id=session.session_id, page_size=page_size
         )
-        chat_history = []
-        user = session.user
-        for message in user_chat_messages:
-            message_agent = message["ChatAgent"]["S"]
-            if message_agent == "user":
-                chat_history.append(
-                    MessagePrompt(
-                        body=message["Message"]["S"],
-                        created_at=message["TimestampCreated"]["N"],
-                        from_user=user,
-                    )
-                )
-            elif message_agent == "assistant":
-                chat_history.append(
-                    MessageResponse(
-                        body=message["Message"]["S"],
-                        created_at=message["TimestampCreated"]["N"],
-                        to_user=user,
-                        media_url=message["ImageId"]["S"],
-                    )
-                )
-            else:
-                raise ValueError("Invalid agent type. Got: '{}'".format(message_agent))
-        return chat_history
+        return newest_messages(
+            (
+                self._parse_message(message, session.user)
+                for message in user_chat_messages
+            ),
+            max_messages=max_messages,
+            max_characters=max_characters,
+        )
+
+    def get_session_chat_history_since(
+        self, session: UserSession, since: datetime
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        # Only the messages after the timestamp are read, by the sort key:
+        user_chat_messages = self.controller.chat_messages.get_session_messages_since(
+            session_id=session.session_id, timestamp_since=since.timestamp()
+        )
+        return [
+            self._parse_message(message, session.user) for message in user_chat_messages
+        ]
+
+    @staticmethod
+    def _parse_message(
+        message: dict, user: User
+    ) -> Union[MessagePrompt, MessageResponse]:
+        message_agent = message["ChatAgent"]["S"]
+        if message_agent == "user":
+            return MessagePrompt(
+                body=message["Message"]["S"],
+                created_at=message["TimestampCreated"]["N"],
+                from_user=user,
+                chat_tokens=message.get("MessageTokens", {}).get("N"),
+            )
+        elif message_agent == "assistant":
+            return MessageResponse(
+                body=message["Message"]["S"],
+                created_at=message["TimestampCreated"]["N"],
+                to_user=user,
+                media_url=message["ImageId"]["S"],
+                chat_tokens=message.get("MessageTokens", {}).get("N"),
+            )
+        raise ValueError("Invalid agent type. Got: '{}'".format(message_agent))
 
     def save_message_prompt(
         self,
         message: MessagePrompt,
         session: UserSession,
     ) -> None:
-        self.controller.chats.record_chat_message(
-            session_id=session.session_id,
-            user_id=session.user.hashed_user_id,
-            message_length=len(message.body),
-            timestamp_created=message.created_at.timestamp(),
-            agent="user",
-            user_chat_plan=session.session_config.user_plan,
-        )
-        self.controller.chat_messages.record_chat_message(
-            session_id=session.session_id,
-            session_ttl=session.session_end.timestamp(),
-            message=message.body,
-            timestamp_created=message.created_at.timestamp(),
-            agent="user",
-        )
+        self.save_messages([message], session)
 
     def save_message_response(
         self,
         message: MessageResponse,
         session: UserSession,
     ) -> None:
+        self.save_messages([message], session)
+
+    def save_messages(
+        self,
+        messages: Iterable[Union[MessagePrompt, MessageResponse]],
+        session: UserSession,
+    ) -> None:
+        """
+        Saves several messages of a session, e.g. a prompt and its response,
+        along with their images and the usage of the session
+        in a single transaction.
+        """
+        messages = list(messages)
+        # Each message takes up to 3 items and the usage of the session one more:
+        chunk_size = (self.controller.MAX_TRANSACT_ITEMS - 1) // 3
+        for i in range(0, len(messages), chunk_size):
+            chunk = messages[i : i + chunk_size]
+            items = []
+            for message in chunk:
+                items.extend(self._message_puts(message, session))
+            try:
+                self.controller.transact_write_items(
+                    items + [self._session_usage_update(chunk, session)]
+                )
+            except ClientError as e:
+                if not self.controller.is_condition_failed(e, index=len(items)):
+                    raise
+                # The session no longer exists (e.g. it was deleted by its TTL),
+                # so the messages are saved without counting its usage:
+                self.controller.transact_write_items(items)
+
+    def save_session_summary(
+        self, session: UserSession, summary: SessionSummary
+    ) -> None:
+        self.controller.sessions.update_session_summary(
+            session.session_id,
+            summary=summary.text,
+            summarized_until=summary.summarized_until.timestamp(),
+        )
+
+    def _message_puts(
+        self, message: Union[MessagePrompt, MessageResponse], session: UserSession
+    ) -> List[dict]:
+        """
+        Returns the Puts that save a message to the tables.
+        """
+        puts = []
+        agent = "user" if isinstance(message, MessagePrompt) else "assistant"
+        # Counted once, so the chat history read later is not tokenized again:
+        message_tokens = message.count_chat_tokens()
         image_id = None
-        if message.media_url:
-            image_obj = self.controller.image_responses.record_image(
+        if getattr(message, "media_url", None):
+            image_put = self.controller.image_responses.image_put(
                 prompt=message.body,
                 timestamp_created=message.created_at.timestamp(),
                 image_uri=message.media_url,
                 user_id=session.user.hashed_user_id,
             )
-            image_id = image_obj["ImageId"]["S"]
-        self.controller.chats.record_chat_message(
-            session_id=session.session_id,
-            user_id=session.user.hashed_user_id,
-            message_length=len(message.body),
-            timestamp_created=message.created_at.timestamp(),
-            agent="assistant",
-            user_chat_plan=session.session_config.user_plan,
-            image_id=image_id,
+            image_id = image_put["Put"]["Item"]["ImageId"]["S"]
+            puts.append(image_put)
+        puts.append(
+            self.controller.chats.chat_message_put(
+                session_id=session.session_id,
+                user_id=session.user.hashed_user_id,
+                message_length=len(message.body),
+                timestamp_created=message.created_at.timestamp(),
+                agent=agent,
+                user_chat_plan=session.session_config.user_plan,
+                image_id=image_id,
+                message_tokens=message_tokens,
+            )
         )
-        self.controller.chat_messages.record_chat_message(
-            session_id=session.session_id,
-            session_ttl=session.session_end.timestamp(),
-            message=message.body,
-            timestamp_created=message.created_at.timestamp(),
-            agent="assistant",
-            image_id=image_id,
+        puts.append(
+            self.controller.chat_messages.chat_message_put(
+                session_id=session.session_id,
+                session_ttl=session.session_end.timestamp(),
+                message=message.body,
+                timestamp_created=message.created_at.timestamp(),
+                agent=agent,
+                image_id=image_id,
+                message_tokens=message_tokens,
+            )
         )
+        return puts
+
+    def _session_usage_update(
+        self,
+        messages: List[Union[MessagePrompt, MessageResponse]],
+        session: UserSession,
+    ) -> dict:
+        usage = SessionUsage()
+        for message in messages:
+            usage = usage.add(SessionUsage.of_message(message))
+        return self.controller.sessions.usage_update(session.session_id, **usage.dict())
@@ -1,10 +1,71 @@
 import abc
-from typing import Any, Dict
+import random
+import time
+from typing import Any, Dict, List
 
 import boto3
+from botocore.exceptions import ClientError
 
 from bright_chatbot.configs import settings
 
+# Maximum number of items written by a single transaction:
+MAX_TRANSACT_ITEMS = 100
+# Attempts of a transaction cancelled by a conflict or throttled,
+# with an exponential backoff starting at TRANSACT_BACKOFF_SECONDS:
+TRANSACT_MAX_ATTEMPTS = 5
+TRANSACT_BACKOFF_SECONDS = 0.05
+RETRYABLE_CANCELLATION_REASONS = {
+    "TransactionConflict",
+    "ThrottlingError",
+    "ProvisionedThroughputExceeded",
+}
+
+
+def transact_write_items(client, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Writes the items given (e.g. the Puts and Updates returned
+    by the table controllers) in a single transaction.
+
+    The items of a cancelled transaction are not written, so the transaction
+    is retried with backoff while it is cancelled by a conflict with another
+    one or by throttling, and the error is raised otherwise.
+    """
+    if len(items) > MAX_TRANSACT_ITEMS:
+        raise ValueError(f"A transaction can write at most {MAX_TRANSACT_ITEMS} items")
+    for attempt in range(1, TRANSACT_MAX_ATTEMPTS + 1):
+        try:
+            return client.transact_write_items(TransactItems=items)
+        except ClientError as e:
+            if attempt == TRANSACT_MAX_ATTEMPTS or not _is_retryable(e):
+                raise
+        backoff = TRANSACT_BACKOFF_SECONDS * 2 ** (attempt - 1)
+        time.sleep(random.uniform(backoff / 2, backoff))
+
+
+def _is_retryable(error: ClientError) -> bool:
+    code = error.response.get("Error", {}).get("Code")
+    if code != "TransactionCanceledException":
+        return code in ("ThrottlingException", "TransactionInProgressException")
+    reasons = {
+        reason.get("Code") for reason in error.response.get("CancellationReasons", [])
+    }
+    # A failed condition (e.g. an image saved twice) would fail again:
+    reasons.discard("None")
+    return bool(reasons) and reasons <= RETRYABLE_CANCELLATION_REASONS
+
+
+def is_condition_failed(error: ClientError, index: int) -> bool:
+    """
+    Whether a transaction was cancelled because the condition
+    of its item at `index` failed.
+    """
+    if error.response.get("Error", {}).get("Code") != "TransactionCanceledException":
+        return False
+    reasons = error.response.get("CancellationReasons", [])
+    return (
+        index < len(reasons) and reasons[index].get("Code") == "ConditionalCheckFailed"
+    )
+
 
 class BaseTableController(abc.ABC):
     """
@@ -45,5 +106,15 @@ class BaseTableController(abc.ABC):
     def _put_item(self, **kwargs):
         return self.client.put_item(TableName=self.table_name, **kwargs)
 
+    def _transact_write_items(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return transact_write_items(self.client, items)
+
+    def _put_request(self, **kwargs) -> Dict[str, Any]:
+        """
+        Returns a Put of an item into the table,
+        to be written within a transaction.
+        """
+        return {"Put": {"TableName": self.table_name, **kwargs}}
+
     def _update_item(self, **kwargs):
         return self.client.update_item(TableName=self.table_name, **kwargs)
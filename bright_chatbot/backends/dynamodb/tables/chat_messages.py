@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any, Dict, List, Literal
+from typing import Any, Dict, Iterator, List, Literal
 
 from bright_chatbot.backends.dynamodb.tables.base import BaseTableController
 
@@ -23,6 +23,55 @@ class ChatMessagesTableController(BaseTableController):
         )
         return response["Items"]
 
+    def get_session_messages_since(
+        self, session_id: str, timestamp_since: float
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieves the messages of the chat given a session id
+        that were created after a timestamp.
+        """
+        response = self._query(
+            recursive=True,
+            ExpressionAttributeValues={
+                ":session_id": {
+                    "S": session_id,
+                },
+                ":since": {
+                    "N": str(timestamp_since),
+                },
+            },
+            KeyConditionExpression="SessionId = :session_id AND TimestampCreated > :since",
+            ConsistentRead=True,
+        )
+        return response["Items"]
+
+    def iter_latest_session_messages(
+        self, session_id: str, page_size: int = 20
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Iterates over the messages of the chat given a session id, newest first.
+
+        The messages are read in pages of `page_size` messages, and each page
+        is only read once the messages of the previous one have been consumed.
+        """
+        kwargs = dict(
+            ExpressionAttributeValues={
+                ":session_id": {
+                    "S": session_id,
+                },
+            },
+            KeyConditionExpression="SessionId = :session_id",
+            ScanIndexForward=False,
+            Limit=page_size,
+            ConsistentRead=True,
+        )
+        while True:
+            response = self._query(**kwargs)
+            yield from response["Items"]
+            if "LastEvaluatedKey" not in response:
+                return
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
     def record_chat_message(
         self,
         session_id: str,
@@ -31,9 +80,37 @@ class ChatMessagesTableController(BaseTableController):
         timestamp_created: float,
         agent: Literal["assistant", "user"],
         image_id: str = None,
+        message_tokens: int = None,
     ) -> Dict[str, Any]:
         """
-        Records a new chat message into the table
+        Records a new chat message into the table.
+        """
+        item = self.chat_message_put(
+            session_id=session_id,
+            session_ttl=session_ttl,
+            message=message,
+            timestamp_created=timestamp_created,
+            agent=agent,
+            image_id=image_id,
+            message_tokens=message_tokens,
+        )["Put"]["Item"]
+        response = self._put_item(Item=item)
+        response["Item"] = item
+        return response
+
+    def chat_message_put(
+        self,
+        session_id: str,
+        session_ttl: float,
+        message: str,
+        timestamp_created: float,
+        agent: Literal["assistant", "user"],
+        image_id: str = None,
+        message_tokens: int = None,
+    ) -> Dict[str, Any]:
+        """
+        Returns the Put of a new chat message,
+        to be written within a transaction.
         """
         item = {
             "SessionId": {
@@ -47,6 +124,6 @@ class ChatMessagesTableController(BaseTableController):
                 "N": str(session_ttl),
             },
         }
-        response = self._put_item(Item=item)
-        response["Item"] = item
-        return response
+        if message_tokens is not None:
+            item["MessageTokens"] = {"N": str(message_tokens)}
+        return self._put_request(Item=item)
@@ -32,10 +32,40 @@ class ChatsTableController(BaseTableController):
         agent: Literal["assistant", "user"],
         user_chat_plan: str = None,
         image_id: str = None,
+        message_tokens: int = None,
     ) -> Dict[str, Any]:
         """
         Records a new chat entry into the table
         """
+        item = self.chat_message_put(
+            session_id=session_id,
+            user_id=user_id,
+            message_length=message_length,
+            timestamp_created=timestamp_created,
+            agent=agent,
+            user_chat_plan=user_chat_plan,
+            image_id=image_id,
+            message_tokens=message_tokens,
+        )["Put"]["Item"]
+        response = self._put_item(Item=item)
+        response["Item"] = item
+        return response
+
+    def chat_message_put(
+        self,
+        session_id: str,
+        user_id: str,
+        message_length: int,
+        timestamp_created: float,
+        agent: Literal["assistant", "user"],
+        user_chat_plan: str = None,
+        image_id: str = None,
+        message_tokens: int = None,
+    ) -> Dict[str, Any]:
+        """
+        Returns the Put of a new chat entry,
+        to be written within a transaction.
+        """
         item = {
             "SessionId": {
                 "S": session_id,
@@ -49,9 +79,9 @@ class ChatsTableController(BaseTableController):
             "ImageId": {"S": image_id or ""},
             "UserChatPlan": {"S": user_chat_plan} if user_chat_plan else {"NULL": True},
         }
-        response = self._put_item(Item=item)
-        response["Item"] = item
-        return response
+        if message_tokens is not None:
+            item["MessageTokens"] = {"N": str(message_tokens)}
+        return self._put_request(Item=item)
 
     def get_user_chat_messages(
         self, user_id: str, from_date: datetime = None, to_date: datetime = None
@@ -79,6 +79,22 @@ class ImageResponsesTableController(BaseTableController):
         Records a new image response into the table.
         Fails if the image already exists in the table.
         """
+        put = self.image_put(prompt, timestamp_created, image_uri, user_id)["Put"]
+        put.pop("TableName")
+        self._put_item(**put)
+        return put["Item"]
+
+    def image_put(
+        self,
+        prompt: str,
+        timestamp_created: float,
+        image_uri: str,
+        user_id: str = "",
+    ) -> Dict[str, Any]:
+        """
+        Returns the Put of a new image response, to be written within
+        a transaction. The transaction fails if the image already exists.
+        """
         image_id = self.generate_image_id(image_uri)
         item = {
             "ImageId": {
@@ -93,9 +109,8 @@ class ImageResponsesTableController(BaseTableController):
             "ImageURI": {"S": image_uri},
             "TimestampCreated": {"N": str(timestamp_created)},
         }
-        self._put_item(
+        return self._put_request(
             Item=item,
             ExpressionAttributeValues={":image_id": {"S": image_id}},
             ConditionExpression="ImageId <> :image_id",
         )
-        return item
@@ -1,7 +1,11 @@
 from datetime import datetime
 import json
+import logging
 import os
-from typing import Any, Dict, List
+import random
+from typing import Any, Dict, List, Union
+
+from botocore.exceptions import ClientError
 
 from bright_chatbot.backends.dynamodb.tables.base import BaseTableController
 from bright_chatbot.configs import settings
@@ -13,6 +17,18 @@ class SessionsTableController(BaseTableController):
     TABLE_NAME = "Sessions"
     DEFAULT_SESSIONS_EXPIRATION_HOURS = 3
 
+    # The active sessions are counted in counter items of the table,
+    # spread in shards so their updates do not contend on a single item,
+    # and in buckets by the time their sessions expire, so the sessions
+    # that expire by their TTL stop being counted without updating them.
+    ACTIVE_SESSIONS_COUNTER_ID = "#ActiveSessions"
+    ACTIVE_SESSIONS_COUNTER_SHARDS = 4
+    ACTIVE_SESSIONS_BUCKET_SECONDS = 300
+
+    @property
+    def logger(self) -> logging.Logger:
+        return logging.getLogger(f"{__package__}.{self.__class__.__name__}")
+
     @staticmethod
     def generate_session_id(user_id: str, timestamp: float = None) -> str:
         if not timestamp:
@@ -90,8 +106,24 @@ class SessionsTableController(BaseTableController):
             "MessagesQuota": {"N": str(messages_quota)},
             "SessionConfig": {"S": json.dumps(session_config)},
             "SessionTTL": {"N": str(ttl)},
+            # The usage of the session is counted as its messages are recorded:
+            "UsageCounted": {"BOOL": True},
+            "PromptsCount": {"N": "0"},
+            "ImagesCount": {"N": "0"},
+            "TokensCount": {"N": "0"},
         }
-        self._put_item(Item=item)
+        # The session and its count are written in a single transaction:
+        self._transact_write_items(
+            [
+                {"Put": {"TableName": self.table_name, "Item": item}},
+                {
+                    "Update": {
+                        "TableName": self.table_name,
+                        **self._active_sessions_counter_update(ttl, 1),
+                    }
+                },
+            ]
+        )
         return item
 
     def get_latest_user_session(
@@ -129,14 +161,8 @@ class SessionsTableController(BaseTableController):
         Forcefully expires the user session given
         """
         timestamp = get_utc_timestamp_now()
-        session_parts = session_id.split(":")
-        user_id = ":".join(session_parts[:-1])
-        timestamp_created = session_parts[-1]
         response = self._update_item(
-            Key={
-                "UserId": {"S": user_id},
-                "TimestampCreated": {"N": str(timestamp_created)},
-            },
+            Key=self._session_key(session_id),
             ConditionExpression="SessionId=:session_id",
             ExpressionAttributeNames={
                 "#TF": "TimestampFinished",
@@ -146,22 +172,229 @@ class SessionsTableController(BaseTableController):
                 ":session_id": {"S": session_id},
             },
             UpdateExpression="SET #TF = :tf",
+            ReturnValues="ALL_OLD",
         )
+        # Only discounts the session if this update is the one that finished it:
+        old_session = response.get("Attributes", {})
+        session_ttl = float(old_session.get("SessionTTL", {}).get("N", 0))
+        if (
+            "NULL" in old_session.get("TimestampFinished", {})
+            and session_ttl > timestamp
+        ):
+            self._update_item(**self._active_sessions_counter_update(session_ttl, -1))
         return response
 
+    def update_session_summary(
+        self, session_id: str, summary: str, summarized_until: float
+    ) -> bool:
+        """
+        Saves the summary of the oldest messages of a session, unless
+        the session no longer exists or has a summary of newer messages.
+        Returns whether the summary was saved.
+        """
+        try:
+            self._update_item(
+                Key=self._session_key(session_id),
+                UpdateExpression="SET SessionSummary = :summary, SummarizedUntil = :until",
+                ConditionExpression=(
+                    "attribute_exists(SessionId) AND "
+                    "(attribute_not_exists(SummarizedUntil) OR SummarizedUntil < :until)"
+                ),
+                ExpressionAttributeValues={
+                    ":summary": {"S": summary},
+                    ":until": {"N": str(summarized_until)},
+                },
+            )
+        except ClientError as e:
+            if (
+                e.response.get("Error", {}).get("Code")
+                != "ConditionalCheckFailedException"
+            ):
+                raise
+            return False
+        return True
+
+    def get_session(
+        self, session_id: str, attributes: List[str] = None
+    ) -> Union[Dict[str, Any], None]:
+        """
+        Retrieves a session by its id, with only the `attributes` given if any.
+        Returns None if the session does not exist.
+        """
+        extra_kwargs = {}
+        if attributes:
+            extra_kwargs["ProjectionExpression"] = ", ".join(attributes)
+        response = self.client.get_item(
+            TableName=self.table_name,
+            Key=self._session_key(session_id),
+            ConsistentRead=True,
+            **extra_kwargs,
+        )
+        return response.get("Item")
+
+    def usage_update(
+        self,
+        session_id: str,
+        prompts: int = 0,
+        images: int = 0,
+        tokens: int = 0,
+    ) -> Dict[str, Any]:
+        """
+        Returns the transaction item that adds to the usage counters of a session,
+        to be written along with the message that used it.
+
+        The update fails its condition if the session no longer exists
+        (e.g. it was deleted by its TTL), instead of recreating it.
+        """
+        return {
+            "Update": {
+                "TableName": self.table_name,
+                "Key": self._session_key(session_id),
+                "UpdateExpression": (
+                    "ADD PromptsCount :prompts, ImagesCount :images, TokensCount :tokens"
+                ),
+                "ConditionExpression": "attribute_exists(SessionId)",
+                "ExpressionAttributeValues": {
+                    ":prompts": {"N": str(prompts)},
+                    ":images": {"N": str(images)},
+                    ":tokens": {"N": str(tokens)},
+                },
+            }
+        }
+
+    @staticmethod
+    def _session_key(session_id: str) -> Dict[str, Any]:
+        session_parts = session_id.split(":")
+        user_id = ":".join(session_parts[:-1])
+        timestamp_created = session_parts[-1]
+        return {
+            "UserId": {"S": user_id},
+            "TimestampCreated": {"N": str(timestamp_created)},
+        }
+
     def count_active_sessions(self) -> int:
         """
-        Returns the number of active sessions in the Sessions table.
+        Returns the number of active sessions in the Sessions table,
+        from its counter items with a query per shard.
+
+        The sessions that expire by their TTL are still counted until the end
+        of their bucket of `ACTIVE_SESSIONS_BUCKET_SECONDS`.
+
+        If the counters drifted below 0 (e.g. sessions created before the counters
+        existed were finished), they are reconciled with the sessions of the table.
+        """
+        count = sum(self._count_active_sessions_by_bucket().values())
+        if count < 0:
+            self.logger.warning(
+                f"The counters of active sessions drifted to {count}, reconciling them"
+            )
+            return self.reconcile_active_sessions()
+        return count
+
+    def reconcile_active_sessions(self) -> int:
+        """
+        Counts the active sessions by scanning the table and corrects
+        the counters of active sessions to match them. Returns the count.
+
+        It must be run once when the counters are deployed on a table with
+        active sessions, which are not counted otherwise. It is also run
+        when the counters are found to have drifted.
+        The sessions created or finished during the scan may be miscounted.
         """
         timestamp = get_utc_timestamp_now()
-        filter_expr = f"TimestampFinished = :tf AND SessionTTL > :now"
-        response = self.scan(
+        sessions_by_bucket: Dict[int, int] = {}
+        scan_kwargs = dict(
+            FilterExpression=(
+                "NOT begins_with(UserId, :counter_id) "
+                "AND TimestampFinished = :tf AND SessionTTL > :now"
+            ),
             ExpressionAttributeValues={
-                ":tf": {
-                    "NULL": True,
-                },
+                ":counter_id": {"S": self.ACTIVE_SESSIONS_COUNTER_ID},
+                ":tf": {"NULL": True},
                 ":now": {"N": str(timestamp)},
             },
-            FilterExpression=filter_expr,
+            ProjectionExpression="SessionTTL",
+            ConsistentRead=True,
         )
-        return response["Count"]
+        while True:
+            response = self.scan(**scan_kwargs)
+            for item in response["Items"]:
+                bucket_end = self._bucket_end(float(item["SessionTTL"]["N"]))
+                sessions_by_bucket[bucket_end] = (
+                    sessions_by_bucket.get(bucket_end, 0) + 1
+                )
+            if "LastEvaluatedKey" not in response:
+                break
+            scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        counted_by_bucket = self._count_active_sessions_by_bucket(timestamp)
+        for bucket_end in sessions_by_bucket.keys() | counted_by_bucket.keys():
+            drift = sessions_by_bucket.get(bucket_end, 0) - counted_by_bucket.get(
+                bucket_end, 0
+            )
+            if drift:
+                self._update_item(**self._counter_update(bucket_end, drift))
+        count = sum(sessions_by_bucket.values())
+        self.logger.info(f"Reconciled the counters of active sessions to {count}")
+        return count
+
+    def _count_active_sessions_by_bucket(
+        self, timestamp: float = None
+    ) -> Dict[int, int]:
+        """
+        Returns the count of active sessions of the counters of every shard,
+        by the end of their bucket.
+        """
+        timestamp = timestamp or get_utc_timestamp_now()
+        counts: Dict[int, int] = {}
+        for shard in range(self.ACTIVE_SESSIONS_COUNTER_SHARDS):
+            response = self._query(
+                ExpressionAttributeValues={
+                    ":counter_id": {"S": f"{self.ACTIVE_SESSIONS_COUNTER_ID}:{shard}"},
+                    ":now": {"N": str(timestamp)},
+                },
+                KeyConditionExpression="UserId = :counter_id AND TimestampCreated > :now",
+                ProjectionExpression="TimestampCreated, ActiveSessions",
+                ConsistentRead=True,
+                recursive=True,
+            )
+            for item in response["Items"]:
+                bucket_end = int(float(item["TimestampCreated"]["N"]))
+                counts[bucket_end] = counts.get(bucket_end, 0) + int(
+                    item["ActiveSessions"]["N"]
+                )
+        return counts
+
+    def _bucket_end(self, session_ttl: float) -> int:
+        """
+        Returns the end of the bucket of the sessions that expire at `session_ttl`.
+        """
+        bucket_seconds = self.ACTIVE_SESSIONS_BUCKET_SECONDS
+        return (int(session_ttl) // bucket_seconds + 1) * bucket_seconds
+
+    def _active_sessions_counter_update(
+        self, session_ttl: float, delta: int
+    ) -> Dict[str, Any]:
+        """
+        Returns the arguments of the update that adds `delta` to the count of
+        active sessions that expire at `session_ttl`.
+        """
+        return self._counter_update(self._bucket_end(session_ttl), delta)
+
+    def _counter_update(self, bucket_end: int, delta: int) -> Dict[str, Any]:
+        """
+        Returns the arguments of the update that adds `delta` to the count of
+        active sessions of the bucket that ends at `bucket_end`, in a random shard.
+        """
+        shard = random.randrange(self.ACTIVE_SESSIONS_COUNTER_SHARDS)
+        return {
+            "Key": {
+                "UserId": {"S": f"{self.ACTIVE_SESSIONS_COUNTER_ID}:{shard}"},
+                "TimestampCreated": {"N": str(bucket_end)},
+            },
+            # The counters of past buckets are deleted by the TTL of the table:
+            "UpdateExpression": "ADD ActiveSessions :delta SET SessionTTL = :ttl",
+            "ExpressionAttributeValues": {
+                ":delta": {"N": str(delta)},
+                ":ttl": {"N": str(bucket_end)},
+            },
+        }
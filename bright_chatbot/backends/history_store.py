@@ -0,0 +1,151 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import sys
+import threading
+from typing import Dict, Union
+
+from bright_chatbot.models import (
+    ChatHistory,
+    MessagePrompt,
+    MessageResponse,
+    UserSession,
+)
+from bright_chatbot.backends.base_backend import AsyncBaseDataBackend
+from bright_chatbot.configs import settings
+from bright_chatbot.utils.metrics import metrics
+
+
+class ChatHistoryStore:
+    """
+    Keeps the chat histories of the sessions in the memory of the process
+    between replies (e.g. in a warm Lambda container).
+
+    A chat history is read from the backend the first time it is requested,
+    and then only the messages created since it was last brought up to date
+    are read and added to it. The chat representation of its messages is kept
+    along with it, so it is only made for the new messages.
+
+    The messages of a reply are saved once it is done, up to `sync_overlap`
+    after they are created (by default, `settings.MAX_REPLY_DURATION_SECONDS`),
+    so the messages are read from that long before the last sync. The histories
+    that were not brought up to date for longer are read again in full.
+
+    The store is bounded by the approximate size in bytes of the histories
+    it holds (`max_bytes`), the least recently used ones are dropped first.
+
+    The hits and misses of the store are counted in the process metrics
+    as `history_store.hits` and `history_store.misses`.
+    """
+
+    # Approximate bytes of a message apart from its texts:
+    MESSAGE_OVERHEAD_BYTES = 1024
+
+    _shared: Union["ChatHistoryStore", None] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_bytes: int = None, sync_overlap: timedelta = None):
+        self.max_bytes = max_bytes or settings.CHAT_HISTORY_STORE_MAX_BYTES
+        if sync_overlap is None:
+            sync_overlap = timedelta(seconds=settings.MAX_REPLY_DURATION_SECONDS)
+        self.sync_overlap = sync_overlap
+        self._lock = threading.Lock()
+        self._histories: "OrderedDict[str, ChatHistory]" = OrderedDict()
+        # Time (as the `created_at` of the messages) of the last read of each history:
+        self._synced_at: Dict[str, datetime] = {}
+        self._sizes: Dict[str, int] = {}
+        self._size = 0
+
+    @classmethod
+    def shared(cls) -> "ChatHistoryStore":
+        """
+        Returns the store shared by all the clients of the process.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @property
+    def size(self) -> int:
+        """
+        Approximate number of bytes of the histories in the store.
+        """
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._histories)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._histories.clear()
+            self._synced_at.clear()
+            self._sizes.clear()
+            self._size = 0
+
+    async def aget_chat_history(
+        self,
+        backend: AsyncBaseDataBackend,
+        session: UserSession,
+        exclude: Union[MessagePrompt, MessageResponse] = None,
+    ) -> ChatHistory:
+        """
+        Returns the chat history of a session brought up to date with the backend,
+        optionally without a message (e.g. the prompt being replied).
+
+        The history returned is a copy, it can be changed by the caller
+        without changing the one in the store.
+        """
+        with self._lock:
+            stored = self._histories.get(session.session_id)
+            synced_at = self._synced_at.get(session.session_id)
+            if stored is not None:
+                self._histories.move_to_end(session.session_id)
+        metrics.increment(f"history_store.{'misses' if stored is None else 'hits'}")
+        # The messages saved while reading are read again on the next sync:
+        sync_started_at = datetime.utcnow()
+        if stored is None or sync_started_at - synced_at > self.sync_overlap:
+            history = ChatHistory(session=session)
+            await history.arefresh_from_backend(backend)
+            messages = history.messages
+        else:
+            # The messages saved since the last sync may be created before it,
+            # the messages already in the history are skipped:
+            since = synced_at - self.sync_overlap
+            messages = await backend.get_session_chat_history_since(session, since)
+        with self._lock:
+            if stored is None:
+                # Another reply of the session may have stored it meanwhile:
+                stored = self._histories.setdefault(
+                    session.session_id, ChatHistory(session=session)
+                )
+            # The session holds its usage and summary, the newest one is kept:
+            stored.session = session
+            stored.add_messages(messages)
+            # Its size is only counted while it is stored, it may have been dropped:
+            if self._histories.get(session.session_id) is stored:
+                self._synced_at[session.session_id] = max(
+                    sync_started_at,
+                    self._synced_at.get(session.session_id, sync_started_at),
+                )
+                self._resize(session.session_id, stored)
+            return stored.fork(exclude=exclude)
+
+    def _resize(self, session_id: str, history: ChatHistory) -> None:
+        """
+        Updates the size of a stored history and drops
+        the least recently used ones beyond `max_bytes`.
+        """
+        size = sum(
+            self.MESSAGE_OVERHEAD_BYTES
+            # The text is held by the message and by its chat representation:
+            + 2 * sys.getsizeof(message.body)
+            + sys.getsizeof(getattr(message, "media_url", None) or "")
+            for message in history.messages
+        )
+        self._size += size - self._sizes.get(session_id, 0)
+        self._sizes[session_id] = size
+        while self._size > self.max_bytes and len(self._histories) > 1:
+            dropped_id, _ = self._histories.popitem(last=False)
+            self._synced_at.pop(dropped_id, None)
+            self._size -= self._sizes.pop(dropped_id)
+            metrics.increment("history_store.evictions")
@@ -0,0 +1,184 @@
+import bisect
+from datetime import datetime, timedelta
+import heapq
+import itertools
+import threading
+from typing import Callable, Dict, List, Set, Tuple, Union
+
+from bright_chatbot.models import (
+    User,
+    UserSession,
+    MessagePrompt,
+    MessageResponse,
+    SessionUsage,
+    SessionSummary,
+)
+from bright_chatbot.backends.base_backend import BaseDataBackend, newest_messages
+from bright_chatbot.configs import settings
+
+
+class InMemoryBackend(BaseDataBackend):
+    """
+    Backend that keeps the data in the memory of the process, e.g. for tests,
+    benchmarks or deployments that run in a single process.
+
+    The data is indexed so every lookup is O(1), or O(log n) for the ones
+    that need to keep an order:
+
+    - The latest session of each user.
+    - The messages of each session, sorted by their creation time.
+    - The usage of each session, e.g. its number of prompts, and its summary.
+    - The active sessions, with a heap of their expiration times.
+
+    All the methods are safe to call from concurrent threads.
+    """
+
+    stores_session_summaries = True
+
+    def __init__(self, clock: Callable[[], datetime] = datetime.utcnow):
+        self._clock = clock
+        self._lock = threading.RLock()
+        # Latest session of each user, by hashed user id:
+        self._latest_sessions: Dict[str, UserSession] = {}
+        self._finished_sessions: Set[str] = set()
+        # Active sessions and a min-heap of their expiration times:
+        self._active_sessions: Set[str] = set()
+        self._expirations: List[Tuple[datetime, str]] = []
+        # Messages of each session as (created_at, sequence, message) entries:
+        self._messages: Dict[str, List[Tuple[datetime, int, object]]] = {}
+        self._usages: Dict[str, SessionUsage] = {}
+        self._summaries: Dict[str, SessionSummary] = {}
+        self._users_with_messages: Set[str] = set()
+        self._sequence = itertools.count()
+
+    def get_latest_user_session(self, user: User) -> Union[UserSession, None]:
+        with self._lock:
+            session = self._latest_sessions.get(user.hashed_user_id)
+            if session is None or not self._is_active(session):
+                return None
+            return session.copy(
+                update={
+                    "session_usage": self._usages.get(session.session_id),
+                    "session_summary": self._summaries.get(session.session_id),
+                }
+            )
+
+    def create_user_session(
+        self, user: User, sess_quota: int = settings.MAX_REQUESTS_PER_SESSION
+    ) -> UserSession:
+        now = self._clock()
+        session = UserSession(
+            user=user,
+            session_id=f"{user.hashed_user_id}:{now.timestamp()}",
+            session_start=now,
+            session_end=now + timedelta(minutes=settings.MAX_SESSION_DURATION_MINUTES),
+            session_quota=sess_quota,
+            session_usage=SessionUsage(),
+        )
+        with self._lock:
+            self._latest_sessions[user.hashed_user_id] = session
+            self._usages[session.session_id] = session.session_usage
+            self._active_sessions.add(session.session_id)
+            heapq.heappush(self._expirations, (session.session_end, session.session_id))
+        return session.copy()
+
+    def end_user_session(self, user: User) -> None:
+        with self._lock:
+            session = self._latest_sessions.get(user.hashed_user_id)
+            if session is None:
+                return
+            self._finished_sessions.add(session.session_id)
+            # Its entry in the heap of expirations is skipped once popped:
+            self._active_sessions.discard(session.session_id)
+
+    def does_user_exist(self, user: User) -> bool:
+        with self._lock:
+            return user.hashed_user_id in self._users_with_messages
+
+    def get_count_of_active_sessions(self) -> int:
+        with self._lock:
+            self._expire_sessions()
+            return len(self._active_sessions)
+
+    def get_count_of_session_prompts(self, session: UserSession) -> int:
+        with self._lock:
+            usage = self._usages.get(session.session_id)
+            return usage.prompts if usage else 0
+
+    def get_session_chat_history(
+        self,
+        session: UserSession,
+        max_messages: int = None,
+        max_characters: int = None,
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        with self._lock:
+            entries = self._messages.get(session.session_id, [])
+            messages = newest_messages(
+                (message for _, _, message in reversed(entries)),
+                max_messages=max_messages,
+                max_characters=max_characters,
+            )
+            return [message.copy() for message in messages]
+
+    def get_session_chat_history_since(
+        self, session: UserSession, since: datetime
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        since = since.timestamp()
+        with self._lock:
+            entries = self._messages.get(session.session_id, [])
+            # Only the newest messages are visited:
+            messages = list(
+                itertools.takewhile(
+                    lambda message: message.created_at.timestamp() > since,
+                    (message for _, _, message in reversed(entries)),
+                )
+            )
+            return [message.copy() for message in reversed(messages)]
+
+    def save_message_prompt(self, message: MessagePrompt, session: UserSession) -> None:
+        with self._lock:
+            self._add_message(message, session)
+
+    def save_message_response(
+        self, message: MessageResponse, session: UserSession
+    ) -> None:
+        with self._lock:
+            self._add_message(message, session)
+
+    def save_session_summary(
+        self, session: UserSession, summary: SessionSummary
+    ) -> None:
+        with self._lock:
+            previous = self._summaries.get(session.session_id)
+            if previous is None or not previous.includes_summary(summary):
+                self._summaries[session.session_id] = summary.copy()
+
+    def _add_message(
+        self, message: Union[MessagePrompt, MessageResponse], session: UserSession
+    ) -> None:
+        entries = self._messages.setdefault(session.session_id, [])
+        # Messages are mostly saved in order, which makes the insertion O(1):
+        entry = (message.created_at, next(self._sequence), message.copy())
+        if not entries or entries[-1][:2] <= entry[:2]:
+            entries.append(entry)
+        else:
+            bisect.insort(entries, entry)
+        self._users_with_messages.add(session.user.hashed_user_id)
+        usage = self._usages.get(session.session_id, SessionUsage())
+        self._usages[session.session_id] = usage.add(SessionUsage.of_message(message))
+
+    def _is_active(self, session: UserSession) -> bool:
+        return (
+            session.session_id not in self._finished_sessions
+            and session.session_end > self._clock()
+        )
+
+    def _expire_sessions(self) -> None:
+        """
+        Removes the expired sessions from the active ones,
+        in O(log n) per expired session.
+        """
+        now = self._clock()
+        while self._expirations and self._expirations[0][0] <= now:
+            _, session_id = heapq.heappop(self._expirations)
+            self._active_sessions.discard(session_id)
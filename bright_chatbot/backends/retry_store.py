@@ -0,0 +1,192 @@
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Tuple, Union
+
+from pydantic import BaseModel
+
+from bright_chatbot.models import (
+    MessagePrompt,
+    MessageResponse,
+    SessionSummary,
+    User,
+    UserSession,
+)
+from bright_chatbot.backends.base_backend import BaseDataBackend, message_key
+from bright_chatbot.utils.deadlines import Deadline
+
+
+class WriteRetryStore:
+    """
+    Store of the backend writes that failed, so they can be retried later
+    instead of failing the reply that made them.
+
+    Each failed write is appended as a JSON line to the file in `path`,
+    with the name of the backend method and its arguments.
+    The retries are best-effort: the writes are only kept as long as the file,
+    e.g. the writes stored in the `/tmp` of an AWS Lambda container are lost
+    when the container is recycled, and they are still logged when they fail.
+
+    A write that failed may still have been made (e.g. a write that timed out
+    but kept running), so the messages already saved are not saved again
+    when the writes are replayed.
+    """
+
+    # Writes of messages, with the messages (or the list of messages) first:
+    _MESSAGE_WRITES = ("save_message_prompt", "save_message_response", "save_messages")
+
+    _ARGUMENT_TYPES = {
+        model.__name__: model
+        for model in (MessagePrompt, MessageResponse, SessionSummary, User, UserSession)
+    }
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+        # Only one replay at a time, the writes are appended meanwhile:
+        self._replay_lock = threading.Lock()
+        self._logger = logging.getLogger(f"{__package__}.{self.__class__.__name__}")
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def append(self, operation: str, *args: BaseModel, error: str = None) -> None:
+        """
+        Stores a write that failed, e.g. `append("save_message_prompt", prompt, session)`.
+        The arguments are models or lists of models.
+        """
+        record = {
+            "operation": operation,
+            "args": [self._encode(arg) for arg in args],
+            "error": error,
+            "failed_at": datetime.utcnow().isoformat(),
+        }
+        with self._lock:
+            with open(self.path, "a+") as f:
+                # A line left unfinished (e.g. by a process killed while writing)
+                # must not be joined to this one:
+                if f.tell() > 0:
+                    f.seek(f.tell() - 1)
+                    if f.read(1) != "\n":
+                        f.write("\n")
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """
+        Returns the stored writes, oldest first.
+        """
+        with self._lock:
+            return self._read()
+
+    def replay(
+        self, backend: BaseDataBackend, deadline: Deadline = None
+    ) -> Tuple[int, int]:
+        """
+        Retries the stored writes in order against a backend.
+        The writes that fail again are kept for the next replay, along with
+        the ones not retried before the `deadline` (if any) expired.
+
+        The writes are retried without holding the lock of the store,
+        so the writes that fail meanwhile are stored without waiting for them.
+
+        Returns the number of writes that were replayed and that failed.
+        """
+        with self._replay_lock:
+            with self._lock:
+                records = self._read()
+            kept = []
+            replayed = failed = 0
+            for index, record in enumerate(records):
+                if deadline is not None and deadline.expired:
+                    kept.extend(records[index:])
+                    break
+                try:
+                    args = [self._decode(arg) for arg in record["args"]]
+                except Exception:
+                    # It can not succeed on a later replay either:
+                    self._logger.exception(f"Dropped the invalid write {record!r}")
+                    continue
+                try:
+                    self._replay_write(backend, record["operation"], args)
+                except Exception as e:
+                    self._logger.warning(
+                        f"Retry of the write '{record['operation']}' failed: {e!r}"
+                    )
+                    kept.append(dict(record, error=repr(e)))
+                    failed += 1
+                else:
+                    replayed += 1
+            with self._lock:
+                # The writes stored during the replay follow the ones it read:
+                self._write(kept + self._read()[len(records) :])
+        return replayed, failed
+
+    def _replay_write(
+        self, backend: BaseDataBackend, operation: str, args: List[Any]
+    ) -> None:
+        """
+        Makes a stored write, only with the messages that were not saved yet.
+        """
+        if operation in self._MESSAGE_WRITES:
+            messages = args[0] if isinstance(args[0], list) else [args[0]]
+            session = args[1]
+            unsaved = self._unsaved_messages(backend, messages, session)
+            if not unsaved:
+                self._logger.info(f"The write '{operation}' was already made")
+                return
+            if len(unsaved) < len(messages):
+                operation, args = "save_messages", [unsaved, session]
+        getattr(backend, operation)(*args)
+
+    @staticmethod
+    def _unsaved_messages(
+        backend: BaseDataBackend,
+        messages: List[Union[MessagePrompt, MessageResponse]],
+        session: UserSession,
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        since = min(m.created_at for m in messages) - timedelta(seconds=1)
+        saved = {
+            message_key(message)
+            for message in backend.get_session_chat_history_since(session, since)
+        }
+        return [m for m in messages if message_key(m) not in saved]
+
+    def _read(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # e.g. a line left unfinished by a process killed while writing:
+                    self._logger.error(f"Skipped an invalid line of {self.path}")
+        return records
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _encode(self, arg: Union[BaseModel, List[BaseModel]]) -> Dict[str, Any]:
+        # e.g. the messages of `save_messages`:
+        if isinstance(arg, list):
+            return {"type": "list", "data": [self._encode(item) for item in arg]}
+        return {"type": arg.__class__.__name__, "data": json.loads(arg.json())}
+
+    def _decode(self, arg: Dict[str, Any]) -> Union[BaseModel, List[BaseModel]]:
+        if arg["type"] == "list":
+            return [self._decode(item) for item in arg["data"]]
+        return self._ARGUMENT_TYPES[arg["type"]].parse_obj(arg["data"])
@@ -0,0 +1,302 @@
+import json
+from datetime import datetime
+from typing import Iterable, List, Union
+
+from sqlalchemy import create_engine, exists, func, insert, select, update
+from sqlalchemy.engine import Engine
+
+from bright_chatbot.models import (
+    User,
+    UserSession,
+    MessagePrompt,
+    MessageResponse,
+    UserSessionConfig,
+    SessionUsage,
+)
+from bright_chatbot.backends.base_backend import BaseDataBackend, newest_messages
+from bright_chatbot.backends.sql.tables import metadata, sessions, chat_messages
+from bright_chatbot.configs import settings
+from bright_chatbot.utils import get_utc_timestamp_now
+
+
+class SqlAlchemyBackend(BaseDataBackend):
+    """
+    Backend that uses a SQL database to store and retrieve data
+    through SQLAlchemy Core.
+
+    Every operation of the backend is done with a single statement,
+    using a connection from the pool of the engine.
+
+    :param url: SQLAlchemy URL of the database.
+        Defaults to the `SQL_DATABASE_URL` setting.
+    :param engine: Engine to use instead of creating one from the `url`.
+    :param pool_size: Number of connections kept open in the pool.
+        Defaults to the `SQL_POOL_SIZE` setting.
+    :param max_overflow: Number of extra connections allowed when the pool is in use.
+        Defaults to the `SQL_POOL_MAX_OVERFLOW` setting.
+    :param create_tables: Whether to create the tables that do not exist yet.
+    :param engine_kwargs: Extra arguments for `sqlalchemy.create_engine`.
+    """
+
+    def __init__(
+        self,
+        url: str = None,
+        engine: Engine = None,
+        pool_size: int = None,
+        max_overflow: int = None,
+        create_tables: bool = True,
+        **engine_kwargs,
+    ):
+        if engine is None:
+            engine = create_engine(
+                url or settings.SQL_DATABASE_URL,
+                pool_size=pool_size or settings.SQL_POOL_SIZE,
+                max_overflow=(
+                    settings.SQL_POOL_MAX_OVERFLOW
+                    if max_overflow is None
+                    else max_overflow
+                ),
+                pool_pre_ping=True,
+                **engine_kwargs,
+            )
+        self._engine = engine
+        if create_tables:
+            metadata.create_all(self._engine)
+
+    @property
+    def engine(self) -> Engine:
+        return self._engine
+
+    def close(self) -> None:
+        """
+        Closes all the connections of the pool.
+        """
+        self.engine.dispose()
+
+    def get_latest_user_session(self, user: User) -> Union[UserSession, None]:
+        # The usage of the session is counted from the indexes of its messages
+        # (the tokens are not stored):
+        prompts = (
+            select(func.count())
+            .where(
+                chat_messages.c.session_id == sessions.c.session_id,
+                chat_messages.c.chat_agent == "user",
+            )
+            .scalar_subquery()
+        )
+        images = (
+            select(func.count())
+            .where(
+                chat_messages.c.session_id == sessions.c.session_id,
+                chat_messages.c.image_uri.is_not(None),
+            )
+            .scalar_subquery()
+        )
+        query = (
+            select(
+                sessions.c.session_id,
+                sessions.c.timestamp_created,
+                sessions.c.session_ttl,
+                sessions.c.messages_quota,
+                sessions.c.session_config,
+                prompts.label("prompts"),
+                images.label("images"),
+            )
+            .where(
+                sessions.c.user_id == user.hashed_user_id,
+                sessions.c.timestamp_finished.is_(None),
+                sessions.c.session_ttl > get_utc_timestamp_now(),
+            )
+            .order_by(sessions.c.timestamp_created.desc())
+            .limit(1)
+        )
+        with self.engine.connect() as conn:
+            row = conn.execute(query).first()
+        if not row:
+            return None
+        return UserSession(
+            user=user,
+            session_id=row.session_id,
+            session_start=row.timestamp_created,
+            session_end=row.session_ttl,
+            session_quota=row.messages_quota,
+            session_config=UserSessionConfig(**json.loads(row.session_config)),
+            session_usage=SessionUsage(prompts=row.prompts, images=row.images),
+        )
+
+    def create_user_session(
+        self, user: User, sess_quota: int = settings.MAX_REQUESTS_PER_SESSION
+    ) -> UserSession:
+        timestamp = get_utc_timestamp_now()
+        session_id = f"{user.hashed_user_id}:{timestamp}"
+        ttl = timestamp + 60 * settings.MAX_SESSION_DURATION_MINUTES
+        with self.engine.begin() as conn:
+            conn.execute(
+                insert(sessions).values(
+                    user_id=user.hashed_user_id,
+                    timestamp_created=timestamp,
+                    session_id=session_id,
+                    messages_quota=sess_quota,
+                    session_config=json.dumps({}),  # Use default values
+                    session_ttl=ttl,
+                )
+            )
+        return UserSession(
+            user=user,
+            session_id=session_id,
+            session_start=timestamp,
+            session_end=ttl,
+            session_quota=sess_quota,
+            session_usage=SessionUsage(),
+        )
+
+    def end_user_session(self, user: User) -> None:
+        timestamp = get_utc_timestamp_now()
+        latest_created = (
+            select(func.max(sessions.c.timestamp_created))
+            .where(sessions.c.user_id == user.hashed_user_id)
+            .scalar_subquery()
+        )
+        statement = (
+            update(sessions)
+            .where(
+                sessions.c.user_id == user.hashed_user_id,
+                sessions.c.timestamp_created == latest_created,
+                sessions.c.timestamp_finished.is_(None),
+                sessions.c.session_ttl > timestamp,
+            )
+            .values(timestamp_finished=timestamp)
+        )
+        with self.engine.begin() as conn:
+            conn.execute(statement)
+
+    def does_user_exist(self, user: User) -> bool:
+        query = select(exists().where(chat_messages.c.user_id == user.hashed_user_id))
+        with self.engine.connect() as conn:
+            return bool(conn.execute(query).scalar())
+
+    def get_count_of_active_sessions(self) -> int:
+        query = (
+            select(func.count())
+            .select_from(sessions)
+            .where(
+                sessions.c.session_ttl > get_utc_timestamp_now(),
+                sessions.c.timestamp_finished.is_(None),
+            )
+        )
+        with self.engine.connect() as conn:
+            return conn.execute(query).scalar()
+
+    def get_count_of_session_prompts(self, session: UserSession) -> int:
+        query = (
+            select(func.count())
+            .select_from(chat_messages)
+            .where(
+                chat_messages.c.session_id == session.session_id,
+                chat_messages.c.chat_agent == "user",
+            )
+        )
+        with self.engine.connect() as conn:
+            return conn.execute(query).scalar()
+
+    def get_session_chat_history(
+        self,
+        session: UserSession,
+        max_messages: int = None,
+        max_characters: int = None,
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        # Newest first, so that only the newest messages are read from the index:
+        query = (
+            select(
+                chat_messages.c.timestamp_created,
+                chat_messages.c.chat_agent,
+                chat_messages.c.message,
+                chat_messages.c.image_uri,
+            )
+            .where(chat_messages.c.session_id == session.session_id)
+            .order_by(
+                chat_messages.c.timestamp_created.desc(), chat_messages.c.id.desc()
+            )
+            .limit(max_messages)
+        )
+        with self.engine.connect() as conn:
+            rows = conn.execute(query)
+            return newest_messages(
+                (self._parse_message(row, session.user) for row in rows),
+                max_messages=max_messages,
+                max_characters=max_characters,
+            )
+
+    def get_session_chat_history_since(
+        self, session: UserSession, since: datetime
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        query = (
+            select(
+                chat_messages.c.timestamp_created,
+                chat_messages.c.chat_agent,
+                chat_messages.c.message,
+                chat_messages.c.image_uri,
+            )
+            .where(
+                chat_messages.c.session_id == session.session_id,
+                chat_messages.c.timestamp_created > since.timestamp(),
+            )
+            .order_by(chat_messages.c.timestamp_created, chat_messages.c.id)
+        )
+        with self.engine.connect() as conn:
+            rows = conn.execute(query)
+            return [self._parse_message(row, session.user) for row in rows]
+
+    @staticmethod
+    def _parse_message(row, user: User) -> Union[MessagePrompt, MessageResponse]:
+        if row.chat_agent == "user":
+            return MessagePrompt(
+                body=row.message,
+                created_at=row.timestamp_created,
+                from_user=user,
+            )
+        elif row.chat_agent == "assistant":
+            return MessageResponse(
+                body=row.message,
+                created_at=row.timestamp_created,
+                to_user=user,
+                media_url=row.image_uri,
+            )
+        raise ValueError("Invalid agent type. Got: '{}'".format(row.chat_agent))
+
+    def save_message_prompt(self, message: MessagePrompt, session: UserSession) -> None:
+        self.save_messages([message], session)
+
+    def save_message_response(
+        self, message: MessageResponse, session: UserSession
+    ) -> None:
+        self.save_messages([message], session)
+
+    def save_messages(
+        self,
+        messages: Iterable[Union[MessagePrompt, MessageResponse]],
+        session: UserSession,
+    ) -> None:
+        """
+        Saves several messages of a session, e.g. a prompt and its response,
+        with a single multi-row insert.
+        """
+        rows = [
+            {
+                "session_id": session.session_id,
+                "user_id": session.user.hashed_user_id,
+                "timestamp_created": message.created_at.timestamp(),
+                "chat_agent": (
+                    "user" if isinstance(message, MessagePrompt) else "assistant"
+                ),
+                "message": message.body,
+                "message_length": len(message.body),
+                "user_chat_plan": session.session_config.user_plan,
+                "image_uri": getattr(message, "media_url", None),
+            }
+            for message in messages
+        ]
+        if not rows:
+            return
+        with self.engine.begin() as conn:
+            conn.execute(insert(chat_messages).values(rows))
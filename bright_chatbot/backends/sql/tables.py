@@ -0,0 +1,45 @@
+from sqlalchemy import Column, Float, Index, Integer, MetaData, String, Table, Text
+
+metadata = MetaData()
+
+# Equivalent of the Sessions table of the DynamoDB backend.
+sessions = Table(
+    "sessions",
+    metadata,
+    Column("user_id", String(64), primary_key=True),
+    Column("timestamp_created", Float, primary_key=True, autoincrement=False),
+    Column("session_id", String(128), nullable=False, unique=True),
+    Column("timestamp_finished", Float, nullable=True),
+    Column("messages_quota", Integer, nullable=False),
+    Column("session_config", Text, nullable=False),
+    Column("session_ttl", Float, nullable=False),
+    # Answers the count of active sessions from the index only:
+    Index("ix_sessions_active", "session_ttl", "timestamp_finished"),
+)
+
+# Equivalent of both the Chats and ChatMessages tables of the DynamoDB backend,
+# so a message is saved with a single insert.
+chat_messages = Table(
+    "chat_messages",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("session_id", String(128), nullable=False),
+    Column("user_id", String(64), nullable=False),
+    Column("timestamp_created", Float, nullable=False),
+    Column("chat_agent", String(16), nullable=False),
+    Column("message", Text, nullable=False),
+    Column("message_length", Integer, nullable=False),
+    Column("user_chat_plan", String(64), nullable=True),
+    Column("image_uri", Text, nullable=True),
+    # Answers the count of prompts of a session from the index only:
+    Index("ix_chat_messages_agents", "session_id", "chat_agent"),
+    # Reads the history of a session in order, and from the index only in Postgres:
+    Index(
+        "ix_chat_messages_history",
+        "session_id",
+        "timestamp_created",
+        "id",
+        postgresql_include=["chat_agent", "message", "image_uri"],
+    ),
+    Index("ix_chat_messages_users", "user_id"),
+)
@@ -0,0 +1,322 @@
+import json
+from datetime import datetime
+import sqlite3
+import threading
+from typing import Iterable, List, Union
+
+from bright_chatbot.models import (
+    User,
+    UserSession,
+    MessagePrompt,
+    MessageResponse,
+    UserSessionConfig,
+    SessionUsage,
+)
+from bright_chatbot.backends.base_backend import BaseDataBackend, newest_messages
+from bright_chatbot.configs import settings
+from bright_chatbot.utils import get_utc_timestamp_now
+
+# The tables are clustered by the keys they are queried with,
+# and the indexes hold every column their queries read,
+# so none of the queries has to look up the rows of the tables.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    session_id TEXT NOT NULL,
+    session_end REAL NOT NULL,
+    finished_at REAL,
+    messages_quota INTEGER NOT NULL,
+    session_config TEXT NOT NULL,
+    PRIMARY KEY (user_id, created_at)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS sessions_active
+    ON sessions (session_end, finished_at);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    agent TEXT NOT NULL,
+    body TEXT NOT NULL,
+    media_url TEXT
+);
+
+CREATE INDEX IF NOT EXISTS messages_history
+    ON messages (session_id, created_at, id, agent, body, media_url);
+
+CREATE INDEX IF NOT EXISTS messages_agents
+    ON messages (session_id, agent);
+
+CREATE INDEX IF NOT EXISTS messages_users
+    ON messages (user_id);
+"""
+
+# Statements are kept as constants so every call reuses
+# the statement prepared by the connection the first time.
+# The usage of the session is counted from the indexes of the messages only
+# (the tokens are not stored):
+SELECT_LATEST_SESSION = """
+SELECT
+    session_id,
+    created_at,
+    session_end,
+    messages_quota,
+    session_config,
+    (
+        SELECT COUNT(*) FROM messages
+        WHERE messages.session_id = sessions.session_id AND agent = 'user'
+    ),
+    (
+        SELECT COUNT(*) FROM messages
+        WHERE messages.session_id = sessions.session_id AND media_url IS NOT NULL
+    )
+FROM sessions
+WHERE user_id = ? AND finished_at IS NULL AND session_end > ?
+ORDER BY created_at DESC
+LIMIT 1
+"""
+
+INSERT_SESSION = """
+INSERT INTO sessions (
+    user_id, created_at, session_id, session_end, messages_quota, session_config
+) VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+FINISH_LATEST_SESSION = """
+UPDATE sessions SET finished_at = ?
+WHERE user_id = ? AND created_at = (
+    SELECT MAX(created_at) FROM sessions WHERE user_id = ?
+) AND finished_at IS NULL AND session_end > ?
+"""
+
+SELECT_USER_EXISTS = "SELECT EXISTS (SELECT 1 FROM messages WHERE user_id = ?)"
+
+COUNT_ACTIVE_SESSIONS = """
+SELECT COUNT(*) FROM sessions WHERE session_end > ? AND finished_at IS NULL
+"""
+
+COUNT_SESSION_PROMPTS = """
+SELECT COUNT(*) FROM messages WHERE session_id = ? AND agent = 'user'
+"""
+
+# Newest first, so that only the newest messages are read from the index,
+# a negative limit reads all of them:
+SELECT_SESSION_MESSAGES = """
+SELECT created_at, agent, body, media_url
+FROM messages
+WHERE session_id = ?
+ORDER BY created_at DESC, id DESC
+LIMIT ?
+"""
+
+SELECT_SESSION_MESSAGES_SINCE = """
+SELECT created_at, agent, body, media_url
+FROM messages
+WHERE session_id = ? AND created_at > ?
+ORDER BY created_at, id
+"""
+
+INSERT_MESSAGE = """
+INSERT INTO messages (
+    session_id, user_id, created_at, agent, body, media_url
+) VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+class SqliteBackend(BaseDataBackend):
+    """
+    Backend that uses a SQLite database file to store and retrieve data.
+
+    The database is opened in WAL mode, so the reads are not blocked
+    by the writes, and each thread reuses its own connection.
+    """
+
+    STATEMENTS_CACHE_SIZE = 32
+
+    def __init__(self, database: str = None, timeout: float = 5.0):
+        self._database = database or settings.SQLITE_DATABASE_PATH
+        self._timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        with self.connection as conn:
+            conn.executescript(SCHEMA)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        Connection of the current thread to the database.
+        """
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.connection = conn
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self._database,
+            timeout=self._timeout,
+            cached_statements=self.STATEMENTS_CACHE_SIZE,
+            check_same_thread=False,
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        # Commits are only synced on checkpoints, which is safe with WAL:
+        conn.execute("PRAGMA synchronous = NORMAL")
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """
+        Closes the connections of all the threads.
+        """
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def get_latest_user_session(self, user: User) -> Union[UserSession, None]:
+        row = self.connection.execute(
+            SELECT_LATEST_SESSION, (user.hashed_user_id, get_utc_timestamp_now())
+        ).fetchone()
+        if not row:
+            return None
+        session_id, created_at, session_end, quota, session_config, *usage = row
+        prompts, images = usage
+        return UserSession(
+            user=user,
+            session_id=session_id,
+            session_start=created_at,
+            session_end=session_end,
+            session_quota=quota,
+            session_config=UserSessionConfig(**json.loads(session_config)),
+            session_usage=SessionUsage(prompts=prompts, images=images),
+        )
+
+    def create_user_session(
+        self, user: User, sess_quota: int = settings.MAX_REQUESTS_PER_SESSION
+    ) -> UserSession:
+        timestamp = get_utc_timestamp_now()
+        session_id = f"{user.hashed_user_id}:{timestamp}"
+        session_end = timestamp + 60 * settings.MAX_SESSION_DURATION_MINUTES
+        with self.connection as conn:
+            conn.execute(
+                INSERT_SESSION,
+                (
+                    user.hashed_user_id,
+                    timestamp,
+                    session_id,
+                    session_end,
+                    sess_quota,
+                    json.dumps({}),  # Use default values
+                ),
+            )
+        return UserSession(
+            user=user,
+            session_id=session_id,
+            session_start=timestamp,
+            session_end=session_end,
+            session_quota=sess_quota,
+            session_usage=SessionUsage(),
+        )
+
+    def end_user_session(self, user: User) -> None:
+        timestamp = get_utc_timestamp_now()
+        with self.connection as conn:
+            conn.execute(
+                FINISH_LATEST_SESSION,
+                (timestamp, user.hashed_user_id, user.hashed_user_id, timestamp),
+            )
+
+    def does_user_exist(self, user: User) -> bool:
+        row = self.connection.execute(
+            SELECT_USER_EXISTS, (user.hashed_user_id,)
+        ).fetchone()
+        return bool(row[0])
+
+    def get_count_of_active_sessions(self) -> int:
+        row = self.connection.execute(
+            COUNT_ACTIVE_SESSIONS, (get_utc_timestamp_now(),)
+        ).fetchone()
+        return row[0]
+
+    def get_count_of_session_prompts(self, session: UserSession) -> int:
+        row = self.connection.execute(
+            COUNT_SESSION_PROMPTS, (session.session_id,)
+        ).fetchone()
+        return row[0]
+
+    def get_session_chat_history(
+        self,
+        session: UserSession,
+        max_messages: int = None,
+        max_characters: int = None,
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        rows = self.connection.execute(
+            SELECT_SESSION_MESSAGES,
+            (session.session_id, -1 if max_messages is None else max_messages),
+        )
+        # The rows are fetched as they are consumed:
+        return newest_messages(
+            (self._parse_message(row, session.user) for row in rows),
+            max_messages=max_messages,
+            max_characters=max_characters,
+        )
+
+    def get_session_chat_history_since(
+        self, session: UserSession, since: datetime
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        rows = self.connection.execute(
+            SELECT_SESSION_MESSAGES_SINCE, (session.session_id, since.timestamp())
+        )
+        return [self._parse_message(row, session.user) for row in rows]
+
+    @staticmethod
+    def _parse_message(row: tuple, user: User) -> Union[MessagePrompt, MessageResponse]:
+        created_at, agent, body, media_url = row
+        if agent == "user":
+            return MessagePrompt(body=body, created_at=created_at, from_user=user)
+        elif agent == "assistant":
+            return MessageResponse(
+                body=body,
+                created_at=created_at,
+                to_user=user,
+                media_url=media_url,
+            )
+        raise ValueError("Invalid agent type. Got: '{}'".format(agent))
+
+    def save_message_prompt(self, message: MessagePrompt, session: UserSession) -> None:
+        self.save_messages([message], session)
+
+    def save_message_response(
+        self, message: MessageResponse, session: UserSession
+    ) -> None:
+        self.save_messages([message], session)
+
+    def save_messages(
+        self,
+        messages: Iterable[Union[MessagePrompt, MessageResponse]],
+        session: UserSession,
+    ) -> None:
+        """
+        Saves several messages of a session, e.g. a prompt and its response,
+        with a single statement in a single transaction.
+        """
+        rows = [
+            (
+                session.session_id,
+                session.user.hashed_user_id,
+                message.created_at.timestamp(),
+                "user" if isinstance(message, MessagePrompt) else "assistant",
+                message.body,
+                getattr(message, "media_url", None),
+            )
+            for message in messages
+        ]
+        with self.connection as conn:
+            conn.executemany(INSERT_MESSAGE, rows)
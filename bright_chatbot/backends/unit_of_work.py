@@ -0,0 +1,193 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple, Union
+
+from bright_chatbot.models import (
+    User,
+    UserSession,
+    MessagePrompt,
+    MessageResponse,
+    SessionSummary,
+)
+from bright_chatbot.backends.base_backend import (
+    AsyncBaseDataBackend,
+    aread_chat_history,
+    messages_since,
+    newest_messages,
+)
+
+
+class UnitOfWork(AsyncBaseDataBackend):
+    """
+    Asynchronous backend that shares the reads made while replying to a prompt.
+
+    The chat history of a session is read once from the wrapped backend,
+    even if it is requested by several concurrent steps of the reply,
+    and the count of prompts of the session is derived from it.
+    The messages saved through the unit of work are merged into the history read,
+    so the reads after a write do not need to read the backend again.
+
+    A unit of work is meant to live for a single reply, so it never sees
+    the messages saved by other processes after its first read
+    unless it is told to `invalidate` it.
+
+    If `buffer_writes` is True, the messages saved through the unit of work
+    are not written to the backend until they are taken with
+    `pop_buffered_writes`, so that they can be written together.
+    """
+
+    def __init__(self, backend: AsyncBaseDataBackend, buffer_writes: bool = False):
+        self._backend = backend
+        self._buffer_writes = buffer_writes
+        # Reads by session id and the limits they were read with:
+        self._histories: Dict[Tuple[str, int, int], asyncio.Task] = {}
+        self._saved: Dict[str, List[Union[MessagePrompt, MessageResponse]]] = {}
+        self._buffered: Dict[
+            str, Tuple[UserSession, List[Union[MessagePrompt, MessageResponse]]]
+        ] = {}
+
+    @property
+    def backend(self) -> AsyncBaseDataBackend:
+        """
+        Backend wrapped by the unit of work.
+        """
+        return self._backend
+
+    def pop_buffered_writes(
+        self,
+    ) -> List[Tuple[List[Union[MessagePrompt, MessageResponse]], UserSession]]:
+        """
+        Returns the messages saved since the last call that were not written
+        to the backend yet, grouped by session, and forgets them.
+        """
+        buffered, self._buffered = self._buffered, {}
+        return [(messages, session) for session, messages in buffered.values()]
+
+    def invalidate(self, session: UserSession) -> None:
+        """
+        Reads the history of the session again from the backend the next time
+        it is requested, e.g. to see the messages saved by other processes.
+        """
+        for key in [key for key in self._histories if key[0] == session.session_id]:
+            del self._histories[key]
+
+    async def _read_history(
+        self,
+        session: UserSession,
+        max_messages: int = None,
+        max_characters: int = None,
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        key = (session.session_id, max_messages, max_characters)
+        task = self._histories.get(key)
+        if task is None or task.cancelled() or (task.done() and task.exception()):
+            task = asyncio.ensure_future(
+                aread_chat_history(self.backend, session, max_messages, max_characters)
+            )
+            self._histories[key] = task
+        # The read is shared, a step that is cancelled must not cancel it:
+        messages = list(await asyncio.shield(task))
+        for saved in self._saved.get(session.session_id, []):
+            if not any(self._is_same_message(saved, m) for m in messages):
+                messages.append(saved)
+        messages.sort(key=lambda m: m.created_at.timestamp())
+        if max_messages is None and max_characters is None:
+            return messages
+        return newest_messages(reversed(messages), max_messages, max_characters)
+
+    @staticmethod
+    def _is_same_message(
+        message: Union[MessagePrompt, MessageResponse],
+        other: Union[MessagePrompt, MessageResponse],
+    ) -> bool:
+        # The messages read from the backend do not compare equal to the original
+        # ones (e.g. their timestamps are timezone aware), so match on the content:
+        return (
+            type(message) is type(other)
+            and message.body == other.body
+            and abs(message.created_at.timestamp() - other.created_at.timestamp())
+            < 1e-3
+        )
+
+    async def get_session_chat_history(
+        self,
+        session: UserSession,
+        max_messages: int = None,
+        max_characters: int = None,
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        return await self._read_history(session, max_messages, max_characters)
+
+    async def get_session_chat_history_since(
+        self, session: UserSession, since: datetime
+    ) -> List[Union[MessagePrompt, MessageResponse]]:
+        # Not shared, each call reads the messages saved meanwhile:
+        messages = await self.backend.get_session_chat_history_since(session, since)
+        for saved in messages_since(self._saved.get(session.session_id, []), since):
+            if not any(self._is_same_message(saved, m) for m in messages):
+                messages.append(saved)
+        messages.sort(key=lambda m: m.created_at.timestamp())
+        return messages
+
+    async def get_count_of_session_prompts(self, session: UserSession) -> int:
+        messages = await self._read_history(session)
+        return sum(isinstance(m, MessagePrompt) for m in messages)
+
+    def _buffer(
+        self, message: Union[MessagePrompt, MessageResponse], session: UserSession
+    ) -> bool:
+        """
+        Adds a saved message to the history read, and to the buffered writes
+        if they are buffered. Returns whether it was buffered.
+        """
+        self._saved.setdefault(session.session_id, []).append(message)
+        if not self._buffer_writes:
+            return False
+        _, messages = self._buffered.setdefault(session.session_id, (session, []))
+        messages.append(message)
+        return True
+
+    async def save_message_prompt(
+        self, prompt: MessagePrompt, user_session: UserSession
+    ) -> None:
+        if not self._buffer(prompt, user_session):
+            return await self.backend.save_message_prompt(prompt, user_session)
+
+    async def save_message_response(
+        self, response: MessageResponse, user_session: UserSession
+    ) -> None:
+        if not self._buffer(response, user_session):
+            return await self.backend.save_message_response(response, user_session)
+
+    async def save_messages(
+        self,
+        messages: Iterable[Union[MessagePrompt, MessageResponse]],
+        user_session: UserSession,
+    ) -> None:
+        messages = list(messages)
+        for message in messages:
+            self._buffer(message, user_session)
+        if not self._buffer_writes:
+            return await self.backend.save_messages(messages, user_session)
+
+    @property
+    def stores_session_summaries(self) -> bool:
+        return self.backend.stores_session_summaries
+
+    async def save_session_summary(
+        self, user_session: UserSession, summary: SessionSummary
+    ) -> None:
+        return await self.backend.save_session_summary(user_session, summary)
+
+    async def get_latest_user_session(self, user: User) -> Union[UserSession, None]:
+        return await self.backend.get_latest_user_session(user)
+
+    async def create_user_session(self, user: User, **kwargs) -> UserSession:
+        return await self.backend.create_user_session(user, **kwargs)
+
+    async def end_user_session(self, user: User) -> None:
+        return await self.backend.end_user_session(user)
+
+    async def does_user_exist(self, user: User) -> bool:
+        return await self.backend.does_user_exist(user)
+
+    async def get_count_of_active_sessions(self) -> int:
+        return await self.backend.get_count_of_active_sessions()
@@ -0,0 +1,8 @@
+"""
+Offline benchmark of the reply pipeline, run it with `python -m bright_chatbot.benchmarks`.
+"""
+
+from .corpus import CorpusMessage, load_corpus, save_corpus, generate_synthetic_corpus
+from .fakes import LatencyDistribution, FakeOpenAI, FakeBackend, FakeProvider
+from .runner import BenchmarkReport, run_benchmark, run_benchmark_async
+from .settings_access import measure_settings_access, format_settings_access
@@ -0,0 +1,121 @@
+import argparse
+import json
+import logging
+import os
+
+# The benchmark never calls the real services, but the settings are still required:
+os.environ.setdefault("BRIGHT_CHATBOT_SECRET_KEY", "benchmark")
+os.environ.setdefault("BRIGHT_CHATBOT_OPENAI_API_KEY", "benchmark")
+
+from bright_chatbot.benchmarks import (
+    FakeBackend,
+    FakeOpenAI,
+    FakeProvider,
+    LatencyDistribution,
+    format_settings_access,
+    generate_synthetic_corpus,
+    load_corpus,
+    measure_settings_access,
+    run_benchmark,
+    save_corpus,
+)
+from bright_chatbot.utils.metrics import MetricsRegistry
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m bright_chatbot.benchmarks",
+        description=(
+            "Replays a corpus of messages through the reply pipeline against "
+            "fakes of OpenAI, the backend and the provider."
+        ),
+    )
+    corpus = parser.add_mutually_exclusive_group(required=True)
+    corpus.add_argument("--corpus", help="JSONL file with the messages to replay")
+    corpus.add_argument(
+        "--synthetic",
+        type=int,
+        metavar="N",
+        help="Replay N synthetic messages from Zipf distributed users",
+    )
+    corpus.add_argument(
+        "--settings-access",
+        type=int,
+        metavar="N",
+        help="Time N accesses to each of the settings read by every reply",
+    )
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--zipf-exponent", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--save-corpus", help="Save the synthetic corpus to this JSONL file"
+    )
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=None)
+    latency_help = "Latency spec: constant:S, uniform:A,B or lognormal:MEDIAN,SIGMA"
+    parser.add_argument(
+        "--chat-latency", default="lognormal:1.0,0.4", help=latency_help
+    )
+    parser.add_argument(
+        "--moderation-latency", default="lognormal:0.2,0.3", help=latency_help
+    )
+    parser.add_argument(
+        "--image-latency", default="lognormal:6.0,0.3", help=latency_help
+    )
+    parser.add_argument(
+        "--backend-latency", default="lognormal:0.01,0.5", help=latency_help
+    )
+    parser.add_argument(
+        "--provider-latency", default="lognormal:0.15,0.3", help=latency_help
+    )
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+    if args.settings_access:
+        results = measure_settings_access(args.settings_access)
+        if args.json:
+            print(json.dumps(results, indent=2))
+        else:
+            print(format_settings_access(results))
+        return
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        corpus = generate_synthetic_corpus(
+            args.synthetic,
+            n_users=args.users,
+            zipf_exponent=args.zipf_exponent,
+            seed=args.seed,
+        )
+        if args.save_corpus:
+            save_corpus(corpus, args.save_corpus)
+    calls = MetricsRegistry()
+
+    def latency(spec: str) -> LatencyDistribution:
+        return LatencyDistribution.parse(spec, seed=args.seed)
+
+    report = run_benchmark(
+        corpus,
+        concurrency=args.concurrency,
+        n_threads=args.threads,
+        openai_lib=FakeOpenAI(
+            chat_latency=latency(args.chat_latency),
+            moderation_latency=latency(args.moderation_latency),
+            image_latency=latency(args.image_latency),
+            calls=calls,
+        ),
+        backend=FakeBackend(latency=latency(args.backend_latency), calls=calls),
+        provider=FakeProvider(latency=latency(args.provider_latency), calls=calls),
+    )
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=2))
+    else:
+        print(report.format())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import json
+import random
+from typing import Iterator, List
+
+from pydantic import BaseModel
+
+
+class CorpusMessage(BaseModel):
+    """
+    A message of a benchmark corpus, sent by `user_id`.
+
+    `offset` is the time in seconds since the start of the corpus when the
+    message is received, it only matters to order the messages.
+    """
+
+    user_id: str
+    message: str
+    offset: float = 0.0
+
+
+def load_corpus(path: str) -> List[CorpusMessage]:
+    """
+    Loads a corpus from a JSONL file with one message per line, e.g.:
+
+        {"user_id": "34600000001", "message": "Hi!", "offset": 0.5}
+
+    The messages are returned sorted by their offset.
+    """
+    with open(path) as f:
+        messages = [CorpusMessage.parse_raw(line) for line in f if line.strip()]
+    return sorted(messages, key=lambda m: m.offset)
+
+
+def save_corpus(messages: List[CorpusMessage], path: str) -> None:
+    """
+    Saves a corpus to a JSONL file that can be read by `load_corpus`.
+    """
+    with open(path, "w") as f:
+        for message in messages:
+            f.write(message.json() + "\n")
+
+
+_WORDS = (
+    "hello how are you can help me write a poem about the sea explain what "
+    "is quantum computing draw cat with hat thanks tell joke recipe for "
+    "dinner tonight translate this into spanish please why sky blue"
+).split()
+
+
+def generate_synthetic_corpus(
+    n_messages: int,
+    n_users: int = 100,
+    zipf_exponent: float = 1.1,
+    message_rate: float = 10.0,
+    seed: int = None,
+) -> List[CorpusMessage]:
+    """
+    Generates a corpus of random messages where the number of messages per user
+    follows a Zipf-like distribution: the user of rank `k` sends messages with a
+    probability proportional to `1 / k ** zipf_exponent`, so a few users are
+    responsible for most of the traffic.
+
+    The messages arrive as a Poisson process of `message_rate` messages per second.
+    """
+    rng = random.Random(seed)
+    users = [f"3460{i:07d}" for i in range(n_users)]
+    weights = [1 / (rank**zipf_exponent) for rank in range(1, n_users + 1)]
+    messages = []
+    offset = 0.0
+    for user_id in rng.choices(users, weights=weights, k=n_messages):
+        offset += rng.expovariate(message_rate)
+        words = rng.choices(_WORDS, k=rng.randint(2, 20))
+        messages.append(
+            CorpusMessage(user_id=user_id, message=" ".join(words), offset=offset)
+        )
+    return messages
+
+
+def iter_user_conversations(messages: List[CorpusMessage]) -> Iterator[List[int]]:
+    """
+    Yields the indexes of the messages of each user, in order.
+    """
+    conversations = {}
+    for index, message in enumerate(messages):
+        conversations.setdefault(message.user_id, []).append(index)
+    yield from conversations.values()
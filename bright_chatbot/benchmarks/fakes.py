@@ -0,0 +1,221 @@
+import asyncio
+import math
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Union
+
+import openai
+from openai.util import convert_to_openai_object
+
+from bright_chatbot import models
+from bright_chatbot.backends.memory.backend import InMemoryBackend
+from bright_chatbot.providers.base_provider import BaseProvider
+from bright_chatbot.utils.metrics import MetricsRegistry
+
+
+class LatencyDistribution:
+    """
+    Random latency, in seconds, of the calls to an external service.
+
+    Distributions are built from a spec `<kind>:<params>` with `parse`:
+
+    - `constant:S`: Always `S` seconds.
+    - `uniform:A,B`: Between `A` and `B` seconds.
+    - `lognormal:MEDIAN,SIGMA`: Long tailed latency with the given median
+        and the standard deviation `SIGMA` of its logarithm.
+    """
+
+    KINDS = ("constant", "uniform", "lognormal")
+
+    def __init__(self, kind: str = "constant", *params: float, seed: int = None):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution '{kind}'")
+        self.kind = kind
+        self.params = params or (0.0,)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec: str, seed: int = None) -> "LatencyDistribution":
+        kind, _, params = spec.partition(":")
+        return cls(kind, *[float(p) for p in params.split(",") if p], seed=seed)
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "uniform":
+                return self._rng.uniform(*self.params)
+            if self.kind == "lognormal":
+                median, sigma = self.params
+                return self._rng.lognormvariate(math.log(median), sigma)
+            return self.params[0]
+
+    def __repr__(self) -> str:
+        return f"{self.kind}:{','.join(str(p) for p in self.params)}"
+
+
+class _FakeAPIResource:
+    def __init__(self, fake: "FakeOpenAI", name: str, latency: LatencyDistribution):
+        self._fake = fake
+        self._name = name
+        self._latency = latency
+
+    async def _call(self) -> None:
+        self._fake.calls.increment(f"openai.{self._name}")
+        await asyncio.sleep(self._latency.sample())
+
+
+class _FakeChatCompletion(_FakeAPIResource):
+    async def acreate(self, messages: List[Dict[str, str]], stream=False, **_):
+        await self._call()
+        answer = self._fake.answer
+        prompt_tokens = sum(len(m["content"].split()) for m in messages)
+        if stream:
+            return self._stream(answer)
+        return convert_to_openai_object(
+            {
+                "choices": [{"message": {"role": "assistant", "content": answer}}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(answer.split()),
+                    "total_tokens": prompt_tokens + len(answer.split()),
+                },
+            }
+        )
+
+    async def _stream(self, answer: str) -> AsyncIterator[Any]:
+        for word in answer.split(" "):
+            yield convert_to_openai_object(
+                {"choices": [{"delta": {"content": word + " "}}]}
+            )
+
+
+class _FakeModeration(_FakeAPIResource):
+    async def acreate(self, input: Union[str, List[str]], **_):
+        await self._call()
+        inputs = input if isinstance(input, list) else [input]
+        return {"results": [{"flagged": False} for _ in inputs]}
+
+
+class _FakeImage(_FakeAPIResource):
+    async def acreate(self, **_):
+        await self._call()
+        return {"data": [{"url": "https://example.com/image.png"}]}
+
+
+class FakeOpenAI:
+    """
+    In-process fake of the `openai` module that answers every chat completion
+    with `answer` after a random latency.
+
+    It can be given to the clients with their `openai_lib` argument.
+    """
+
+    InvalidRequestError = openai.InvalidRequestError
+
+    def __init__(
+        self,
+        chat_latency: LatencyDistribution = None,
+        moderation_latency: LatencyDistribution = None,
+        image_latency: LatencyDistribution = None,
+        answer: str = "Sure! Here is my answer to your message.",
+        calls: MetricsRegistry = None,
+    ):
+        self.answer = answer
+        self.calls = calls or MetricsRegistry()
+        self.ChatCompletion = _FakeChatCompletion(
+            self, "chat_completion", chat_latency or LatencyDistribution()
+        )
+        self.Moderation = _FakeModeration(
+            self, "moderation", moderation_latency or LatencyDistribution()
+        )
+        self.Image = _FakeImage(self, "image", image_latency or LatencyDistribution())
+
+
+class FakeBackend(InMemoryBackend):
+    """
+    In-memory backend that blocks for a random latency on every call,
+    as the DynamoDB backend does.
+
+    Every user is considered to exist already unless `all_users_exist` is False,
+    in which case their first message is answered with the greeting.
+    """
+
+    def __init__(
+        self,
+        latency: LatencyDistribution = None,
+        all_users_exist: bool = True,
+        calls: MetricsRegistry = None,
+    ):
+        super().__init__()
+        self._latency = latency or LatencyDistribution()
+        self._all_users_exist = all_users_exist
+        self.calls = calls or MetricsRegistry()
+
+    def _call(self, name: str) -> None:
+        self.calls.increment(f"backend.{name}")
+        time.sleep(self._latency.sample())
+
+    def get_latest_user_session(self, user):
+        self._call("get_latest_user_session")
+        return super().get_latest_user_session(user)
+
+    def create_user_session(self, user, sess_quota: int = 10**6):
+        self._call("create_user_session")
+        return super().create_user_session(user, sess_quota=sess_quota)
+
+    def end_user_session(self, user):
+        self._call("end_user_session")
+        super().end_user_session(user)
+
+    def does_user_exist(self, user):
+        self._call("does_user_exist")
+        return self._all_users_exist or super().does_user_exist(user)
+
+    def get_count_of_active_sessions(self):
+        self._call("get_count_of_active_sessions")
+        return super().get_count_of_active_sessions()
+
+    def get_count_of_session_prompts(self, session):
+        self._call("get_count_of_session_prompts")
+        return super().get_count_of_session_prompts(session)
+
+    def get_session_chat_history(self, session, **limits):
+        self._call("get_session_chat_history")
+        return super().get_session_chat_history(session, **limits)
+
+    def get_session_chat_history_since(self, session, since):
+        self._call("get_session_chat_history_since")
+        return super().get_session_chat_history_since(session, since)
+
+    def save_message_prompt(self, message, session):
+        self._call("save_message_prompt")
+        super().save_message_prompt(message, session)
+
+    def save_message_response(self, message, session):
+        self._call("save_message_response")
+        super().save_message_response(message, session)
+
+    def save_messages(self, messages, session):
+        self._call("save_messages")
+        for message in messages:
+            if isinstance(message, models.MessagePrompt):
+                super().save_message_prompt(message, session)
+            else:
+                super().save_message_response(message, session)
+
+
+class FakeProvider(BaseProvider):
+    """
+    Provider that blocks for a random latency on every message sent.
+    """
+
+    def __init__(
+        self, latency: LatencyDistribution = None, calls: MetricsRegistry = None
+    ):
+        self._latency = latency or LatencyDistribution()
+        self.calls = calls or MetricsRegistry()
+
+    def send_message(self, message: models.MessageResponse) -> None:
+        self.calls.increment("provider.send_message")
+        time.sleep(self._latency.sample())
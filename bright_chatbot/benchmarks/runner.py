@@ -0,0 +1,184 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import time
+from typing import Any, Dict, List
+
+from bright_chatbot import models
+from bright_chatbot.backends.base_backend import AsyncBackendAdapter
+from bright_chatbot.benchmarks.corpus import CorpusMessage, iter_user_conversations
+from bright_chatbot.benchmarks.fakes import FakeBackend, FakeOpenAI, FakeProvider
+from bright_chatbot.client.async_chat import AsyncOpenAIChatClient
+from bright_chatbot.providers.base_provider import AsyncProviderAdapter
+from bright_chatbot.utils.metrics import MetricsRegistry
+
+TOTAL_STAGE = "total"
+""" Name under which the total latency of the replies is reported. """
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Returns the `q` percentile (0-100) of the values with the nearest-rank method.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class BenchmarkReport:
+    """
+    Results of replaying a corpus: the latencies of every stage of the replies,
+    the throughput and the calls made to the external services.
+    """
+
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(
+        self,
+        n_messages: int,
+        concurrency: int,
+        duration: float,
+        stage_latencies: Dict[str, List[float]],
+        calls: Dict[str, int],
+        failures: int = 0,
+    ):
+        self.n_messages = n_messages
+        self.concurrency = concurrency
+        self.duration = duration
+        self.stage_latencies = stage_latencies
+        self.calls = calls
+        self.failures = failures
+
+    @property
+    def throughput(self) -> float:
+        """
+        Messages replied per second.
+        """
+        return self.n_messages / self.duration if self.duration else 0.0
+
+    def stage_percentiles(self) -> Dict[str, Dict[str, float]]:
+        return {
+            stage: {f"p{q}": percentile(latencies, q) for q in self.PERCENTILES}
+            for stage, latencies in self.stage_latencies.items()
+        }
+
+    def calls_per_message(self) -> Dict[str, float]:
+        if not self.n_messages:
+            return {}
+        return {
+            name: count / self.n_messages for name, count in sorted(self.calls.items())
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "messages": self.n_messages,
+            "failures": self.failures,
+            "concurrency": self.concurrency,
+            "duration": self.duration,
+            "throughput": self.throughput,
+            "stages": self.stage_percentiles(),
+            "calls_per_message": self.calls_per_message(),
+        }
+
+    def format(self) -> str:
+        """
+        Human readable summary of the report.
+        """
+        lines = [
+            f"Replied {self.n_messages} messages ({self.failures} failed) "
+            f"in {self.duration:.2f}s with concurrency {self.concurrency}: "
+            f"{self.throughput:.1f} msg/s",
+            "",
+            f"{'stage':<16}" + "".join(f"{f'p{q} (ms)':>12}" for q in self.PERCENTILES),
+        ]
+        for stage, values in self.stage_percentiles().items():
+            lines.append(
+                f"{stage:<16}" + "".join(f"{v * 1000:>12.1f}" for v in values.values())
+            )
+        lines += ["", f"{'external call':<40}{'per message':>12}"]
+        for name, value in self.calls_per_message().items():
+            lines.append(f"{name:<40}{value:>12.2f}")
+        return "\n".join(lines)
+
+
+async def run_benchmark_async(
+    corpus: List[CorpusMessage],
+    concurrency: int = 10,
+    openai_lib: FakeOpenAI = None,
+    backend: FakeBackend = None,
+    provider: FakeProvider = None,
+    n_threads: int = None,
+) -> BenchmarkReport:
+    """
+    Replays the messages of a corpus through the full reply pipeline
+    against in-process fakes of OpenAI, the backend and the provider.
+
+    The messages of a user are replied in order, while up to `concurrency`
+    replies of different users are in progress at the same time. The blocking
+    calls of the backend and the provider run in a pool of `n_threads` threads
+    (`concurrency` by default), as they do with `OpenAIChatClient`.
+    """
+    calls = MetricsRegistry()
+    openai_lib = openai_lib or FakeOpenAI(calls=calls)
+    backend = backend or FakeBackend(calls=calls)
+    provider = provider or FakeProvider(calls=calls)
+    executor = ThreadPoolExecutor(max_workers=n_threads or concurrency)
+    async_backend = AsyncBackendAdapter(backend, executor=executor)
+    async_provider = AsyncProviderAdapter(provider, executor=executor)
+    semaphore = asyncio.Semaphore(concurrency)
+    stage_latencies: Dict[str, List[float]] = {TOTAL_STAGE: []}
+    failures = 0
+
+    async def replay_conversation(indexes: List[int]) -> None:
+        nonlocal failures
+        client = AsyncOpenAIChatClient(
+            backend=async_backend, provider=async_provider, openai_lib=openai_lib
+        )
+        for index in indexes:
+            message = corpus[index]
+            prompt = models.MessagePrompt(
+                body=message.message, from_user=models.User(user_id=message.user_id)
+            )
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    result = await client.reply(prompt)
+                except Exception:
+                    failures += 1
+                    result = None
+                stage_latencies[TOTAL_STAGE].append(time.perf_counter() - start)
+            if result is None or result.stages is None:
+                continue
+            for timing in result.stages["stages"]:
+                if timing["status"] == "done" and timing["duration"] is not None:
+                    stage_latencies.setdefault(timing["name"], []).append(
+                        timing["duration"]
+                    )
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(
+            *(replay_conversation(idx) for idx in iter_user_conversations(corpus))
+        )
+    finally:
+        executor.shutdown(wait=True)
+    duration = time.perf_counter() - start
+    counters = {}
+    for fake in (openai_lib, backend, provider):
+        counters.update(fake.calls.snapshot())
+    return BenchmarkReport(
+        n_messages=len(corpus),
+        concurrency=concurrency,
+        duration=duration,
+        stage_latencies=stage_latencies,
+        calls=counters,
+        failures=failures,
+    )
+
+
+def run_benchmark(corpus: List[CorpusMessage], **kwargs: Any) -> BenchmarkReport:
+    """
+    Synchronous version of `run_benchmark_async`.
+    """
+    return asyncio.run(run_benchmark_async(corpus, **kwargs))
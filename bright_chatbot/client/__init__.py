@@ -1 +1,3 @@
 from .chat import OpenAIChatClient
+from .async_chat import AsyncOpenAIChatClient
+from .context import ReplyContext
@@ -0,0 +1,949 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor
+import functools
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Sequence, Tuple, Type, Union
+
+import openai
+
+from bright_chatbot import services
+from bright_chatbot.backends.base_backend import (
+    BaseDataBackend,
+    AsyncBaseDataBackend,
+    AsyncBackendAdapter,
+)
+from bright_chatbot.backends.history_store import ChatHistoryStore
+from bright_chatbot.backends.retry_store import WriteRetryStore
+from bright_chatbot.backends.unit_of_work import UnitOfWork
+from bright_chatbot.client.context import ReplyContext
+from bright_chatbot.providers.base_provider import (
+    BaseProvider,
+    AsyncBaseProvider,
+    AsyncProviderAdapter,
+)
+from bright_chatbot.configs import settings
+from bright_chatbot import models
+from bright_chatbot.utils import exceptions
+from bright_chatbot.utils.deadlines import (
+    Deadline,
+    deadline_scope,
+    get_deadline,
+    wait_for,
+)
+from bright_chatbot.utils.metrics import metrics
+from bright_chatbot.utils.stages import StageGraph
+import bright_chatbot.client.errors as error_msgs
+
+
+class AsyncOpenAIChatClient:
+    """
+    Client that replies to the users' messages using the OpenAI API
+    from an asyncio event loop.
+
+    The calls to OpenAI, the backend and the provider are awaited instead of
+    blocking a thread, so a single event loop can serve many conversations
+    at the same time.
+
+    Synchronous backends and providers are accepted as well, their blocking calls
+    are then run in `executor` (or in the default executor of the loop).
+
+    The writes to the backend are made behind the messages sent to the user:
+    a response is saved once it has been delivered, and the writes that fail
+    are stored in `retry_store` (if any) instead of failing the reply.
+    By default, the store is read from `settings.WRITE_RETRY_STORE_PATH`.
+
+    The chat histories are kept between replies in `history_store`, and only
+    the messages saved since are read from the backend. By default, the store
+    is shared by the clients of the process, unless
+    `settings.CHAT_HISTORY_STORE_MAX_BYTES` is 0.
+
+    The state of each reply is kept in its own `ReplyContext`, so a single
+    client can reply to many prompts at the same time.
+
+    The `openai` module can be replaced by any object with the same interface
+    with `openai_lib` (e.g. a fake of the API for benchmarks).
+    """
+
+    def __init__(
+        self,
+        backend: Union[Type[AsyncBaseDataBackend], Type[BaseDataBackend]],
+        provider: Union[Type[AsyncBaseProvider], Type[BaseProvider]],
+        executor: Executor = None,
+        retry_store: WriteRetryStore = None,
+        openai_lib: openai = None,
+        history_store: ChatHistoryStore = None,
+    ):
+        if openai_lib is None:
+            openai_lib = openai
+            openai.api_key = settings.OPENAI_API_KEY
+        self._openai_lib = openai_lib
+        self._logger = logging.getLogger(f"{__package__}.{self.__class__.__name__}")
+        if isinstance(backend, BaseDataBackend):
+            backend = AsyncBackendAdapter(backend, executor=executor)
+        if isinstance(provider, BaseProvider):
+            provider = AsyncProviderAdapter(provider, executor=executor)
+        self._backend = backend
+        self._provider = provider
+        if retry_store is None and settings.WRITE_RETRY_STORE_PATH:
+            retry_store = WriteRetryStore(settings.WRITE_RETRY_STORE_PATH)
+        self._retry_store = retry_store
+        if history_store is None and settings.CHAT_HISTORY_STORE_MAX_BYTES:
+            history_store = ChatHistoryStore.shared()
+        self._history_store = history_store
+
+    @property
+    def logger(self) -> logging.Logger:
+        return self._logger
+
+    @property
+    def backend(self) -> Type[AsyncBaseDataBackend]:
+        """
+        Backend object used to store and retrieve data of the chat.
+        """
+        return self._backend
+
+    @property
+    def provider(self) -> Type[AsyncBaseProvider]:
+        """
+        Communication provider used to send messages.
+        """
+        return self._provider
+
+    @property
+    def openai(self) -> openai:
+        """
+        OpenAI library used to call the API.
+        """
+        return self._openai_lib
+
+    @property
+    def retry_store(self) -> Union[WriteRetryStore, None]:
+        """
+        Store of the backend writes that failed, None if they are only logged.
+        """
+        return self._retry_store
+
+    @property
+    def history_store(self) -> Union[ChatHistoryStore, None]:
+        """
+        Store of the chat histories kept between replies,
+        None if they are read from the backend on every reply.
+        """
+        return self._history_store
+
+    async def reply(
+        self, prompt: models.MessagePrompt, deadline: Deadline = None
+    ) -> models.ReplyResult:
+        """
+        Generates a response to a message prompt and sends it to the user via the
+        communication provider.
+
+        If a `deadline` is given, every call to OpenAI, the backend and the provider
+        is bounded by the time left, and the user is notified with the reserve
+        of the deadline if the reply can not be completed in time.
+
+        Returns the result of the reply, with the timings of its stages.
+        Unexpected errors are raised once the user has been notified.
+        """
+        context = self._new_context(prompt)
+        with deadline_scope(deadline or get_deadline()):
+            await self._reply(context)
+        return self._reply_result(context)
+
+    def _new_context(self, prompt: models.MessagePrompt) -> ReplyContext:
+        """
+        Creates the context of the reply to a prompt.
+        """
+        # The client may be replying to other prompts at the same time,
+        # so the state of this reply is kept in its own context.
+        # The reads of the backend are shared by the steps of this reply only,
+        # and its writes are made together once it is done, unless the replies
+        # to the other prompts of the user must see them right away:
+        return ReplyContext(
+            prompt,
+            UnitOfWork(
+                self.backend,
+                buffer_writes=settings.BUFFER_REPLY_WRITES
+                and not settings.BURST_COALESCING_WINDOW_SECONDS,
+            ),
+        )
+
+    @staticmethod
+    def _reply_result(
+        context: ReplyContext, error: Exception = None
+    ) -> models.ReplyResult:
+        """
+        Result of the reply of a context, failed if an `error` prevented it.
+        """
+        stages = context.stages_report
+        return models.ReplyResult(
+            message_prompt=context.prompt,
+            succeeded=error is None,
+            error=None if error is None else repr(error),
+            stages=None if stages is None else stages.to_dict(),
+        )
+
+    async def _reply(self, context: ReplyContext, superseded: bool = False) -> None:
+        """
+        Replies to the prompt of a context, if `superseded` is True the prompt
+        is saved but replied together with the next prompt of the user instead.
+        """
+        system_error = None
+        # The settings replaced for the user or the platform only apply to this reply:
+        with settings.override():
+            try:
+                await self._make_reply(context, superseded=superseded)
+                await self._wait_for_promises(context)
+                self._flush_writes(context)
+                await self._wait_for_promises(context)
+                self._record_reply_timings(context)
+            except exceptions.ApplicationError as e:
+                self.logger.exception(
+                    f"Got an expected application error when generating the response"
+                )
+                await self._handle_error(context, e)
+            except Exception as e:
+                self.logger.exception(
+                    "We got an unexpected error when generating the response"
+                )
+                await self._handle_error(context, e)
+                system_error = e
+        if system_error:
+            raise system_error
+
+    async def reply_many(
+        self,
+        prompts: Iterable[models.MessagePrompt],
+        max_concurrency: int = None,
+        deadline: Deadline = None,
+        overrides: Sequence[Dict[str, Any]] = None,
+    ) -> List[models.ReplyResult]:
+        """
+        Replies to a batch of message prompts sharing the backend and the provider.
+
+        The prompts of the same user are replied one after the other in the
+        order given, while the prompts of different users are replied concurrently
+        (up to `max_concurrency` users at a time, unlimited if None).
+
+        If `settings.BURST_COALESCING_WINDOW_SECONDS` is set, the prompts of a user
+        that are followed by another one within the window are only saved, and
+        the last prompt of the burst is replied with a single completion.
+
+        The `deadline`, if given, is shared by all the replies (see `reply`).
+
+        The `overrides`, if given, are the settings replaced for the reply
+        of each prompt, in the same order as the prompts, e.g. the
+        `RUNNING_PLATFORM` each prompt was sent from (see `settings.override`).
+
+        Returns one result per prompt, in the same order as the prompts,
+        so the failed prompts can be retried individually.
+        """
+        with deadline_scope(deadline or get_deadline()):
+            return await self._reply_many(prompts, max_concurrency, overrides)
+
+    async def _reply_many(
+        self,
+        prompts: Iterable[models.MessagePrompt],
+        max_concurrency: int = None,
+        overrides: Sequence[Dict[str, Any]] = None,
+    ) -> List[models.ReplyResult]:
+        prompts = list(prompts)
+        overrides = list(overrides) if overrides is not None else [{}] * len(prompts)
+        if len(overrides) != len(prompts):
+            raise ValueError("There must be one override of the settings per prompt")
+        results: List[models.ReplyResult] = [None] * len(prompts)
+        users_prompts: Dict[str, List[int]] = {}
+        for index, prompt in enumerate(prompts):
+            users_prompts.setdefault(prompt.from_user.user_id, []).append(index)
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        async def reply_user_prompts(indexes: List[int]) -> None:
+            for position, index in enumerate(indexes):
+                next_prompt = None
+                if position + 1 < len(indexes):
+                    next_prompt = prompts[indexes[position + 1]]
+                context = self._new_context(prompts[index])
+                try:
+                    with settings.override(**overrides[index]):
+                        await self._reply(
+                            context,
+                            superseded=self._is_burst_continued(
+                                prompts[index], next_prompt
+                            ),
+                        )
+                except Exception as e:
+                    results[index] = self._reply_result(context, error=e)
+                else:
+                    results[index] = self._reply_result(context)
+
+        async def reply_user(indexes: List[int]) -> None:
+            if semaphore is None:
+                return await reply_user_prompts(indexes)
+            async with semaphore:
+                return await reply_user_prompts(indexes)
+
+        await asyncio.gather(*(reply_user(idx) for idx in users_prompts.values()))
+        failed = sum(not result.succeeded for result in results)
+        self.logger.info(
+            f"Replied to {len(prompts)} prompts from {len(users_prompts)} users "
+            f"with {failed} failures"
+        )
+        return results
+
+    @staticmethod
+    def _is_burst_continued(
+        prompt: models.MessagePrompt, next_prompt: Union[models.MessagePrompt, None]
+    ) -> bool:
+        """
+        Whether the next prompt of the user arrived within the coalescing window,
+        in which case it replies to both prompts.
+        """
+        window = settings.BURST_COALESCING_WINDOW_SECONDS
+        if window <= 0 or next_prompt is None:
+            return False
+        if prompt.body.startswith("/") or next_prompt.body.startswith("/"):
+            return False
+        elapsed = next_prompt.created_at.timestamp() - prompt.created_at.timestamp()
+        return 0 <= elapsed <= window
+
+    async def _make_reply(
+        self, context: ReplyContext, superseded: bool = False
+    ) -> Union[models.HandlerOutput, None]:
+        """
+        Uses the OpenAI API to generate a response to a message prompt and sends
+        it to the user via the communication provider.
+
+        The message prompt is saved to the backend and the response is also saved,
+        preserving the conversation history for the current session.
+
+        The steps of the reply are run as a graph of stages (see `_build_reply_graph`),
+        so the steps that do not depend on each other run concurrently.
+
+        Returns None if the prompt is left to be replied by a later prompt
+        of the same burst of messages.
+        """
+        prompt = context.prompt
+        graph = self._build_reply_graph(context, superseded=superseded)
+        succeeded = False
+        try:
+            user_session, _ = await graph.result("session")
+            # Only send a Greeting to the user if this is their first message to the bot:
+            if await graph.result("new_user"):
+                self.logger.info(
+                    f"User {prompt.from_user.hashed_user_id} is new to the bot"
+                )
+                graph.cancel()
+                return self._send_greeting_message(context, user_session)
+            prompt_output = await graph.result("reply")
+            # Check if message requests for image generation
+            if prompt_output and prompt_output.requested_features.get("generate_image"):
+                # Check if the session is valid and the history is loaded:
+                await graph.result("validation")
+                await graph.result("history")
+                img_prompt = prompt_output.requested_features.get("generate_image")
+                image_handler = services.ImageGenerationHandler(
+                    openai_lib=self.openai, client=self, context=context
+                )
+                # Reply with the image asynchronously
+                self._exec_async(
+                    context,
+                    image_handler.reply,
+                    prompt,
+                    user_session,
+                    image_prompt=img_prompt,
+                )
+            succeeded = True
+        finally:
+            if succeeded:
+                # Stages the reply did not wait for (e.g. the validation of a command)
+                # must still finish before the reply is done, and their errors
+                # raised, even if they already failed:
+                context.futures_queue.extend(
+                    graph.failed_tasks() + graph.pending_tasks()
+                )
+            else:
+                graph.cancel()
+            self._record_speculation(graph)
+            context.stages_report = graph.report()
+            self.logger.debug(f"Reply stages: {context.stages_report.format()}")
+        return prompt_output
+
+    def _build_reply_graph(
+        self, context: ReplyContext, superseded: bool = False
+    ) -> StageGraph:
+        """
+        Declares the stages needed to reply to a prompt:
+
+        - session: Retrieves or creates the user session.
+        - new_user: Checks if the user is sending their first message.
+        - save_prompt: Schedules saving the prompt to the backend.
+        - validation: Checks the quotas of the session.
+        - history: Loads the chat history of the session.
+        - burst: Returns the prompts answered by the reply, see below.
+        - moderation: Checks the prompts with the moderation API.
+        - completion: Generates the chat completion ahead of the moderation,
+            only declared when `settings.SPECULATIVE_CHAT_COMPLETION` is enabled.
+        - reply: Generates and sends the reply with the respective handler.
+
+        Commands are replied without waiting for the validation nor the history.
+
+        If `settings.BURST_COALESCING_WINDOW_SECONDS` is set, the history is only
+        loaded once the prompt is saved and the window is over. If the user sent
+        a newer prompt by then, that prompt is the one replied and this reply stops.
+        Otherwise the burst is made of this prompt and the previous ones that
+        were not replied yet, which are all answered by a single completion.
+        A `superseded` prompt is known to be followed by a newer one,
+        so it does not wait for the window nor loads the history.
+        """
+        prompt = context.prompt
+        is_command = prompt.body.startswith("/")
+        window = 0.0 if is_command else settings.BURST_COALESCING_WINDOW_SECONDS
+        graph = StageGraph()
+        graph.add_stage(
+            "session",
+            functools.partial(self.get_or_create_user_session, prompt.from_user),
+        )
+        graph.add_stage(
+            "new_user",
+            functools.partial(self._new_user_stage, prompt),
+            depends_on=["session"],
+        )
+        graph.add_stage(
+            "save_prompt",
+            functools.partial(self._save_prompt_stage, context),
+            depends_on=["session", "new_user"],
+        )
+        graph.add_stage(
+            "validation",
+            functools.partial(self._validation_stage, context),
+            depends_on=["session", "new_user"],
+        )
+        burst_dependencies = []
+        if not superseded:
+            history_dependencies = ["session", "new_user"]
+            if window > 0:
+                history_dependencies.append("save_prompt")
+                burst_dependencies.append("history")
+            graph.add_stage(
+                "history",
+                functools.partial(self._history_stage, context, window),
+                depends_on=history_dependencies,
+            )
+        graph.add_stage(
+            "burst",
+            functools.partial(self._burst_stage, prompt, superseded),
+            depends_on=burst_dependencies,
+        )
+        graph.add_stage("moderation", self._moderation_stage, depends_on=["burst"])
+        reply_dependencies = ["session", "new_user", "moderation", "burst"]
+        if not is_command:
+            reply_dependencies.append("validation")
+            if not superseded:
+                reply_dependencies.append("history")
+            if settings.SPECULATIVE_CHAT_COMPLETION and not superseded:
+                # The reply still waits for the moderation before sending the answer:
+                graph.add_stage(
+                    "completion",
+                    functools.partial(self._completion_stage, context),
+                    depends_on=["new_user", "history", "burst"],
+                )
+                reply_dependencies.append("completion")
+        graph.add_stage(
+            "reply",
+            functools.partial(self._reply_stage, context),
+            depends_on=reply_dependencies,
+        )
+        return graph
+
+    async def _moderation_stage(
+        self, burst: Union[List[models.MessagePrompt], None]
+    ) -> None:
+        if not burst:
+            return
+        # Raise an error if the messages are flagged by the moderation API:
+        message = "\n\n".join(prompt.body for prompt in burst)
+        if await self.check_message_moderation(message):
+            error_msgs.MODERATION_ERROR.raise_error()
+
+    async def _new_user_stage(
+        self,
+        prompt: models.MessagePrompt,
+        session: Tuple[models.UserSession, bool],
+    ) -> bool:
+        _, sess_created = session
+        if not sess_created:
+            return False
+        self.logger.info(
+            f"Created new session for user {prompt.from_user.hashed_user_id}"
+        )
+        return not await wait_for(self.backend.does_user_exist(prompt.from_user))
+
+    async def _save_prompt_stage(
+        self,
+        context: ReplyContext,
+        session: Tuple[models.UserSession, bool],
+        new_user: bool,
+    ) -> Union[asyncio.Task, None]:
+        if new_user:
+            return None
+        return self.save_prompt(context, context.prompt, session[0])
+
+    async def _validation_stage(
+        self,
+        context: ReplyContext,
+        session: Tuple[models.UserSession, bool],
+        new_user: bool,
+    ) -> None:
+        if not new_user:
+            await self.validate_session(context, session[0])
+
+    async def _history_stage(
+        self,
+        context: ReplyContext,
+        window: float,
+        session: Tuple[models.UserSession, bool],
+        new_user: bool,
+        save_prompt: Union[asyncio.Task, None] = None,
+    ) -> Union[models.ChatHistory, None]:
+        if new_user:
+            return None
+        user_session, sess_created = session
+        chat_history = models.ChatHistory(session=user_session)
+        if window > 0:
+            # The prompt must be saved for the replies of the other prompts
+            # of the burst to see it, then wait for the user to send more:
+            await save_prompt
+            await wait_for(asyncio.sleep(window))
+            # The history read by now would miss the prompts sent meanwhile:
+            context.unit_of_work.invalidate(user_session)
+        # Get the chat history of the current session:
+        if not sess_created or window > 0:
+            if self.history_store is not None:
+                # Only the messages saved since the last reply are read:
+                chat_history = await wait_for(
+                    self.history_store.aget_chat_history(
+                        context.unit_of_work, user_session, exclude=context.prompt
+                    )
+                )
+            else:
+                await wait_for(
+                    chat_history.arefresh_from_backend(
+                        context.unit_of_work, exclude=context.prompt
+                    )
+                )
+        context.chat_history = chat_history
+        return chat_history
+
+    async def _burst_stage(
+        self,
+        prompt: models.MessagePrompt,
+        superseded: bool,
+        history: Union[models.ChatHistory, None] = None,
+    ) -> Union[List[models.MessagePrompt], None]:
+        if superseded:
+            metrics.increment("coalescing.superseded")
+            return None
+        if history is None:
+            return [prompt]
+        prompt_timestamp = prompt.created_at.timestamp()
+        for message in history.get_chat_prompts():
+            if (
+                not message.body.startswith("/")
+                and message.created_at.timestamp() > prompt_timestamp
+            ):
+                self.logger.info(
+                    "Leaving the prompt to be replied with the newer prompts "
+                    f"of user {prompt.from_user.hashed_user_id}"
+                )
+                metrics.increment("coalescing.superseded")
+                return None
+        burst = [
+            message
+            for message in history.get_pending_prompts()
+            if not message.body.startswith("/")
+        ]
+        if burst:
+            metrics.increment("coalescing.merged_prompts", len(burst))
+        return burst + [prompt]
+
+    async def _completion_stage(
+        self,
+        context: ReplyContext,
+        new_user: bool,
+        history: Union[models.ChatHistory, None],
+        burst: Union[List[models.MessagePrompt], None],
+    ) -> Union[Tuple[str, Dict[str, int]], None]:
+        if new_user or not burst:
+            return None
+        metrics.increment("speculative_completions.started")
+        main_handler = services.ChatReplyHandler(
+            openai_lib=self.openai, client=self, context=context
+        )
+        txt_answer = await main_handler.generate_answer(context.prompt)
+        return txt_answer, main_handler.completion_usage or {}
+
+    async def _reply_stage(
+        self,
+        context: ReplyContext,
+        session: Tuple[models.UserSession, bool],
+        new_user: bool,
+        burst: Union[List[models.MessagePrompt], None],
+        completion: Union[Tuple[str, Dict[str, int]], None] = None,
+        history: Union[models.ChatHistory, None] = None,
+        **_,
+    ) -> Union[models.HandlerOutput, None]:
+        if new_user or not burst:
+            return None
+        prompt = context.prompt
+        user_session, _ = session
+        # If the message is a command, let the commands handler handle it:
+        if prompt.body.startswith("/"):
+            cmds_handler = services.ChatCommandsHandler(self.openai, self, context)
+            return await cmds_handler.reply(prompt, user_session)
+        # Generate response from the prompt:
+        main_handler = services.ChatReplyHandler(
+            openai_lib=self.openai, client=self, context=context
+        )
+        output = await main_handler.reply(
+            prompt=prompt,
+            user_session=user_session,
+            txt_answer=completion[0] if completion else None,
+            completion_usage=completion[1] if completion else None,
+        )
+        if history is not None and self.backend.stores_session_summaries:
+            # Once the reply is sent, so it is not delayed by the summary:
+            self._exec_async(
+                context, self._summarize_history, context, main_handler, history
+            )
+        return output
+
+    async def _summarize_history(
+        self,
+        context: ReplyContext,
+        handler: services.ChatReplyHandler,
+        history: models.ChatHistory,
+    ) -> None:
+        """
+        Extends the summary of the session with its oldest messages if needed
+        and saves it. A summary that fails is tried again on the next reply.
+        """
+        try:
+            summary = await handler.summarize_history(history)
+        except Exception:
+            self.logger.exception("The summary of the session failed")
+            metrics.increment("summaries.failed")
+            return
+        if summary is None:
+            return
+        metrics.increment("summaries.updated")
+        self._write_behind(
+            context,
+            context.unit_of_work.save_session_summary,
+            history.session,
+            summary,
+        )
+
+    def _record_speculation(self, graph: StageGraph) -> None:
+        """
+        Records whether the speculative completion of a reply was used or wasted.
+
+        For the used completions, the time that the completion overlapped with
+        the moderation is recorded as the latency saved.
+        """
+        completion = graph.get_stage("completion")
+        if completion is None or completion.started_at is None:
+            return
+        if completion.status == "done" and completion.task.result() is None:
+            # The completion was not generated (e.g. it was the greeting message)
+            return
+        if graph.get_stage("reply").status == "done":
+            metrics.increment("speculative_completions.used")
+            moderation = graph.get_stage("moderation")
+            overlap = min(moderation.finished_at, completion.finished_at) - max(
+                moderation.started_at, completion.started_at
+            )
+            metrics.increment("speculative_completions.saved_seconds", max(overlap, 0))
+            return
+        metrics.increment("speculative_completions.wasted")
+        if completion.status == "done":
+            _, usage = completion.task.result()
+            metrics.increment(
+                "speculative_completions.wasted_tokens", usage.get("total_tokens", 0)
+            )
+        self.logger.info(
+            f"Discarded the speculative completion of the reply ({completion.status})"
+        )
+
+    def _send_greeting_message(
+        self, context: ReplyContext, user_session: models.UserSession
+    ) -> models.HandlerOutput:
+        """
+        Sends a greeting message to the user.
+        """
+        greeting_response = models.MessageResponse(
+            body=user_session.session_config.welcome_message
+            or settings.USER_WELCOME_MESSAGE,
+            to_user=user_session.user,
+        )
+        self.send_response(context, greeting_response)
+        return models.HandlerOutput(
+            message_prompt=context.prompt,
+            message_response=greeting_response,
+            requested_features={},
+        )
+
+    def save_prompt(
+        self,
+        context: ReplyContext,
+        prompt: models.MessagePrompt,
+        user_session: models.UserSession,
+    ) -> asyncio.Task:
+        """
+        Saves a message prompt to the backend asynchronously.
+
+        The prompt is saved right away if the replies to the other prompts
+        of the user may need it, otherwise along with the messages of the reply,
+        but a failed write does not fail the reply.
+        """
+        context.prompts_received.append(prompt)
+        return self._write_behind(
+            context, context.unit_of_work.save_message_prompt, prompt, user_session
+        )
+
+    def send_response(
+        self,
+        context: ReplyContext,
+        message: models.MessageResponse,
+        after: asyncio.Task = None,
+    ) -> asyncio.Task:
+        """
+        Sends a message to the user via the communication provider assynchronously.
+
+        If `after` is given, the message is only sent once that task is done,
+        which keeps the order of consecutive parts of the same answer.
+        """
+        context.responses_generated.append(message)
+        if after is None:
+            task = self._exec_async(context, self.provider.send_response, message)
+        else:
+            task = self._exec_async(context, self._send_response_after, message, after)
+        task.add_done_callback(functools.partial(self._record_delivery, context))
+        context.send_tasks.append(task)
+        return task
+
+    @staticmethod
+    def _record_delivery(context: ReplyContext, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is None:
+            context.delivered_at = time.perf_counter()
+
+    async def _send_response_after(
+        self, message: models.MessageResponse, previous: asyncio.Task
+    ) -> None:
+        await asyncio.wait([previous])
+        await self.provider.send_response(message)
+
+    def save_response(
+        self,
+        context: ReplyContext,
+        message: models.MessageResponse,
+        user_session: models.UserSession,
+    ) -> None:
+        """
+        Saves a message response to the backend asynchronously,
+        once the messages sent so far by the reply have been delivered.
+        """
+        self._write_behind(
+            context,
+            context.unit_of_work.save_message_response,
+            message,
+            user_session,
+            after=list(context.send_tasks),
+        )
+
+    def _flush_writes(self, context: ReplyContext) -> None:
+        """
+        Saves the messages buffered by the unit of work of the reply,
+        with a single write to the backend per session.
+        """
+        for messages, user_session in context.unit_of_work.pop_buffered_writes():
+            self._write_behind(
+                context, self.backend.save_messages, messages, user_session
+            )
+
+    def _write_behind(
+        self, context: ReplyContext, write, *args, after: List[asyncio.Task] = None
+    ) -> asyncio.Task:
+        """
+        Schedules a write to the backend as part of a reply,
+        after the `after` tasks are done.
+        """
+        task = asyncio.ensure_future(self._persist(write, *args, after=after))
+        context.futures_queue.append(task)
+        return task
+
+    async def _persist(self, write, *args, after: List[asyncio.Task] = None) -> None:
+        """
+        Makes a write to the backend and stores it in the retry store if it fails.
+        """
+        if after:
+            await asyncio.wait(after)
+        try:
+            await wait_for(write(*args))
+        except Exception as e:
+            self.logger.exception(f"Write '{write.__name__}' to the backend failed")
+            metrics.increment("write_behind.failed")
+            if self.retry_store is None:
+                return
+            self.retry_store.append(write.__name__, *args, error=repr(e))
+            metrics.increment("write_behind.stored_for_retry")
+
+    def _record_reply_timings(self, context: ReplyContext) -> None:
+        """
+        Records the time it took to deliver the reply to the user and
+        the total time of the reply, including the writes made behind it.
+        """
+        if context.delivered_at is None:
+            return
+        send_latency = context.delivered_at - context.started_at
+        total = time.perf_counter() - context.started_at
+        metrics.increment("replies.timed")
+        metrics.increment("replies.send_latency_seconds", send_latency)
+        metrics.increment("replies.total_seconds", total)
+        self.logger.debug(
+            f"Reply delivered in {send_latency * 1000:.0f}ms "
+            f"and completed in {total * 1000:.0f}ms"
+        )
+
+    async def get_or_create_user_session(
+        self, user: models.User
+    ) -> Tuple[models.UserSession, bool]:
+        """
+        Returns a tuple of the session object and a boolean indicating whether
+        the session was created or not.
+        """
+        session = await wait_for(self.backend.get_latest_user_session(user))
+        created = False
+        if not session:
+            self.logger.info("Creating a new session")
+            session = await wait_for(self.backend.create_user_session(user))
+            created = True
+        return session, created
+
+    def end_user_session(self, context: ReplyContext, user: models.User) -> None:
+        """
+        Asynchronously ends the User's latest session as part of a reply.
+        """
+        self._exec_async(context, self.backend.end_user_session, user)
+
+    async def validate_session(
+        self, context: ReplyContext, session: models.UserSession
+    ) -> Union[Type[models.ApplicationError], None]:
+        """
+        Validates a session to ensure that it is not over the
+        allowed quota of messages or of total active sessions.
+
+        If the session is valid, returns None, otherwise returns
+        an models.ApplicationError object.
+        """
+        if session.session_usage is not None:
+            # The backend read the usage along with the session:
+            sess_cnt = await wait_for(self.backend.get_count_of_active_sessions())
+            prompts_cnt = session.session_usage.prompts
+        else:
+            sess_cnt, prompts_cnt = await wait_for(
+                asyncio.gather(
+                    self.backend.get_count_of_active_sessions(),
+                    context.unit_of_work.get_count_of_session_prompts(session),
+                )
+            )
+        if sess_cnt > settings.MAX_ACTIVE_SESSIONS:
+            self.logger.error(
+                f"Maximum total number of active sessions ({settings.MAX_ACTIVE_SESSIONS}) reached"
+            )
+            error_msgs.MAX_ACTIVE_SESSIONS_SURPASSED.raise_error()
+        self.logger.debug(f"User number of prompts: {prompts_cnt}")
+        self.logger.debug(f"User session quota: {session.session_quota}")
+        if prompts_cnt > session.session_quota:
+            self.logger.error(
+                f"Maximum number of prompts allowed in this session ({session.session_quota}) has been reached"
+            )
+            error_msgs.QUOTA_SURPASSED.raise_error()
+        return None
+
+    async def check_message_moderation(self, message: str) -> bool:
+        """
+        Moderates the message to be sent to the OpenAI API to
+        prevent it from generating inappropriate responses.
+        """
+        response = await wait_for(
+            self.openai.Moderation.acreate(
+                input=message,
+            )
+        )
+        flagged = any(r["flagged"] for r in response["results"])
+        if flagged:
+            self.logger.info(
+                f"OpenAI's moderation model detected flagged content with response:\n{response}"
+            )
+        return flagged
+
+    async def _wait_for_promises(
+        self, context: ReplyContext, raise_errors: bool = True
+    ) -> None:
+        """
+        Waits for all the asynchronous tasks of a reply to complete and
+        removes them from its queue of promises.
+
+        If `raise_errors` is True, the first error raised by a task
+        is re-raised once all the tasks are done.
+        """
+        errors = []
+        while context.futures_queue:
+            promise = context.futures_queue.pop(0)
+            try:
+                await promise
+            except Exception as e:
+                errors.append(e)
+        if errors and raise_errors:
+            raise errors[0]
+
+    async def _handle_error(self, context: ReplyContext, error: Exception) -> None:
+        """
+        Handles a ModerationError by sending a message to the user
+        to inform them that their message was flagged.
+        """
+        if isinstance(error, exceptions.DeadlineExceeded):
+            error = error_msgs.DEADLINE_EXCEEDED.exception
+        elif not isinstance(error, exceptions.ApplicationError):
+            error = error_msgs.UNEXPECTED_ERROR.exception
+        # The error handling may use the time reserved at the end of the deadline:
+        await wait_for(
+            self.provider.send_response(
+                models.MessageResponse(
+                    body=error.message,
+                    to_user=context.prompt.from_user,
+                    status_code=error.status_code,
+                )
+            ),
+            use_reserve=True,
+        )
+        await wait_for(
+            self.backend.end_user_session(context.prompt.from_user), use_reserve=True
+        )
+        # Tasks left pending would be cancelled once the event loop is closed:
+        await self._wait_for_promises(context, raise_errors=False)
+        # The prompt and the messages sent before the error are saved too:
+        self._flush_writes(context)
+        await self._wait_for_promises(context, raise_errors=False)
+
+    def _exec_async(self, context: ReplyContext, f, *args, **kwargs) -> asyncio.Task:
+        """
+        Schedules a coroutine function as a task of a reply in the running
+        event loop, bounded by the deadline of the current request.
+        """
+        task = asyncio.ensure_future(wait_for(f(*args, **kwargs)))
+        context.futures_queue.append(task)
+        return task
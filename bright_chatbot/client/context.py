@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import List, Union
+
+from bright_chatbot import models
+from bright_chatbot.backends.unit_of_work import UnitOfWork
+from bright_chatbot.utils.stages import StageReport
+
+
+class ReplyContext:
+    """
+    State of a single reply made by a client, so that a client can make
+    many replies at the same time (e.g. to the prompts of different users).
+
+    It is created for each prompt replied, along with the unit of work that
+    shares the reads of the backend between the steps of the reply, and it is
+    passed to the handlers that generate the reply.
+    """
+
+    def __init__(self, prompt: models.MessagePrompt, unit_of_work: UnitOfWork):
+        self.prompt = prompt
+        self.unit_of_work = unit_of_work
+        self.started_at = time.perf_counter()
+        self.chat_history: Union[models.ChatHistory, None] = None
+        """ Chat history of the session, once it is loaded. """
+        self.prompts_received: List[models.MessagePrompt] = []
+        self.responses_generated: List[models.MessageResponse] = []
+        self.futures_queue: List[asyncio.Future] = []
+        """ Tasks scheduled by the reply, it is not done until they are. """
+        self.send_tasks: List[asyncio.Task] = []
+        self.delivered_at: Union[float, None] = None
+        """ Time (`time.perf_counter`) when the last message was delivered. """
+        self.stages_report: Union[StageReport, None] = None
@@ -44,3 +44,19 @@ IMAGE_GENERATION_QUOTA_SURPASSED = ApplicationError(
     ),
     status_code=429,
 )
+
+DEADLINE_EXCEEDED = ApplicationError(
+    message=(
+        "Sorry, it is taking us too long to reply to your message. "
+        "Please try again later."
+    ),
+    status_code=504,
+)
+
+IMAGE_GENERATION_SKIPPED = ApplicationError(
+    message=(
+        "Sorry, there was not enough time left to generate your image. "
+        "Please ask for it again."
+    ),
+    status_code=504,
+)
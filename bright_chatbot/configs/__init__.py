@@ -1,3 +1,3 @@
-from ._settings import Settings
+from ._settings import Settings, SettingsSnapshot
 
 settings = Settings()
@@ -1,26 +1,163 @@
+from contextlib import contextmanager
+import contextvars
+import threading
+from typing import Any, Dict, Iterator, Set, Union
+
 from .project_settings import ProjectSettings
 
+# Settings replaced for the current request (e.g. the reply being made),
+# see `Settings.override`:
+_request_settings: contextvars.ContextVar[Union[Dict[str, Any], None]] = (
+    contextvars.ContextVar("request_settings", default=None)
+)
+
+
+class SettingsSnapshot:
+    """
+    Immutable values of the project settings.
+
+    Each setting is read from the environment and cast the first time
+    it is accessed, then kept as a plain attribute of the snapshot,
+    so the next accesses do not read the environment again.
+    The `custom_settings` take precedence over the environment.
+    """
+
+    def __init__(self, custom_settings: Dict[str, Any] = None):
+        object.__setattr__(self, "_custom_settings", dict(custom_settings or {}))
+        object.__setattr__(self, "_project_settings", ProjectSettings())
+
+    def __getattr__(self, item):
+        if item.startswith("_"):
+            raise AttributeError(item)
+        if item in self._custom_settings:
+            value = self._custom_settings[item]
+        else:
+            value = getattr(self._project_settings, item)
+        # Only called for the settings not resolved yet:
+        object.__setattr__(self, item, value)
+        return value
+
+    def __setattr__(self, key, value):
+        raise AttributeError("The settings snapshot can not be changed")
+
+    def replace(self, **custom_settings) -> "SettingsSnapshot":
+        """
+        Returns a new snapshot with some settings replaced.
+        """
+        return SettingsSnapshot({**self._custom_settings, **custom_settings})
+
 
 class Settings:
     """
     Class used to access and customize the project settings
+
+    The settings are read from the environment once into a `SettingsSnapshot`,
+    the environment variables changed afterwards are only seen after `reload`.
+    The values read are also kept on this object, so the next accesses
+    are plain attribute reads.
+
+    The settings assigned on this object apply to the whole process, so they
+    are meant to configure it at startup. The settings of a single request
+    (e.g. of a user or a platform) are replaced with `override` instead,
+    which only applies to the current context.
     """
 
     def __init__(self):
         self.__custom_settings = {}
+        self.__lock = threading.Lock()
+        self.__snapshot = SettingsSnapshot()
+        # Settings replaced by some request, they are never kept on this object:
+        self.__request_keys: Set[str] = set()
+
+    @property
+    def snapshot(self) -> SettingsSnapshot:
+        """
+        Current values of the settings of the process,
+        without the ones replaced for the current request.
+        """
+        return self.__snapshot
 
     def __getattr__(self, item):
+        # Only called for the settings not read from the current snapshot yet,
+        # or replaced by some request:
         if not item.startswith("_"):
-            return self.__custom_settings.get(item, getattr(ProjectSettings(), item))
+            request_settings = _request_settings.get()
+            if request_settings and item in request_settings:
+                return request_settings[item]
+            snapshot = self.__snapshot
+            value = getattr(snapshot, item)
+            with self.__lock:
+                if snapshot is self.__snapshot and item not in self.__request_keys:
+                    self.__dict__[item] = value
+            return value
         return super().__getattr__(item)
 
     def __setattr__(self, key, value):
         if not key.startswith("_"):
             self.__check_is_setting(key)
-            self.__custom_settings[key] = value
+            with self.__lock:
+                self.__custom_settings[key] = value
+                self.__set_snapshot(self.__snapshot.replace(**{key: value}))
         else:
             super().__setattr__(key, value)
 
+    def __set_snapshot(self, snapshot: SettingsSnapshot) -> None:
+        self.__snapshot = snapshot
+        for key in [key for key in self.__dict__ if not key.startswith("_")]:
+            del self.__dict__[key]
+
+    def __add_request_keys(self, keys) -> None:
+        for key in keys:
+            self.__check_is_setting(key)
+        if self.__request_keys.issuperset(keys):
+            return
+        with self.__lock:
+            self.__request_keys.update(keys)
+            for key in keys:
+                self.__dict__.pop(key, None)
+
+    def reload(self) -> None:
+        """
+        Reads the settings from the environment again,
+        keeping the ones set on this object.
+        """
+        with self.__lock:
+            self.__set_snapshot(SettingsSnapshot(self.__custom_settings))
+
+    @contextmanager
+    def override(self, **custom_settings) -> Iterator[None]:
+        """
+        Replaces some settings for the current request within a `with` block, e.g.
+        `with settings.override(RUNNING_PLATFORM="Telegram"): ...`.
+
+        The settings are only replaced in the current context, i.e. in the current
+        thread or asyncio task, along with the tasks it creates and the functions
+        it runs in an executor (see `bright_chatbot.utils.aio.run_in_executor`),
+        so the requests served concurrently by the process do not see them.
+        """
+        self.__add_request_keys(custom_settings)
+        token = _request_settings.set(
+            {**(_request_settings.get() or {}), **custom_settings}
+        )
+        try:
+            yield
+        finally:
+            _request_settings.reset(token)
+
+    def update_request(self, **custom_settings) -> None:
+        """
+        Replaces some settings until the end of the innermost `override` block,
+        e.g. a setting of the user found while replying to their message.
+
+        Unlike `override`, the settings are seen by the whole request,
+        even if they are replaced from a function run in an executor.
+        """
+        request_settings = _request_settings.get()
+        if request_settings is None:
+            raise RuntimeError("The settings can only be updated within `override`")
+        self.__add_request_keys(custom_settings)
+        request_settings.update(custom_settings)
+
     def __check_is_setting(self, key):
         if not (
             key in ProjectSettings.__dict__
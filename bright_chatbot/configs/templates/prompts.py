@@ -20,6 +20,22 @@ According to the User's subscription plan, they can send not more than {session_
 Users can upgrade their subscription plan to send more messages at any time by going to https://brightbot.chat/
 """
 
+CHAT_SUMMARY_PROMPT = """
+Summarize the conversation between a user and a chat bot below, keeping the facts, names, preferences and requests that the chat bot may need to carry on with the conversation.
+Extend the current summary with the new messages instead of starting over, and reply only with the updated summary.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+"""
+
+CHAT_SUMMARY_SYSTEM_PROMPT = """
+Summary of the earlier messages of this conversation, which are not shown:
+{summary}
+"""
+
 USER_WELCOME_MESSAGE = """
 Welcome to the BrightBot Chat!
 You can start a conversation with the AI chatbot by simply sending a message.
@@ -1,6 +1,6 @@
-from .sessions import UserSession, UserSessionConfig
+from .sessions import UserSession, UserSessionConfig, SessionUsage, SessionSummary
 from .message import MessagePrompt, MessageResponse
 from .user import User
 from .chat_history import ChatHistory
 from .errors import ApplicationError
-from .outputs import HandlerOutput
+from .outputs import HandlerOutput, ReplyResult
@@ -1,13 +1,21 @@
 from __future__ import annotations
 
-from typing import List, Dict, Union, Type
+from typing import Iterable, List, Dict, Tuple, Union, Type
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
 from bright_chatbot.configs import settings
 from bright_chatbot.models.sessions import UserSession
 from bright_chatbot.models.message import MessagePrompt, MessageResponse
-from bright_chatbot.backends.base_backend import BaseDataBackend
+from bright_chatbot.backends.base_backend import (
+    BaseDataBackend,
+    AsyncBaseDataBackend,
+    aread_chat_history,
+    message_key,
+    newest_messages,
+    read_chat_history,
+)
+from bright_chatbot.utils.tokens import TOKENS_PER_REPLY, count_chat_message_tokens
 
 
 class ChatHistory(BaseModel):
@@ -18,10 +26,20 @@ class ChatHistory(BaseModel):
 
     session: UserSession
     messages: List[Union[MessagePrompt, MessageResponse]] = []
+    # Chat representation of the messages, by message:
+    _chat_reprs: List[Tuple[Union[MessagePrompt, MessageResponse], Dict[str, str]]] = (
+        PrivateAttr(default_factory=list)
+    )
 
-    def to_chat_representation(self) -> List[Dict[str, str]]:
+    def to_chat_representation(self, reserved_tokens: int = 0) -> List[Dict[str, str]]:
         """
         Returns a list of dicts that can be used for chat completions
+
+        The system prompts are always kept, along with the summary of the session
+        in place of the messages it includes, and the newest messages are added
+        as long as they fit in the `CHAT_CONTEXT_MAX_TOKENS` setting,
+        leaving `reserved_tokens` for the rest of the completion
+        (e.g. the prompt and the answer).
         """
         chat_history_repr = []
         # Add the initial system prompt containing instructions and the status of the session
@@ -41,8 +59,32 @@ class ChatHistory(BaseModel):
                     "content": self.session.session_config.extra_content_system_prompt,
                 }
             )
-        for message in self.messages:
-            chat_history_repr.append(message.to_chat_repr())
+        if self.session.session_summary:
+            chat_history_repr.append(
+                {
+                    "role": "system",
+                    "content": settings.CHAT_SUMMARY_SYSTEM_PROMPT.format(
+                        summary=self.session.session_summary.text
+                    ).strip(),
+                }
+            )
+        budget = (
+            settings.CHAT_CONTEXT_MAX_TOKENS
+            - reserved_tokens
+            - TOKENS_PER_REPLY
+            - sum(count_chat_message_tokens(m) for m in chat_history_repr)
+        )
+        window = []
+        summary = self.session.session_summary
+        for message, message_repr in reversed(self._get_chat_reprs()):
+            if summary and summary.includes(message):
+                continue
+            # The counts read from the backend are reused:
+            budget -= message.count_chat_tokens()
+            if budget < 0:
+                break
+            window.append(message_repr)
+        chat_history_repr.extend(reversed(window))
         return chat_history_repr
 
     def refresh_from_backend(
@@ -53,13 +95,118 @@ class ChatHistory(BaseModel):
         """
         Retrieves the chat history from the backend and updates the chat history
         Optionally, a message can be excluded from the update
+
+        Only the newest messages sent along with the prompts are read
+        (see `CHAT_HISTORY_MAX_MESSAGES` and `CHAT_HISTORY_MAX_CHARACTERS`),
+        unless the backend does not count the usage of the session,
+        as its quotas are then checked against the whole history.
         """
-        self.messages = backend.get_session_chat_history(self.session)
-        if exclude:
-            try:
-                self.messages.remove(exclude)
-            except ValueError:
-                pass
+        self.messages = read_chat_history(
+            backend, self.session, **self._history_limits()
+        )
+        self._exclude_message(exclude)
+
+    async def arefresh_from_backend(
+        self,
+        backend: Type[AsyncBaseDataBackend],
+        exclude: Union[MessagePrompt, MessageResponse] = None,
+    ) -> None:
+        """
+        Asynchronous version of `refresh_from_backend`
+        that retrieves the chat history from an asynchronous backend.
+        """
+        self.messages = await aread_chat_history(
+            backend, self.session, **self._history_limits()
+        )
+        self._exclude_message(exclude)
+
+    def add_messages(
+        self, messages: Iterable[Union[MessagePrompt, MessageResponse]]
+    ) -> None:
+        """
+        Adds the messages that are not in the chat history yet,
+        e.g. the ones read from the backend since it was refreshed.
+
+        Only the newest messages are kept afterwards, within the same limits
+        the chat history is refreshed with (see `refresh_from_backend`).
+        """
+        known = {message_key(message) for message in self.messages}
+        added = [m for m in messages if message_key(m) not in known]
+        if not added:
+            return
+        added.sort(key=lambda m: m.created_at.timestamp())
+        newest = self.messages[-1].created_at.timestamp() if self.messages else None
+        self.messages.extend(added)
+        if newest is not None and added[0].created_at.timestamp() < newest:
+            # Saved out of order, the representations after it are made again:
+            self.messages.sort(key=lambda m: m.created_at.timestamp())
+        limits = self._history_limits()
+        if limits:
+            dropped = len(self.messages) - len(
+                newest_messages(reversed(self.messages), **limits)
+            )
+            del self.messages[:dropped]
+            del self._chat_reprs[:dropped]
+        self._get_chat_reprs()
+
+    def fork(
+        self,
+        session: UserSession = None,
+        exclude: Union[MessagePrompt, MessageResponse] = None,
+    ) -> ChatHistory:
+        """
+        Returns a copy of the chat history that can be changed on its own,
+        optionally with another (e.g. newer) version of its session
+        and a message excluded.
+
+        The chat representation of the messages is shared with the copy.
+        """
+        history = ChatHistory.construct(
+            session=session or self.session, messages=list(self.messages)
+        )
+        history._chat_reprs = list(self._chat_reprs)
+        history._exclude_message(exclude)
+        return history
+
+    def _get_chat_reprs(
+        self,
+    ) -> List[Tuple[Union[MessagePrompt, MessageResponse], Dict[str, str]]]:
+        """
+        Returns the messages along with their chat representation.
+
+        The representations are kept, so only the ones of the messages
+        added after the last call are made, as long as the messages
+        before them did not change.
+        """
+        kept = 0
+        for (message, _), current in zip(self._chat_reprs, self.messages):
+            if message is not current:
+                break
+            kept += 1
+        del self._chat_reprs[kept:]
+        self._chat_reprs.extend(
+            (message, message.to_chat_repr()) for message in self.messages[kept:]
+        )
+        return self._chat_reprs
+
+    def _history_limits(self) -> Dict[str, int]:
+        if self.session.session_usage is None:
+            return {}
+        return {
+            "max_messages": settings.CHAT_HISTORY_MAX_MESSAGES or None,
+            "max_characters": settings.CHAT_HISTORY_MAX_CHARACTERS or None,
+        }
+
+    def _exclude_message(
+        self, exclude: Union[MessagePrompt, MessageResponse] = None
+    ) -> None:
+        if not exclude:
+            return
+        key = message_key(exclude)
+        for message in self.messages:
+            if message_key(message) == key:
+                self.messages.remove(message)
+                return
 
     def _get_chat_system_role_prompt(self) -> str:
         """
@@ -80,12 +227,32 @@ class ChatHistory(BaseModel):
             session_quota=self.session.session_quota,
         ).strip()
 
+    def get_unsummarized_messages(self) -> List[Union[MessagePrompt, MessageResponse]]:
+        """
+        Returns the messages that are not included in the summary of the session.
+        """
+        summary = self.session.session_summary
+        if summary is None:
+            return list(self.messages)
+        return [message for message in self.messages if not summary.includes(message)]
+
     def get_chat_responses(self) -> List[MessageResponse]:
         return list(filter(lambda x: isinstance(x, MessageResponse), self.messages))
 
     def get_chat_prompts(self) -> List[MessagePrompt]:
         return list(filter(lambda x: isinstance(x, MessagePrompt), self.messages))
 
+    def get_pending_prompts(self) -> List[MessagePrompt]:
+        """
+        Returns the prompts sent after the last response of the chat.
+        """
+        pending = []
+        for message in reversed(self.messages):
+            if isinstance(message, MessageResponse):
+                break
+            pending.insert(0, message)
+        return pending
+
     def get_image_generation_responses(self) -> List[MessageResponse]:
         responses = self.get_chat_responses()
         return list(filter(lambda x: x.media_url, responses))
@@ -30,6 +30,10 @@ class ApplicationError(BaseModel):
             return exceptions.SessionLimitError(
                 self.message, status_code=self.status_code
             )
+        if self.status_code == 504:
+            return exceptions.DeadlineExceeded(
+                self.message, status_code=self.status_code
+            )
         return exceptions.ApplicationError(self.message, status_code=self.status_code)
 
     def raise_error(self, source_exc=None) -> None:
@@ -4,6 +4,7 @@ from typing import Dict, Optional
 from pydantic import BaseModel, validator, Field
 
 from bright_chatbot.models.user import User
+from bright_chatbot.utils.tokens import count_chat_message_tokens
 
 
 class MessagePrompt(BaseModel):
@@ -14,6 +15,8 @@ class MessagePrompt(BaseModel):
     body: str
     from_user: User
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
+    chat_tokens: Optional[int] = None
+    """ Tokens of the chat representation of the message, once counted. """
 
     def to_text_repr(self) -> str:
         """
@@ -30,6 +33,15 @@ class MessagePrompt(BaseModel):
             "content": f"{self.created_at.isoformat()}: {self.to_text_repr()}",
         }
 
+    def count_chat_tokens(self) -> int:
+        """
+        Returns the tokens of the chat representation of the message,
+        which are only counted the first time.
+        """
+        if self.chat_tokens is None:
+            self.chat_tokens = count_chat_message_tokens(self.to_chat_repr())
+        return self.chat_tokens
+
 
 class MessageResponse(BaseModel):
     """
@@ -47,6 +59,10 @@ class MessageResponse(BaseModel):
     is_error: bool = False  # 500 http status code
     is_in_maintenance: bool = False  # 503 http status code
     status_code: Optional[int] = 200
+    tokens: Optional[int] = None
+    """ Tokens used by the chat completion that generated the response, if any. """
+    chat_tokens: Optional[int] = None
+    """ Tokens of the chat representation of the message, once counted. """
 
     @validator("is_empty", always=True)
     def set_is_empty(cls, v, values):
@@ -83,3 +99,12 @@ class MessageResponse(BaseModel):
         if self.media_url:
             return {"role": "user", "content": self.to_text_repr()}
         return {"role": "assistant", "content": self.to_text_repr()}
+
+    def count_chat_tokens(self) -> int:
+        """
+        Returns the tokens of the chat representation of the message,
+        which are only counted the first time.
+        """
+        if self.chat_tokens is None:
+            self.chat_tokens = count_chat_message_tokens(self.to_chat_repr())
+        return self.chat_tokens
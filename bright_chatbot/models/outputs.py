@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Literal
+from typing import List, Dict, Any, Literal, Optional
 
 
 from pydantic import BaseModel
@@ -15,3 +15,18 @@ class HandlerOutput(BaseModel):
     message_response: MessageResponse
     requested_features: Dict[str, Any] = {}
     context: Dict[str, Any] = {}
+
+
+class ReplyResult(BaseModel):
+    """
+    Represents the outcome of replying to a single prompt.
+
+    A prompt only fails when an unexpected error prevented the reply,
+    application errors (e.g. a flagged message) are already notified to the user.
+    """
+
+    message_prompt: MessagePrompt
+    succeeded: bool = True
+    error: Optional[str] = None
+    stages: Optional[Dict[str, Any]] = None
+    """ Timings of the stages of the reply, see `StageReport.to_dict`. """
@@ -1,10 +1,11 @@
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Union
 
 from pydantic import BaseModel
 
 from bright_chatbot.configs import settings
 from bright_chatbot.models.user import User
+from bright_chatbot.models.message import MessagePrompt, MessageResponse
 
 
 class UserSessionConfig(BaseModel):
@@ -17,6 +18,56 @@ class UserSessionConfig(BaseModel):
     extra_content_system_prompt: Optional[str] = settings.EXTRA_CONTENT_SYSTEM_PROMPT
     user_referral_link: Optional[str] = settings.USER_REFERRAL_LINK
     user_plan: Optional[str] = None
+    welcome_message: Optional[str] = None
+    """ Message that greets a new user, `settings.USER_WELCOME_MESSAGE` if None. """
+
+
+class SessionUsage(BaseModel):
+    """
+    Usage of a user session, counted by the backend as its messages are saved.
+    """
+
+    prompts: int = 0
+    images: int = 0
+    tokens: int = 0
+
+    @classmethod
+    def of_message(
+        cls, message: Union[MessagePrompt, MessageResponse]
+    ) -> "SessionUsage":
+        """
+        Returns the usage added to a session by saving a message.
+        """
+        if isinstance(message, MessagePrompt):
+            return cls(prompts=1)
+        return cls(images=1 if message.media_url else 0, tokens=message.tokens or 0)
+
+    def add(self, other: "SessionUsage") -> "SessionUsage":
+        return SessionUsage(
+            prompts=self.prompts + other.prompts,
+            images=self.images + other.images,
+            tokens=self.tokens + other.tokens,
+        )
+
+
+class SessionSummary(BaseModel):
+    """
+    Rolling summary of the oldest messages of a user session,
+    sent in place of those messages in the chat completions.
+    """
+
+    text: str
+    summarized_until: datetime
+    """ Creation time of the newest message included in the summary. """
+
+    def includes(self, message: Union[MessagePrompt, MessageResponse]) -> bool:
+        return message.created_at.timestamp() <= self.summarized_until.timestamp()
+
+    def includes_summary(self, other: "SessionSummary") -> bool:
+        """
+        Whether the summary includes all the messages of the other one.
+        """
+        return other.summarized_until.timestamp() <= self.summarized_until.timestamp()
 
 
 class UserSession(BaseModel):
@@ -30,3 +81,7 @@ class UserSession(BaseModel):
     session_end: datetime
     session_quota: int = settings.MAX_REQUESTS_PER_SESSION
     session_config: UserSessionConfig = UserSessionConfig()
+    session_usage: Optional[SessionUsage] = None
+    """ Usage of the session, if it is counted by the backend. """
+    session_summary: Optional[SessionSummary] = None
+    """ Summary of the oldest messages of the session, if any. """
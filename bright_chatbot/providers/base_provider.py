@@ -1,29 +1,16 @@
 from __future__ import annotations
 import abc
+from concurrent.futures import Executor
 import logging
 from typing import List
 
 from bright_chatbot import models
+from bright_chatbot.utils.aio import run_in_executor
 
 
-class BaseProvider(abc.ABC):
+class _MessageSplitterMixin:
     MSG_LENGTH_LIMIT = 1250
 
-    @abc.abstractmethod
-    def send_message(self, message: models.MessageResponse) -> None:
-        """
-        Sends a message to a user using the communication provider's API.
-        """
-        raise NotImplementedError()
-
-    def send_response(self, message: models.MessageResponse) -> None:
-        """
-        Sends a response message to a user.
-        The response is split into multiple messages if it's too long.
-        """
-        for msg in self._split_message(message):
-            self.send_message(msg)
-
     def _split_message(
         self, message: models.MessageResponse
     ) -> List[models.MessageResponse]:
@@ -51,3 +38,68 @@ class BaseProvider(abc.ABC):
     @property
     def logger(self):
         return logging.getLogger(f"bright_chatbot.providers.{self.__class__.__name__}")
+
+
+class BaseProvider(_MessageSplitterMixin, abc.ABC):
+    @abc.abstractmethod
+    def send_message(self, message: models.MessageResponse) -> None:
+        """
+        Sends a message to a user using the communication provider's API.
+        """
+        raise NotImplementedError()
+
+    def send_response(self, message: models.MessageResponse) -> None:
+        """
+        Sends a response message to a user.
+        The response is split into multiple messages if it's too long.
+        """
+        for msg in self._split_message(message):
+            self.send_message(msg)
+
+
+class AsyncBaseProvider(_MessageSplitterMixin, abc.ABC):
+    """
+    Asynchronous counterpart of `BaseProvider`.
+    """
+
+    @abc.abstractmethod
+    async def send_message(self, message: models.MessageResponse) -> None:
+        """
+        Sends a message to a user using the communication provider's API.
+        """
+        raise NotImplementedError()
+
+    async def send_response(self, message: models.MessageResponse) -> None:
+        """
+        Sends a response message to a user.
+        The response is split into multiple messages if it's too long.
+        """
+        for msg in self._split_message(message):
+            await self.send_message(msg)
+
+
+class AsyncProviderAdapter(AsyncBaseProvider):
+    """
+    Exposes a synchronous provider through the asynchronous interface
+    by running its blocking calls in an executor.
+
+    If no executor is given, the default executor of the running loop is used.
+    """
+
+    def __init__(self, provider: BaseProvider, executor: Executor = None):
+        self._provider = provider
+        self._executor = executor
+
+    @property
+    def provider(self) -> BaseProvider:
+        """
+        Synchronous provider wrapped by the adapter.
+        """
+        return self._provider
+
+    async def send_message(self, message: models.MessageResponse) -> None:
+        await run_in_executor(self._executor, self.provider.send_message, message)
+
+    async def send_response(self, message: models.MessageResponse) -> None:
+        # Let the wrapped provider split the message with its own limits:
+        await run_in_executor(self._executor, self.provider.send_response, message)
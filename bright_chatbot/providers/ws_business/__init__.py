@@ -1 +1 @@
-from .provider import WhatsAppBusinessProvider
+from .provider import WhatsAppBusinessProvider, AsyncWhatsAppBusinessProvider
@@ -1,4 +1,6 @@
 from typing import Dict, Any, Union
+
+import aiohttp
 import requests
 
 
@@ -6,6 +8,8 @@ class WhatsAppBusinessClient:
     def __init__(self, from_phone_number: str, auth_token: str):
         self._from_phone_number = from_phone_number
         self._auth_token = auth_token
+        # Keep the connections alive between messages:
+        self._http_session = requests.Session()
 
     @property
     def from_phone_number(self):
@@ -25,7 +29,7 @@ class WhatsAppBusinessClient:
             "Content-Type": "application/json",
         }
 
-    def send_message(
+    def get_request_data(
         self,
         phone_number: str,
         message: str = None,
@@ -33,7 +37,7 @@ class WhatsAppBusinessClient:
         template: Union[Dict[str, Any], None] = None,
     ) -> Dict[str, Any]:
         """
-        Send a WhatsApp message to an user using the WhatsApp Business API.
+        Builds the payload of a message for the WhatsApp Business API.
         """
         if not (message or template or image_url):
             raise ValueError("Either a message or template must be provided.")
@@ -52,9 +56,70 @@ class WhatsAppBusinessClient:
                 "link": image_url,
                 "caption": message,
             }
-        response = requests.post(
+        return data
+
+    def send_message(
+        self,
+        phone_number: str,
+        message: str = None,
+        image_url: str = None,
+        template: Union[Dict[str, Any], None] = None,
+    ) -> Dict[str, Any]:
+        """
+        Send a WhatsApp message to an user using the WhatsApp Business API.
+        """
+        data = self.get_request_data(phone_number, message, image_url, template)
+        response = self._http_session.post(
             self.url_endpoint, json=data, headers=self.get_request_headers()
         )
         response.raise_for_status()
         result = response.json()
         return result
+
+    def connect(self) -> None:
+        """
+        Opens a connection to the WhatsApp Business API ahead of the first message,
+        it is kept alive by the HTTP session to be reused when sending them.
+        """
+        self._http_session.head(self.url_endpoint, headers=self.get_request_headers())
+
+
+class AsyncWhatsAppBusinessClient(WhatsAppBusinessClient):
+    """
+    Client of the WhatsApp Business API that sends the messages
+    without blocking the event loop.
+
+    The HTTP session is created lazily and reused across messages,
+    call `close` once the client is no longer needed.
+    """
+
+    def __init__(self, from_phone_number: str, auth_token: str):
+        super().__init__(from_phone_number, auth_token)
+        self._session: Union[aiohttp.ClientSession, None] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(headers=self.get_request_headers())
+        return self._session
+
+    async def send_message(
+        self,
+        phone_number: str,
+        message: str = None,
+        image_url: str = None,
+        template: Union[Dict[str, Any], None] = None,
+    ) -> Dict[str, Any]:
+        """
+        Send a WhatsApp message to an user using the WhatsApp Business API.
+        """
+        data = self.get_request_data(phone_number, message, image_url, template)
+        async with self.session.post(self.url_endpoint, json=data) as response:
+            response.raise_for_status()
+            result = await response.json()
+        return result
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
@@ -2,8 +2,11 @@ from typing import Dict
 
 from bright_chatbot import models
 from bright_chatbot.utils.functional import classproperty
-from bright_chatbot.providers.base_provider import BaseProvider
-from bright_chatbot.providers.ws_business.client import WhatsAppBusinessClient
+from bright_chatbot.providers.base_provider import BaseProvider, AsyncBaseProvider
+from bright_chatbot.providers.ws_business.client import (
+    WhatsAppBusinessClient,
+    AsyncWhatsAppBusinessClient,
+)
 from bright_chatbot.configs import settings
 from bright_chatbot.utils.exceptions import ValidationError
 
@@ -63,3 +66,40 @@ class WhatsAppBusinessProvider(BaseProvider):
     @classproperty
     def from_phone_number(self) -> str:
         return settings.WHATSAPP_BUSINESS_PHONE_NUMBER_ID
+
+
+class AsyncWhatsAppBusinessProvider(AsyncBaseProvider):
+    """
+    Asynchronous version of the `WhatsAppBusinessProvider`.
+    """
+
+    MSG_LENGTH_LIMIT = WhatsAppBusinessProvider.MSG_LENGTH_LIMIT
+
+    def __init__(self, **ws_client_kwargs):
+        kwargs = {
+            "from_phone_number": WhatsAppBusinessProvider.from_phone_number,
+            "auth_token": WhatsAppBusinessProvider.auth_token,
+        }
+        kwargs.update(ws_client_kwargs)
+        self._client = AsyncWhatsAppBusinessClient(**kwargs)
+
+    @property
+    def client(self) -> AsyncWhatsAppBusinessClient:
+        """
+        Returns the object instance of the WhatsApp Business client.
+        """
+        return self._client
+
+    async def send_message(self, message: models.MessageResponse):
+        for msg in self._split_message(message):
+            parsed_msg = self._parse_message(msg)
+            await self.client.send_message(**parsed_msg)
+
+    def _parse_message(self, message: models.MessageResponse) -> Dict[str, str]:
+        return WhatsAppBusinessProvider._parse_message(self, message)
+
+    async def close(self) -> None:
+        """
+        Closes the HTTP session of the underlying client.
+        """
+        await self.client.close()
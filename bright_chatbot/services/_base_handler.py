@@ -18,14 +18,22 @@ class OpenAITaskBaseHandler(abc.ABC):
     generate a reply.
 
     Various tasks can include image generation, text generation, etc.
+
+    Handlers are asynchronous, the calls to the OpenAI API are awaited
+    and the messages are sent and saved through the client's scheduled tasks.
+
+    A handler is made for a single reply, the `context` of the reply holds
+    its state (e.g. the chat history) and the tasks scheduled for it.
     """
 
     def __init__(
         self,
         openai_lib: openai,
-        client: client.OpenAIChatClient,
+        client: client.AsyncOpenAIChatClient,
+        context: client.ReplyContext,
     ):
         self._client = client
+        self._context = context
         self._openai_lib = openai_lib
         self._logger = logging.getLogger(f"{__package__}.{self.__class__.__name__}")
 
@@ -37,12 +45,19 @@ class OpenAITaskBaseHandler(abc.ABC):
     def client(self):
         return self._client
 
+    @property
+    def context(self) -> client.ReplyContext:
+        """
+        State of the reply made by the handler.
+        """
+        return self._context
+
     @property
     def logger(self) -> logging.Logger:
         return self._logger
 
     @abc.abstractmethod
-    def reply(
+    async def reply(
         self,
         prompt: models.MessagePrompt,
         user_session: models.UserSession,
@@ -1,10 +1,19 @@
 from __future__ import annotations
+import asyncio
 import re
-from typing import Any, Dict, Tuple, Union
+from typing import Any, Dict, List, Tuple, Union
 
 from bright_chatbot.services._base_handler import OpenAITaskBaseHandler
+from bright_chatbot.services.streaming import StreamingAnswerBuffer
+from bright_chatbot.configs import settings
 from bright_chatbot import models
 from bright_chatbot.client import errors
+from bright_chatbot.utils.deadlines import wait_for
+from bright_chatbot.utils.tokens import (
+    TOKENS_PER_REPLY,
+    count_chat_message_tokens,
+    count_tokens,
+)
 
 
 class ChatReplyHandler(OpenAITaskBaseHandler):
@@ -12,28 +21,62 @@ class ChatReplyHandler(OpenAITaskBaseHandler):
     Handler for the task of generating a reply to a user message.
     """
 
-    def reply(
+    completion_usage: Union[Dict[str, int], None] = None
+    """ Tokens usage reported by the API for the last generated answer. """
+
+    _last_sent_part: Union[asyncio.Task, None] = None
+
+    # Maximum number of tokens of the summaries of the sessions:
+    SUMMARY_MAX_TOKENS = 300
+
+    async def reply(
         self,
         prompt: models.MessagePrompt,
         user_session: models.UserSession,
+        txt_answer: str = None,
+        completion_usage: Dict[str, int] = None,
     ) -> models.HandlerOutput:
         """
         Generates a response to a message prompt and sends it to the user via the
         communication provider.
+
+        If `txt_answer` is given (e.g. an answer generated ahead of time),
+        it is sent instead of generating a new one, along with
+        the `completion_usage` of the chat completion that generated it.
+
+        The answers streamed are parsed without `Reply(...)` directives,
+        as they replace the whole answer, which may already be partly sent.
         """
-        self.logger.info(f"Generating answer from user prompt: '{prompt}'")
-        try:
-            txt_answer = self._generate_answer(prompt)
-        except self.openai.InvalidRequestError as e:
-            errors.INVALID_REQUEST_ERROR.raise_error(e)
-        self.logger.info(f"Model generated the answer: '{txt_answer}'")
-        parsed_answer = self._parse_model_answer(txt_answer)
+        self.completion_usage = completion_usage
+        stream_buffer = None
+        if txt_answer is None and settings.STREAM_CHAT_COMPLETIONS:
+            stream_buffer = await wait_for(self._stream_answer(prompt))
+            txt_answer = stream_buffer.text.strip()
+        elif txt_answer is None:
+            txt_answer = await self.generate_answer(prompt)
+        parsed_answer = self._parse_model_answer(
+            txt_answer, parse_reply=stream_buffer is None
+        )
         response = models.MessageResponse(
             body=parsed_answer["response_body"], to_user=prompt.from_user
         )
-        raw_response = models.MessageResponse(body=txt_answer, to_user=prompt.from_user)
-        self.client.send_response(response)
-        self.client.save_response(raw_response, user_session)
+        raw_response = models.MessageResponse(
+            body=txt_answer,
+            to_user=prompt.from_user,
+            tokens=(self.completion_usage or {}).get("total_tokens"),
+        )
+        if stream_buffer is None:
+            self.client.send_response(self.context, response)
+        else:
+            # Send what was not delivered while the answer was streamed:
+            unsent_body = stream_buffer.get_unsent_body(response.body)
+            if unsent_body:
+                self.client.send_response(
+                    self.context,
+                    models.MessageResponse(body=unsent_body, to_user=prompt.from_user),
+                    after=self._last_sent_part,
+                )
+        self.client.save_response(self.context, raw_response, user_session)
         output = models.HandlerOutput(
             message_prompt=prompt,
             message_response=response,
@@ -47,33 +90,172 @@ class ChatReplyHandler(OpenAITaskBaseHandler):
         self.logger.info(f"Sent chat reply with output: '{output}'")
         return output
 
-    def _generate_answer(
+    async def generate_answer(self, prompt: models.MessagePrompt) -> str:
+        """
+        Generates the answer to a message prompt without sending nor saving it.
+        """
+        self.logger.info(f"Generating answer from user prompt: '{prompt}'")
+        try:
+            txt_answer = await self._generate_answer(prompt)
+        except self.openai.InvalidRequestError as e:
+            errors.INVALID_REQUEST_ERROR.raise_error(e)
+        self.logger.info(f"Model generated the answer: '{txt_answer}'")
+        return txt_answer
+
+    async def summarize_history(
+        self, chat_history: models.ChatHistory
+    ) -> Union[models.SessionSummary, None]:
+        """
+        Adds the oldest messages of the chat history to the summary of the session
+        once the messages not summarized take more tokens than the
+        `CHAT_SUMMARY_THRESHOLD_TOKENS` setting, until they take half of them.
+
+        The summary is extended from the previous one with the new messages,
+        it is never generated again from all of them.
+        Returns None if the summary is not extended.
+        """
+        threshold = settings.CHAT_SUMMARY_THRESHOLD_TOKENS
+        messages = chat_history.get_unsummarized_messages()
+        tokens = sum(message.count_chat_tokens() for message in messages)
+        if not threshold or tokens <= threshold:
+            return None
+        summarized = []
+        for message in messages:
+            if tokens <= threshold // 2:
+                break
+            tokens -= message.count_chat_tokens()
+            summarized.append(message)
+        previous = chat_history.session.session_summary
+        summary_prompt = settings.CHAT_SUMMARY_PROMPT.format(
+            summary=previous.text if previous else "",
+            messages="\n".join(
+                f"{'User' if isinstance(m, models.MessagePrompt) else 'Bot'}: "
+                f"{m.to_text_repr()}"
+                for m in summarized
+            ),
+        ).strip()
+        completion = await wait_for(
+            self.openai.ChatCompletion.acreate(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": summary_prompt}],
+                user=chat_history.session.user.hashed_user_id,
+                max_tokens=self.SUMMARY_MAX_TOKENS,
+            )
+        )
+        self.logger.info(f"Summarized {len(summarized)} messages of the session")
+        return models.SessionSummary(
+            text=completion.choices[0].message.content.strip(),
+            summarized_until=summarized[-1].created_at,
+        )
+
+    async def _stream_answer(
+        self, prompt: models.MessagePrompt
+    ) -> StreamingAnswerBuffer:
+        """
+        Generates the answer to a message prompt as a stream, sending each
+        paragraph to the user as soon as it is finished.
+
+        Returns the buffer with the full answer and the text that was already sent.
+        """
+        self.logger.info(f"Streaming answer from user prompt: '{prompt}'")
+        stream_buffer = StreamingAnswerBuffer()
+        messages = self._get_chat_messages(prompt)
+        try:
+            completion = await self._create_completion(
+                prompt, messages=messages, stream=True
+            )
+            async for chunk in completion:
+                delta = chunk.choices[0].delta.get("content", "")
+                paragraphs = stream_buffer.feed(delta)
+                if paragraphs:
+                    self._last_sent_part = self.client.send_response(
+                        self.context,
+                        models.MessageResponse(
+                            body="\n\n".join(paragraphs), to_user=prompt.from_user
+                        ),
+                        after=self._last_sent_part,
+                    )
+        except self.openai.InvalidRequestError as e:
+            errors.INVALID_REQUEST_ERROR.raise_error(e)
+        self.logger.info(f"Model streamed the answer: '{stream_buffer.text}'")
+        # The usage is not reported for streamed completions, so the tokens
+        # counted for the quota are estimated:
+        self.completion_usage = self._estimate_usage(messages, stream_buffer.text)
+        return stream_buffer
+
+    @staticmethod
+    def _estimate_usage(messages: List[Dict[str, str]], answer: str) -> Dict[str, int]:
+        """
+        Estimates the usage of a chat completion from its messages and answer,
+        in the format reported by the API.
+        """
+        prompt_tokens = TOKENS_PER_REPLY + sum(
+            count_chat_message_tokens(message) for message in messages
+        )
+        completion_tokens = count_tokens(answer)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    async def _generate_answer(
         self,
         prompt: models.MessagePrompt,
     ) -> str:
         """
         Generates a response to a message prompt using the OpenAI API.
         """
-        chat_history = [
-            *self.client.chat_history.to_chat_representation(),
+        completion = await self._create_completion(prompt)
+        self.completion_usage = dict(completion.get("usage") or {})
+        answer_txt = completion.choices[0].message.content.strip()
+        return answer_txt
+
+    def _get_chat_messages(self, prompt: models.MessagePrompt) -> List[Dict[str, str]]:
+        """
+        Returns the messages of the chat completion of the prompt,
+        given the current chat history.
+        """
+        return [
+            *self.context.chat_history.to_chat_representation(
+                reserved_tokens=prompt.count_chat_tokens()
+                + settings.CHAT_COMPLETION_MAX_TOKENS
+            ),
             prompt.to_chat_repr(),
         ]
-        self.logger.debug(f"Generating an answer from chat: '{chat_history}'")
-        completion = self.openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=chat_history,
-            user=prompt.from_user.hashed_user_id,
-            max_tokens=420,
+
+    async def _create_completion(
+        self,
+        prompt: models.MessagePrompt,
+        messages: List[Dict[str, str]] = None,
+        **kwargs: Any,
+    ):
+        """
+        Requests a chat completion for the prompt given the current chat history,
+        or with the chat `messages` given.
+        """
+        if messages is None:
+            messages = self._get_chat_messages(prompt)
+        self.logger.debug(f"Generating an answer from chat: '{messages}'")
+        return await wait_for(
+            self.openai.ChatCompletion.acreate(
+                model="gpt-3.5-turbo",
+                messages=messages,
+                user=prompt.from_user.hashed_user_id,
+                max_tokens=settings.CHAT_COMPLETION_MAX_TOKENS,
+                **kwargs,
+            )
         )
-        answer_txt = completion.choices[0].message.content.strip()
-        return answer_txt
 
-    def _parse_model_answer(self, answer: str) -> Dict[str, Any]:
+    def _parse_model_answer(
+        self, answer: str, parse_reply: bool = True
+    ) -> Dict[str, Any]:
         """
-        Parses the answer generated by the OpenAI API
+        Parses the answer generated by the OpenAI API,
+        the `Reply(...)` directives are only parsed if `parse_reply` is True.
         """
         image, answer = self.get_image_prompt_from_answer(answer)
-        replies = re.findall(r"Reply\((.*?)\)", answer)
+        replies = re.findall(r"Reply\((.*?)\)", answer) if parse_reply else []
         reply = replies[0] if replies else None
         return {
             "response_body": reply if reply else answer,
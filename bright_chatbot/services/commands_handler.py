@@ -17,7 +17,7 @@ class ChatCommandsHandler(OpenAITaskBaseHandler):
 
     _IMG_CMD_REGEX = re.compile(r"/(img|image)\s+(.+)")
 
-    def reply(
+    async def reply(
         self,
         prompt: MessagePrompt,
         user_session: UserSession,
@@ -46,8 +46,8 @@ class ChatCommandsHandler(OpenAITaskBaseHandler):
             body=f"Processing image '{image_prompt}'",
             to_user=user_session.user,
         )
-        self.client.send_response(response)
-        self.client.save_response(response, user_session)
+        self.client.send_response(self.context, response)
+        self.client.save_response(self.context, response, user_session)
         output = HandlerOutput(
             message_prompt=prompt,
             message_response=response,
@@ -63,8 +63,8 @@ class ChatCommandsHandler(OpenAITaskBaseHandler):
             body=f"Here's a link you can share to refer your friends: {user_session.session_config.user_referral_link}",
             to_user=user_session.user,
         )
-        self.client.send_response(response)
-        self.client.save_response(response, user_session)
+        self.client.send_response(self.context, response)
+        self.client.save_response(self.context, response, user_session)
         output = HandlerOutput(
             message_prompt=prompt,
             message_response=response,
@@ -77,13 +77,13 @@ class ChatCommandsHandler(OpenAITaskBaseHandler):
         """
         Handles the end of a user session.
         """
-        self.client.end_user_session(user_session.user)
+        self.client.end_user_session(self.context, user_session.user)
         response = MessageResponse(
             body="Thank you for chatting with me! Have a nice day!",
             to_user=user_session.user,
         )
-        self.client.send_response(response)
-        self.client.save_response(response, user_session)
+        self.client.send_response(self.context, response)
+        self.client.save_response(self.context, response, user_session)
         output = HandlerOutput(
             message_prompt=prompt,
             message_response=response,
@@ -103,8 +103,8 @@ class ChatCommandsHandler(OpenAITaskBaseHandler):
             "/referral <code> - Use a referral code to get a discount\n",
             to_user=user_session.user,
         )
-        self.client.send_response(response)
-        self.client.save_response(response, user_session)
+        self.client.send_response(self.context, response)
+        self.client.save_response(self.context, response, user_session)
         output = HandlerOutput(
             message_prompt=prompt,
             message_response=response,
@@ -121,8 +121,8 @@ class ChatCommandsHandler(OpenAITaskBaseHandler):
             body="Sorry, I didn't understand that command. Use /help to see the list of available commands.",
             to_user=user_session.user,
         )
-        self.client.send_response(response)
-        self.client.save_response(response, user_session)
+        self.client.send_response(self.context, response)
+        self.client.save_response(self.context, response, user_session)
         output = HandlerOutput(
             message_prompt=prompt,
             message_response=response,
@@ -4,6 +4,8 @@ from bright_chatbot.services._base_handler import OpenAITaskBaseHandler
 from bright_chatbot.configs import settings
 from bright_chatbot import models
 from bright_chatbot.client import errors
+from bright_chatbot.utils.deadlines import get_deadline, wait_for
+from bright_chatbot.utils.metrics import metrics
 
 
 class ImageGenerationHandler(OpenAITaskBaseHandler):
@@ -11,7 +13,13 @@ class ImageGenerationHandler(OpenAITaskBaseHandler):
     Handler for the task of generating an image from a prompt.
     """
 
-    def reply(
+    EXPECTED_DURATION_SECONDS = 20.0
+    """
+    Time needed to generate an image, it is skipped (and the user told to ask
+    for it again) if the deadline is closer.
+    """
+
+    async def reply(
         self,
         prompt: models.MessagePrompt,
         user_session: models.UserSession,
@@ -23,13 +31,23 @@ class ImageGenerationHandler(OpenAITaskBaseHandler):
         """
         self.logger.info(f"Generating an image from user prompt: '{prompt}'")
         if not self._check_img_generation_quota(
-            quota=user_session.session_config.max_image_requests
+            quota=user_session.session_config.max_image_requests,
+            user_session=user_session,
         ):
             self.logger.info("User has reached the quota of image generation requests")
             errors.IMAGE_GENERATION_QUOTA_SURPASSED.raise_error()
+        deadline = get_deadline()
+        if deadline is not None and not deadline.can_finish(
+            self.EXPECTED_DURATION_SECONDS
+        ):
+            self.logger.warning(
+                f"Skipping the image generation, not enough time left: {deadline}"
+            )
+            metrics.increment("deadlines.skipped_image_generations")
+            return self._notify_skipped_image(prompt)
         # Catch a rejected request from OpenAI
         try:
-            image_url = self._generate_image(
+            image_url = await self._generate_image(
                 image_prompt,
                 prompt,
                 img_size=user_session.session_config.image_generation_size,
@@ -39,8 +57,8 @@ class ImageGenerationHandler(OpenAITaskBaseHandler):
         response = models.MessageResponse(
             body=image_prompt, media_url=image_url, to_user=prompt.from_user
         )
-        self.client.send_response(response)
-        self.client.save_response(response, user_session)
+        self.client.send_response(self.context, response)
+        self.client.save_response(self.context, response, user_session)
         output = models.HandlerOutput(
             message_prompt=prompt,
             message_response=response,
@@ -48,19 +66,43 @@ class ImageGenerationHandler(OpenAITaskBaseHandler):
         self.logger.info(f"Image generated with output: '{output}'")
         return output
 
+    def _notify_skipped_image(
+        self, prompt: models.MessagePrompt
+    ) -> models.HandlerOutput:
+        """
+        Tells the user to ask for the image again. The text of the reply
+        was already sent, so the reply and the session go on as usual.
+        """
+        error = errors.IMAGE_GENERATION_SKIPPED
+        response = models.MessageResponse(
+            body=error.message, to_user=prompt.from_user, status_code=error.status_code
+        )
+        self.client.send_response(self.context, response)
+        return models.HandlerOutput(message_prompt=prompt, message_response=response)
+
     def _check_img_generation_quota(
-        self, quota: int = settings.MAX_IMAGE_REQUESTS_PER_SESSION
+        self,
+        quota: int = settings.MAX_IMAGE_REQUESTS_PER_SESSION,
+        user_session: models.UserSession = None,
     ) -> bool:
         """
         Checks if the user has reached the quota of image generation requests.
         Returns True if the user has not reached the quota, False otherwise.
+
+        The images are counted from the usage of the session if the backend
+        counts it, otherwise from the chat history.
         """
-        images_generated = self.client.chat_history.get_image_generation_responses()
-        if len(images_generated) >= quota:
+        if user_session is not None and user_session.session_usage is not None:
+            images_generated = user_session.session_usage.images
+        else:
+            images_generated = len(
+                self.context.chat_history.get_image_generation_responses()
+            )
+        if images_generated >= quota:
             return False
         return True
 
-    def _generate_image(
+    async def _generate_image(
         self,
         img_prompt: str,
         prompt: models.MessagePrompt,
@@ -69,12 +111,14 @@ class ImageGenerationHandler(OpenAITaskBaseHandler):
         """
         Generates an image using the OpenAI Image Generation Model (Dall-E)
         """
-        image_resp = self.openai.Image.create(
-            prompt=img_prompt,
-            size=self.get_image_dimmensions(img_size),
-            n=1,
-            response_format="url",
-            user=prompt.from_user.hashed_user_id,
+        image_resp = await wait_for(
+            self.openai.Image.acreate(
+                prompt=img_prompt,
+                size=self.get_image_dimmensions(img_size),
+                n=1,
+                response_format="url",
+                user=prompt.from_user.hashed_user_id,
+            )
         )
         img = image_resp["data"][0]
         img_url = img["url"]
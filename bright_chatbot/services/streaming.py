@@ -0,0 +1,87 @@
+import re
+from typing import List
+
+
+class StreamingAnswerBuffer:
+    """
+    Accumulates the deltas of a streamed chat completion and
+    returns the finished paragraphs that are safe to send to the user.
+
+    A paragraph is finished once a blank line follows it. Paragraphs that
+    may contain an image directive for the application (e.g. `Dalia(...)`)
+    can only be parsed with the full answer, so once one of them is found
+    nothing else is flushed and the rest of the answer is held until the end.
+    The directive is only removed from the answer, so the paragraphs flushed
+    before it are still the start of the parsed answer.
+
+    `Reply(...)` directives replace the whole answer, even the paragraphs
+    already flushed, so they are not parsed from the answers streamed.
+    """
+
+    PARAGRAPH_SEPARATOR = "\n\n"
+    _DIRECTIVE_PATTERNS = [
+        re.compile(r"dalia", flags=re.IGNORECASE),
+        re.compile(r"generating.*?image", flags=re.IGNORECASE),
+    ]
+
+    def __init__(self):
+        self._text = ""
+        self._flushed_upto = 0
+        self._held = False
+
+    @property
+    def text(self) -> str:
+        """
+        Full text received so far.
+        """
+        return self._text
+
+    @property
+    def flushed_text(self) -> str:
+        """
+        Text that has already been returned as finished paragraphs.
+        """
+        return self._text[: self._flushed_upto].strip()
+
+    @property
+    def held(self) -> bool:
+        """
+        Whether the buffer stopped flushing because of a possible image directive.
+        """
+        return self._held
+
+    def feed(self, delta: str) -> List[str]:
+        """
+        Adds a delta of the answer to the buffer and returns
+        the paragraphs that were finished by it.
+        """
+        self._text += delta or ""
+        if self._held:
+            return []
+        boundary = self._text.rfind(self.PARAGRAPH_SEPARATOR, self._flushed_upto)
+        if boundary == -1:
+            return []
+        paragraphs = []
+        position = self._flushed_upto
+        for paragraph in self._text[position:boundary].split(self.PARAGRAPH_SEPARATOR):
+            if self._may_contain_directive(paragraph):
+                self._held = True
+                break
+            position += len(paragraph) + len(self.PARAGRAPH_SEPARATOR)
+            if paragraph.strip():
+                paragraphs.append(paragraph.strip())
+        self._flushed_upto = min(position, boundary + len(self.PARAGRAPH_SEPARATOR))
+        return paragraphs
+
+    def get_unsent_body(self, response_body: str) -> str:
+        """
+        Given the body parsed from the full answer,
+        returns the part of it that has not been flushed yet.
+        """
+        flushed = self.flushed_text
+        if flushed and response_body.startswith(flushed):
+            return response_body[len(flushed) :].strip()
+        return response_body
+
+    def _may_contain_directive(self, paragraph: str) -> bool:
+        return any(pattern.search(paragraph) for pattern in self._DIRECTIVE_PATTERNS)
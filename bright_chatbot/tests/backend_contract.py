@@ -0,0 +1,67 @@
+import os
+from datetime import datetime, timedelta
+from unittest import mock
+
+from bright_chatbot import models
+from bright_chatbot.backends.base_backend import BaseDataBackend
+
+
+@mock.patch.dict(os.environ, {"BRIGHT_CHATBOT_SECRET_KEY": "test"})
+class BackendContractTests:
+    """
+    Tests of the behaviour every data backend must have, mixed into
+    a `unittest.TestCase` of each backend that implements `make_backend`.
+    """
+
+    def make_backend(self) -> BaseDataBackend:
+        """
+        Returns an empty backend, closed by the cleanups of the test case.
+        """
+        raise NotImplementedError
+
+    def setUp(self):
+        self.backend = self.make_backend()
+        self.user = models.User(user_id="123")
+
+    def test_session_lifecycle(self):
+        """
+        Checks that a session is active until it is ended.
+        """
+        session = self.backend.create_user_session(self.user, sess_quota=5)
+        latest = self.backend.get_latest_user_session(self.user)
+        self.assertEqual(latest.session_id, session.session_id)
+        self.assertEqual(latest.session_quota, 5)
+        self.assertEqual(session.session_usage, models.SessionUsage())
+        self.assertEqual(self.backend.get_count_of_active_sessions(), 1)
+        self.backend.end_user_session(self.user)
+        self.assertIsNone(self.backend.get_latest_user_session(self.user))
+        self.assertEqual(self.backend.get_count_of_active_sessions(), 0)
+
+    def test_save_messages(self):
+        """
+        Checks that a prompt and its response are saved together
+        and read back in order.
+        """
+        session = self.backend.create_user_session(self.user)
+        now = datetime.utcnow()
+        self.assertFalse(self.backend.does_user_exist(self.user))
+        self.backend.save_messages(
+            [
+                models.MessagePrompt(body="Hi", from_user=self.user, created_at=now),
+                models.MessageResponse(
+                    body="A cat",
+                    to_user=self.user,
+                    created_at=now + timedelta(seconds=1),
+                    media_url="https://example.com/cat.png",
+                ),
+            ],
+            session,
+        )
+        history = self.backend.get_session_chat_history(session)
+        self.assertListEqual([m.body for m in history], ["Hi", "A cat"])
+        self.assertEqual(history[1].media_url, "https://example.com/cat.png")
+        self.assertEqual(self.backend.get_count_of_session_prompts(session), 1)
+        self.assertTrue(self.backend.does_user_exist(self.user))
+        # The usage is read along with the session, so the history can be bounded:
+        usage = self.backend.get_latest_user_session(self.user).session_usage
+        self.assertEqual((usage.prompts, usage.images), (1, 1))
@@ -0,0 +1,31 @@
+import os
+import unittest
+from unittest import mock
+
+from bright_chatbot.benchmarks import generate_synthetic_corpus, run_benchmark
+
+
+@mock.patch.dict(os.environ, {"BRIGHT_CHATBOT_SECRET_KEY": "test"})
+class TestBenchmark(unittest.TestCase):
+    def test_synthetic_corpus_is_zipf_distributed(self):
+        """
+        Checks that the top user sends most of the messages.
+        """
+        corpus = generate_synthetic_corpus(1000, n_users=50, zipf_exponent=1.5, seed=1)
+        counts = {}
+        for message in corpus:
+            counts[message.user_id] = counts.get(message.user_id, 0) + 1
+        self.assertGreater(max(counts.values()), 1000 / 5)
+
+    def test_replays_corpus(self):
+        """
+        Checks that every message is replied with one completion
+        and that the latencies of the stages are reported.
+        """
+        corpus = generate_synthetic_corpus(20, n_users=5, seed=1)
+        report = run_benchmark(corpus, concurrency=4)
+        self.assertEqual(report.failures, 0)
+        calls = report.calls_per_message()
+        self.assertEqual(calls["openai.chat_completion"], 1)
+        self.assertEqual(calls["provider.send_message"], 1)
+        self.assertIn("p99", report.stage_percentiles()["reply"])
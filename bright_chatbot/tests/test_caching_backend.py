@@ -0,0 +1,60 @@
+import os
+import unittest
+from unittest import mock
+
+from bright_chatbot import models
+from bright_chatbot.backends import CachingBackend, InMemoryBackend
+from bright_chatbot.utils.metrics import metrics
+
+
+@mock.patch.dict(os.environ, {"BRIGHT_CHATBOT_SECRET_KEY": "test"})
+class TestCachingBackend(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.inner = InMemoryBackend()
+        self.backend = CachingBackend(self.inner, maxsize=10, ttl=60)
+        self.user = models.User(user_id="123")
+
+    def test_reads_are_cached_and_writes_update_them(self):
+        """
+        Checks that the history is read once from the wrapped backend
+        and that the saved messages are added to the cached one.
+        """
+        session = self.backend.create_user_session(self.user)
+        with mock.patch.object(
+            self.inner,
+            "get_session_chat_history",
+            wraps=self.inner.get_session_chat_history,
+        ) as get_history:
+            self.backend.save_message_prompt(
+                models.MessagePrompt(body="Hi", from_user=self.user), session
+            )
+            history = self.backend.get_session_chat_history(session)
+            get_history.assert_not_called()
+        self.assertListEqual([m.body for m in history], ["Hi"])
+        self.assertEqual(self.backend.get_count_of_session_prompts(session), 1)
+        self.assertEqual(self.backend.stats()["backend_cache.histories.hits"], 1)
+
+    def test_end_session_invalidates_it(self):
+        """
+        Checks that an ended session is not served from the cache.
+        """
+        self.backend.create_user_session(self.user)
+        self.assertIsNotNone(self.backend.get_latest_user_session(self.user))
+        self.backend.end_user_session(self.user)
+        self.assertIsNone(self.backend.get_latest_user_session(self.user))
+        self.assertEqual(self.backend.stats()["backend_cache.sessions.misses"], 1)
+
+    def test_usage_is_not_cached(self):
+        """
+        Checks that the prompts saved by another process are counted,
+        as the quota of the session is checked against them.
+        """
+        session = self.backend.create_user_session(self.user)
+        self.inner.save_message_prompt(
+            models.MessagePrompt(body="Hi", from_user=self.user), session
+        )
+        cached = self.backend.get_latest_user_session(self.user)
+        self.assertEqual(cached.session_id, session.session_id)
+        self.assertIsNone(cached.session_usage)
+        self.assertEqual(self.backend.get_count_of_session_prompts(session), 1)
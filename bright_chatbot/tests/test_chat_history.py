@@ -0,0 +1,91 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from bright_chatbot import models
+from bright_chatbot.configs import settings
+from bright_chatbot.utils.tokens import TOKENS_PER_REPLY, count_chat_message_tokens
+
+
+class TestChatHistory(unittest.TestCase):
+    def setUp(self):
+        self.user = models.User(user_id="123")
+        now = datetime.utcnow()
+        self.session = models.UserSession(
+            user=self.user,
+            session_id="123:1",
+            session_start=now,
+            session_end=now + timedelta(hours=1),
+        )
+
+    def _prompt(self, body: str) -> models.MessagePrompt:
+        return models.MessagePrompt(body=body, from_user=self.user)
+
+    def test_pending_prompts(self):
+        """
+        Checks that only the prompts after the last response are pending.
+        """
+        history = models.ChatHistory(
+            session=self.session,
+            messages=[
+                self._prompt("Hi"),
+                models.MessageResponse(body="Hello!", to_user=self.user),
+                self._prompt("How are you?"),
+                self._prompt("And your family?"),
+            ],
+        )
+        pending = history.get_pending_prompts()
+        self.assertListEqual(
+            [p.body for p in pending], ["How are you?", "And your family?"]
+        )
+
+    def test_exclude_message_read_from_backend(self):
+        """
+        Checks that a prompt is excluded even if the backend
+        returned it with a timezone aware timestamp.
+        """
+        prompt = self._prompt("Hi")
+        stored = models.MessagePrompt(
+            body="Hi",
+            from_user=self.user,
+            created_at=datetime.fromtimestamp(
+                prompt.created_at.timestamp(), tz=timezone.utc
+            ),
+        )
+        history = models.ChatHistory(session=self.session, messages=[stored])
+        history._exclude_message(prompt)
+        self.assertListEqual(history.messages, [])
+
+    def test_chat_representation_fits_the_context(self):
+        """
+        Checks that the system prompts are kept and only the newest messages
+        that fit in the context are sent.
+        """
+        history = models.ChatHistory(session=self.session)
+        system_prompts = history.to_chat_representation()
+        used_tokens = TOKENS_PER_REPLY + sum(
+            count_chat_message_tokens(m) for m in system_prompts
+        )
+        history.messages = [self._prompt(str(i)) for i in range(5)]
+        for message in history.messages:
+            message.chat_tokens = 100
+        chat = history.to_chat_representation(
+            reserved_tokens=settings.CHAT_CONTEXT_MAX_TOKENS - used_tokens - 250
+        )
+        self.assertListEqual(chat[: len(system_prompts)], system_prompts)
+        self.assertEqual(len(chat), len(system_prompts) + 2)
+        self.assertTrue(chat[-1]["content"].endswith(": 4"))
+
+    def test_chat_representation_with_summary(self):
+        """
+        Checks that the summary of the session is sent
+        in place of the messages it includes.
+        """
+        messages = [self._prompt(str(i)) for i in range(3)]
+        self.session.session_summary = models.SessionSummary(
+            text="The user counted to one.", summarized_until=messages[1].created_at
+        )
+        history = models.ChatHistory(session=self.session, messages=messages)
+        self.assertListEqual(history.get_unsummarized_messages(), messages[2:])
+        chat = history.to_chat_representation()
+        self.assertIn("The user counted to one.", chat[-2]["content"])
+        self.assertTrue(chat[-1]["content"].endswith(": 2"))
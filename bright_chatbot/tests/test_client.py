@@ -0,0 +1,194 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+from bright_chatbot import models
+from bright_chatbot.backends.history_store import ChatHistoryStore
+from bright_chatbot.benchmarks.fakes import (
+    FakeBackend,
+    FakeOpenAI,
+    FakeProvider,
+    LatencyDistribution,
+)
+from bright_chatbot.client import AsyncOpenAIChatClient, errors
+from bright_chatbot.configs import settings
+from bright_chatbot.utils.deadlines import Deadline
+
+
+@mock.patch.dict(os.environ, {"BRIGHT_CHATBOT_SECRET_KEY": "test"})
+class TestAsyncOpenAIChatClient(unittest.TestCase):
+    def test_concurrent_replies(self):
+        """
+        Checks that a single client replies to the prompts of many users
+        at the same time, each reply completing the chat of its own session
+        and saving its own messages.
+        """
+        latency = LatencyDistribution("uniform", 0.001, 0.01, seed=1)
+        backend = FakeBackend(latency=latency)
+        provider = FakeProvider(latency=latency)
+        openai_lib = FakeOpenAI(chat_latency=latency, moderation_latency=latency)
+        client = AsyncOpenAIChatClient(
+            backend=backend,
+            provider=provider,
+            openai_lib=openai_lib,
+            history_store=ChatHistoryStore(max_bytes=1024 * 1024),
+        )
+        users = [models.User(user_id=str(i)) for i in range(10)]
+        for user in users:
+            session = backend.create_user_session(user)
+            backend.save_message_prompt(
+                models.MessagePrompt(body=f"I am user {user.user_id}", from_user=user),
+                session,
+            )
+
+        async def main():
+            return await asyncio.gather(
+                *(
+                    client.reply(
+                        models.MessagePrompt(
+                            body=f"Hi, user {user.user_id} here", from_user=user
+                        )
+                    )
+                    for user in users
+                )
+            )
+
+        with mock.patch.object(
+            openai_lib.ChatCompletion,
+            "acreate",
+            wraps=openai_lib.ChatCompletion.acreate,
+        ) as acreate:
+            results = asyncio.run(main())
+        self.assertEqual(acreate.call_count, 10)
+        # Each reply returns the report of its own stages:
+        for user, result in zip(users, results):
+            self.assertEqual(result.message_prompt.from_user.user_id, user.user_id)
+            stages = {stage["name"]: stage for stage in result.stages["stages"]}
+            self.assertEqual(stages["reply"]["status"], "done")
+        for call in acreate.call_args_list:
+            chat = " ".join(m["content"] for m in call.kwargs["messages"])
+            user_id = chat.rsplit("Hi, user ", 1)[1].split()[0]
+            self.assertIn(f"I am user {user_id}", chat)
+        self.assertEqual(provider.calls.snapshot()["provider.send_message"], 10)
+        for user in users:
+            session = backend.get_latest_user_session(user)
+            messages = backend.get_session_chat_history(session)
+            self.assertListEqual(
+                [type(message) for message in messages],
+                [models.MessagePrompt, models.MessagePrompt, models.MessageResponse],
+            )
+            self.assertEqual(messages[-1].to_user.user_id, user.user_id)
+
+    def test_image_skipped_near_the_deadline(self):
+        """
+        Checks that an image that can not be generated before the deadline
+        is skipped with a notice, after the text of the reply is sent,
+        without failing the reply nor ending the session.
+        """
+        backend = FakeBackend()
+        provider = FakeProvider()
+        openai_lib = FakeOpenAI(answer="Sure! Dalia(A cat)")
+        client = AsyncOpenAIChatClient(
+            backend=backend, provider=provider, openai_lib=openai_lib
+        )
+        user = models.User(user_id="123")
+        session = backend.create_user_session(user)
+        prompt = models.MessagePrompt(body="Draw a cat", from_user=user)
+        with mock.patch.object(
+            provider, "send_message", wraps=provider.send_message
+        ) as send_message:
+            asyncio.run(client.reply(prompt, deadline=Deadline(10, reserve=0)))
+        bodies = [call.args[0].body for call in send_message.call_args_list]
+        self.assertEqual(len(bodies), 2)
+        self.assertEqual(bodies[1], errors.IMAGE_GENERATION_SKIPPED.message)
+        self.assertEqual(openai_lib.calls.snapshot().get("openai.image", 0), 0)
+        latest = backend.get_latest_user_session(user)
+        self.assertEqual(latest.session_id, session.session_id)
+
+    def test_command_over_the_quota(self):
+        """
+        Checks that a command is not validated before it is answered,
+        but that the error of the validation is still handled once it is.
+        """
+        backend = FakeBackend()
+        provider = FakeProvider()
+        # The validation fails while the command is moderated:
+        openai_lib = FakeOpenAI(
+            moderation_latency=LatencyDistribution("uniform", 0.05, 0.05)
+        )
+        client = AsyncOpenAIChatClient(
+            backend=backend, provider=provider, openai_lib=openai_lib
+        )
+        user = models.User(user_id="123")
+        session = backend.create_user_session(user, sess_quota=1)
+        for body in ("Hi", "How are you?"):
+            backend.save_message_prompt(
+                models.MessagePrompt(body=body, from_user=user), session
+            )
+        prompt = models.MessagePrompt(body="/help", from_user=user)
+        with mock.patch.object(
+            provider, "send_message", wraps=provider.send_message
+        ) as send_message:
+            asyncio.run(client.reply(prompt))
+        bodies = [call.args[0].body for call in send_message.call_args_list]
+        self.assertEqual(bodies[-1], errors.QUOTA_SURPASSED.message)
+        self.assertIsNone(backend.get_latest_user_session(user))
+
+    def test_reply_many_overrides_the_settings_per_prompt(self):
+        """
+        Checks that each prompt of a batch is replied with its own settings,
+        e.g. on the platform the prompt was sent from.
+        """
+        backend = FakeBackend()
+        provider = FakeProvider()
+        client = AsyncOpenAIChatClient(
+            backend=backend, provider=provider, openai_lib=FakeOpenAI()
+        )
+        users = [models.User(user_id=str(i)) for i in range(4)]
+        platforms = ["WhatsApp", "Telegram", "Telegram", "WhatsApp"]
+        for user in users:
+            backend.create_user_session(user)
+        sent_platforms = {}
+
+        def send_message(message):
+            sent_platforms[message.to_user.user_id] = settings.RUNNING_PLATFORM
+
+        with mock.patch.object(provider, "send_message", side_effect=send_message):
+            results = asyncio.run(
+                client.reply_many(
+                    [models.MessagePrompt(body="Hi", from_user=user) for user in users],
+                    overrides=[
+                        {"RUNNING_PLATFORM": platform} for platform in platforms
+                    ],
+                )
+            )
+        self.assertTrue(all(result.succeeded for result in results))
+        self.assertDictEqual(
+            sent_platforms,
+            {user.user_id: platform for user, platform in zip(users, platforms)},
+        )
+
+    def test_streamed_answer(self):
+        """
+        Checks that the user receives the whole answer streamed, even with a
+        Reply directive after the paragraphs already sent, and that its tokens
+        are counted in the usage of the session.
+        """
+        backend = FakeBackend()
+        provider = FakeProvider()
+        answer = "Hello!\n\nReply(Hi)\n\nBye"
+        client = AsyncOpenAIChatClient(
+            backend=backend, provider=provider, openai_lib=FakeOpenAI(answer=answer)
+        )
+        user = models.User(user_id="123")
+        backend.create_user_session(user)
+        prompt = models.MessagePrompt(body="Hi", from_user=user)
+        with mock.patch.object(
+            provider, "send_message", wraps=provider.send_message
+        ) as send_message, settings.override(STREAM_CHAT_COMPLETIONS="true"):
+            asyncio.run(client.reply(prompt))
+        bodies = [call.args[0].body for call in send_message.call_args_list]
+        self.assertEqual("\n\n".join(bodies), answer)
+        usage = backend.get_latest_user_session(user).session_usage
+        self.assertGreater(usage.tokens, 0)
@@ -0,0 +1,34 @@
+import asyncio
+import unittest
+
+from bright_chatbot.utils.deadlines import Deadline, deadline_scope, wait_for
+from bright_chatbot.utils.exceptions import DeadlineExceeded
+
+
+class TestDeadlines(unittest.TestCase):
+    def test_wait_for_keeps_the_reserve(self):
+        """
+        Checks that the regular calls time out before the reserve,
+        which is still available to the error handling.
+        """
+
+        async def run():
+            with deadline_scope(Deadline(0.2, reserve=0.15)):
+                with self.assertRaises(DeadlineExceeded):
+                    await wait_for(asyncio.sleep(0.1))
+                return await wait_for(asyncio.sleep(0.05, "sent"), use_reserve=True)
+
+        self.assertEqual(asyncio.run(run()), "sent")
+
+    def test_deadline_propagates_to_tasks(self):
+        """
+        Checks that the tasks created within the scope see the deadline.
+        """
+
+        async def run():
+            with deadline_scope(Deadline(0.05, reserve=0)):
+                task = asyncio.ensure_future(wait_for(asyncio.sleep(1)))
+            with self.assertRaises(DeadlineExceeded):
+                await task
+
+        asyncio.run(run())
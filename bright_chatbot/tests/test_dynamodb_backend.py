@@ -0,0 +1,108 @@
+import os
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from botocore.exceptions import ClientError
+
+from bright_chatbot import models
+from bright_chatbot.backends import DynamodbBackend
+from bright_chatbot.backends.dynamodb._controller import DynamoTablesController
+from bright_chatbot.backends.dynamodb.tables import SessionsTableController
+from bright_chatbot.utils import get_utc_timestamp_now
+
+
+@mock.patch.dict(os.environ, {"BRIGHT_CHATBOT_SECRET_KEY": "test"})
+class TestSessionsTableController(unittest.TestCase):
+    def setUp(self):
+        self.client = mock.Mock()
+        self.sessions = SessionsTableController(self.client)
+
+    def test_drifted_counters_are_reconciled(self):
+        """
+        Checks that counters adding up to a negative count are corrected
+        with the active sessions of the table, by the bucket they expire in.
+        """
+        bucket_seconds = self.sessions.ACTIVE_SESSIONS_BUCKET_SECONDS
+        bucket_end = (
+            int(get_utc_timestamp_now()) // bucket_seconds + 10
+        ) * bucket_seconds
+        counters = {
+            f"{self.sessions.ACTIVE_SESSIONS_COUNTER_ID}:0": [
+                {
+                    "TimestampCreated": {"N": str(bucket_end)},
+                    "ActiveSessions": {"N": "-1"},
+                }
+            ]
+        }
+
+        def query(**kwargs):
+            counter_id = kwargs["ExpressionAttributeValues"][":counter_id"]["S"]
+            items = counters.get(counter_id, [])
+            return {"Items": items, "Count": len(items)}
+
+        self.client.query.side_effect = query
+        # Two sessions were active before the counters were deployed:
+        self.client.scan.return_value = {
+            "Items": [{"SessionTTL": {"N": str(bucket_end - 1)}}] * 2
+        }
+        self.assertEqual(self.sessions.count_active_sessions(), 2)
+        update = self.client.update_item.call_args.kwargs
+        self.assertEqual(update["Key"]["TimestampCreated"]["N"], str(bucket_end))
+        self.assertEqual(update["ExpressionAttributeValues"][":delta"]["N"], "3")
+
+
+class TestDynamodbBackend(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {"BRIGHT_CHATBOT_SECRET_KEY": "test"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with mock.patch.object(DynamoTablesController, "__init__", return_value=None):
+            self.backend = DynamodbBackend()
+        self.backend.controller.client = mock.Mock()
+        self.backend.controller.sessions = SessionsTableController(
+            self.backend.controller.client
+        )
+        self.backend.controller.chats = mock.Mock()
+        self.backend.controller.chat_messages = mock.Mock()
+        self.user = models.User(user_id="123")
+        self.session = models.UserSession(
+            user=self.user,
+            session_id=f"{self.user.hashed_user_id}:1700000000",
+            session_start=datetime.utcfromtimestamp(1700000000),
+            session_end=datetime.utcfromtimestamp(1700010800),
+        )
+
+    def test_messages_of_a_deleted_session_are_saved(self):
+        """
+        Checks that the usage of a session that no longer exists is not counted,
+        which would recreate it, but that its messages are still saved.
+        """
+        client = self.backend.controller.client
+        client.transact_write_items.side_effect = [
+            ClientError(
+                {
+                    "Error": {"Code": "TransactionCanceledException"},
+                    "CancellationReasons": [
+                        {"Code": "None"},
+                        {"Code": "None"},
+                        {"Code": "ConditionalCheckFailed"},
+                    ],
+                },
+                "TransactWriteItems",
+            ),
+            {},
+        ]
+        self.backend.save_messages(
+            [models.MessagePrompt(body="Hi", from_user=self.user)], self.session
+        )
+        first, second = client.transact_write_items.call_args_list
+        self.assertEqual(len(first.kwargs["TransactItems"]), 3)
+        usage_update = first.kwargs["TransactItems"][-1]["Update"]
+        self.assertEqual(
+            usage_update["ConditionExpression"], "attribute_exists(SessionId)"
+        )
+        self.assertNotIn("SessionTTL", usage_update["UpdateExpression"])
+        self.assertListEqual(
+            second.kwargs["TransactItems"], first.kwargs["TransactItems"][:2]
+        )
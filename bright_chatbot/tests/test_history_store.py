@@ -0,0 +1,91 @@
+import asyncio
+from datetime import timedelta
+import os
+import unittest
+from unittest import mock
+
+from bright_chatbot import models
+from bright_chatbot.backends import InMemoryBackend
+from bright_chatbot.backends.base_backend import AsyncBackendAdapter
+from bright_chatbot.backends.history_store import ChatHistoryStore
+
+
+@mock.patch.dict(os.environ, {"BRIGHT_CHATBOT_SECRET_KEY": "test"})
+class TestChatHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.backend = InMemoryBackend()
+        self.user = models.User(user_id="123")
+
+    def _save_prompt(self, body: str, session: models.UserSession):
+        prompt = models.MessagePrompt(body=body, from_user=self.user)
+        self.backend.save_message_prompt(prompt, session)
+        return prompt
+
+    def test_history_is_brought_up_to_date(self):
+        """
+        Checks that the history is only read once, then the messages saved
+        since are added to it, and that the stored history is not changed
+        by the copies returned.
+        """
+        store = ChatHistoryStore(max_bytes=1024 * 1024)
+        backend = AsyncBackendAdapter(self.backend)
+        session = self.backend.create_user_session(self.user)
+        self._save_prompt("Hi", session)
+        with mock.patch.object(
+            self.backend,
+            "get_session_chat_history",
+            wraps=self.backend.get_session_chat_history,
+        ) as get_history:
+            history = asyncio.run(store.aget_chat_history(backend, session))
+            history.messages.clear()
+            prompt = self._save_prompt("How are you?", session)
+            history = asyncio.run(
+                store.aget_chat_history(backend, session, exclude=prompt)
+            )
+        get_history.assert_called_once()
+        self.assertListEqual([m.body for m in history.messages], ["Hi"])
+        history = asyncio.run(store.aget_chat_history(backend, session))
+        self.assertListEqual([m.body for m in history.messages], ["Hi", "How are you?"])
+
+    def test_least_recently_used_histories_are_dropped(self):
+        """
+        Checks that the store is kept within its size by dropping
+        the histories used least recently.
+        """
+        store = ChatHistoryStore(max_bytes=3 * ChatHistoryStore.MESSAGE_OVERHEAD_BYTES)
+        backend = AsyncBackendAdapter(self.backend)
+        sessions = []
+        for user_id in ("1", "2"):
+            self.user = models.User(user_id=user_id)
+            sessions.append(self.backend.create_user_session(self.user))
+            self._save_prompt("Hi", sessions[-1])
+            self._save_prompt("Hello", sessions[-1])
+            asyncio.run(store.aget_chat_history(backend, sessions[-1]))
+        self.assertEqual(len(store), 1)
+        self.assertLessEqual(store.size, store.max_bytes)
+
+    def test_messages_saved_late_are_read(self):
+        """
+        Checks that a message saved after the last sync is read even if it was
+        created long before the newest message of the history (e.g. a prompt
+        saved by another reply once it was done), and that a history not synced
+        within the overlap is read again in full.
+        """
+        store = ChatHistoryStore(max_bytes=1024 * 1024)
+        backend = AsyncBackendAdapter(self.backend)
+        session = self.backend.create_user_session(self.user)
+        late_prompt = models.MessagePrompt(body="Hi", from_user=self.user)
+        self._save_prompt("How are you?", session)
+        asyncio.run(store.aget_chat_history(backend, session))
+        late_prompt.created_at -= timedelta(seconds=120)
+        self.backend.save_message_prompt(late_prompt, session)
+        history = asyncio.run(store.aget_chat_history(backend, session))
+        self.assertListEqual([m.body for m in history.messages], ["Hi", "How are you?"])
+        store.sync_overlap = timedelta(0)
+        with mock.patch.object(
+            self.backend,
+            "get_session_chat_history",
+            wraps=self.backend.get_session_chat_history,
+        ) as get_history:
+            asyncio.run(store.aget_chat_history(backend, session))
+        get_history.assert_called_once()
@@ -0,0 +1,92 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from bright_chatbot import models
+from bright_chatbot.backends import InMemoryBackend
+
+
+@mock.patch.dict(os.environ, {"BRIGHT_CHATBOT_SECRET_KEY": "test"})
+class TestInMemoryBackend(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime(2023, 1, 1)
+        self.backend = InMemoryBackend(clock=lambda: self.now)
+        self.user = models.User(user_id="123")
+
+    def test_session_lifecycle(self):
+        """
+        Checks that sessions are active until they are ended or expire.
+        """
+        session = self.backend.create_user_session(self.user)
+        self.assertEqual(
+            self.backend.get_latest_user_session(self.user).session_id,
+            session.session_id,
+        )
+        self.assertEqual(self.backend.get_count_of_active_sessions(), 1)
+        self.backend.end_user_session(self.user)
+        self.assertIsNone(self.backend.get_latest_user_session(self.user))
+        self.assertEqual(self.backend.get_count_of_active_sessions(), 0)
+
+        self.backend.create_user_session(models.User(user_id="456"))
+        self.now += timedelta(days=1)
+        self.assertEqual(self.backend.get_count_of_active_sessions(), 0)
+
+    def test_chat_history_is_sorted(self):
+        """
+        Checks that the history is ordered by creation time
+        and that only the prompts are counted.
+        """
+        session = self.backend.create_user_session(self.user)
+        self.assertFalse(self.backend.does_user_exist(self.user))
+        first = models.MessagePrompt(
+            body="Hi", from_user=self.user, created_at=self.now
+        )
+        response = models.MessageResponse(
+            body="Hello!", to_user=self.user, created_at=self.now + timedelta(1)
+        )
+        self.backend.save_message_response(response, session)
+        self.backend.save_message_prompt(first, session)
+        history = self.backend.get_session_chat_history(session)
+        self.assertListEqual([m.body for m in history], ["Hi", "Hello!"])
+        self.assertEqual(self.backend.get_count_of_session_prompts(session), 1)
+        usage = self.backend.get_latest_user_session(self.user).session_usage
+        self.assertEqual(usage.prompts, 1)
+        self.assertTrue(self.backend.does_user_exist(self.user))
+
+    def test_bounded_chat_history(self):
+        """
+        Checks that only the newest messages within the limits are returned.
+        """
+        session = self.backend.create_user_session(self.user)
+        for i, body in enumerate(["Hi", "Hello!", "How are you?", "Fine"]):
+            self.backend.save_message_prompt(
+                models.MessagePrompt(
+                    body=body, from_user=self.user, created_at=self.now + timedelta(i)
+                ),
+                session,
+            )
+        history = self.backend.get_session_chat_history(session, max_messages=3)
+        self.assertListEqual(
+            [m.body for m in history], ["Hello!", "How are you?", "Fine"]
+        )
+        history = self.backend.get_session_chat_history(session, max_characters=16)
+        self.assertListEqual([m.body for m in history], ["How are you?", "Fine"])
+
+    def test_session_summary(self):
+        """
+        Checks that the summary is kept with the session
+        unless a summary of newer messages was saved.
+        """
+        self.backend.create_user_session(self.user)
+        session = self.backend.get_latest_user_session(self.user)
+        self.assertIsNone(session.session_summary)
+        newer = models.SessionSummary(
+            text="Newer", summarized_until=self.now + timedelta(1)
+        )
+        self.backend.save_session_summary(session, newer)
+        self.backend.save_session_summary(
+            session, models.SessionSummary(text="Older", summarized_until=self.now)
+        )
+        session = self.backend.get_latest_user_session(self.user)
+        self.assertEqual(session.session_summary.text, "Newer")
@@ -0,0 +1,51 @@
+import unittest
+
+from bright_chatbot.utils.resources import ResourceRegistry
+
+
+class TestResourceRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = ResourceRegistry()
+        self.built = []
+        self.closed = []
+        self.healthy = True
+
+    def _factory(self, name: str):
+        def build():
+            self.built.append(name)
+            return object()
+
+        return build
+
+    def test_reuses_resources(self):
+        """
+        Checks that a resource is only built once.
+        """
+        self.registry.register("backend", self._factory("backend"))
+        first = self.registry.get("backend")
+        self.assertIs(self.registry.get("backend"), first)
+        self.assertListEqual(self.built, ["backend"])
+
+    def test_rebuilds_unhealthy_resources_and_dependents(self):
+        """
+        Checks that an unhealthy resource is released along with
+        the resources that depend on it, and built again when requested.
+        """
+        self.registry.register(
+            "backend",
+            self._factory("backend"),
+            health_check=lambda _: self.healthy,
+        )
+        self.registry.register(
+            "client",
+            self._factory("client"),
+            close=self.closed.append,
+            depends_on=["backend"],
+        )
+        self.assertDictEqual(self.registry.warmup(), {"backend": True, "client": True})
+        client = self.registry.get("client")
+        self.healthy = False
+        self.assertFalse(self.registry.check("backend"))
+        self.assertListEqual(self.closed, [client])
+        self.assertIsNot(self.registry.get("client"), client)
+        self.assertListEqual(self.built, ["backend", "client", "backend", "client"])
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from bright_chatbot import models
+from bright_chatbot.backends.retry_store import WriteRetryStore
+from bright_chatbot.utils.deadlines import Deadline
+
+
+class RecordingBackend:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.saved = []
+
+    def save_message_prompt(self, prompt, session):
+        if self.fail:
+            raise RuntimeError("Backend not available")
+        self.saved.append((prompt, session))
+
+    def get_session_chat_history_since(self, session, since):
+        return [
+            prompt
+            for prompt, saved_session in self.saved
+            if saved_session.session_id == session.session_id
+            and prompt.created_at > since
+        ]
+
+
+class TestWriteRetryStore(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        user = models.User(user_id="123")
+        self.prompt = models.MessagePrompt(body="Hi", from_user=user)
+        self.session = models.UserSession(
+            user=user,
+            session_id="123:1",
+            session_start=self.prompt.created_at,
+            session_end=self.prompt.created_at,
+        )
+
+    def test_replays_failed_writes(self):
+        """
+        Checks that a stored write is replayed with the same arguments
+        and removed from the store once it succeeds.
+        """
+        store = WriteRetryStore(self.path)
+        store.append("save_message_prompt", self.prompt, self.session, error="Down")
+        self.assertEqual(store.replay(RecordingBackend(fail=True)), (0, 1))
+        self.assertEqual(len(store.pending()), 1)
+        backend = RecordingBackend()
+        self.assertEqual(store.replay(backend), (1, 0))
+        self.assertListEqual(store.pending(), [])
+        prompt, session = backend.saved[0]
+        self.assertEqual(prompt.body, "Hi")
+        self.assertEqual(session.session_id, "123:1")
+
+    def test_replay_is_idempotent(self):
+        """
+        Checks that a write made before it was stored (e.g. one that timed out
+        but kept running) is not made again, that a line left unfinished
+        is skipped, and that the writes left by the deadline are kept.
+        """
+        store = WriteRetryStore(self.path)
+        backend = RecordingBackend()
+        backend.save_message_prompt(self.prompt, self.session)
+        store.append("save_message_prompt", self.prompt, self.session, error="Timeout")
+        with open(self.path, "a") as f:
+            f.write('{"operation": "save_mess')
+        store.append("save_message_prompt", self.prompt, self.session, error="Timeout")
+        self.assertEqual(len(store.pending()), 2)
+        self.assertEqual(store.replay(backend, deadline=Deadline(0, reserve=0)), (0, 0))
+        self.assertEqual(len(store.pending()), 2)
+        self.assertEqual(store.replay(backend), (2, 0))
+        self.assertEqual(len(backend.saved), 1)
+        self.assertListEqual(store.pending(), [])
+
+    def test_writes_are_stored_during_a_replay(self):
+        """
+        Checks that a write that fails while the store is being replayed
+        is stored without waiting for the replay, and kept after it.
+        """
+        store = WriteRetryStore(self.path)
+        store.append("save_message_prompt", self.prompt, self.session, error="Down")
+        backend = RecordingBackend()
+        save_message_prompt = backend.save_message_prompt
+
+        def save_and_fail_another(prompt, session):
+            # The backend is called by the replay, e.g. while another reply fails:
+            appending = threading.Thread(
+                target=store.append,
+                args=("save_message_prompt", self.prompt, self.session),
+            )
+            appending.start()
+            appending.join(timeout=1)
+            self.assertFalse(appending.is_alive())
+            save_message_prompt(prompt, session)
+
+        backend.save_message_prompt = save_and_fail_another
+        self.assertEqual(store.replay(backend), (1, 0))
+        self.assertEqual(len(store.pending()), 1)
@@ -0,0 +1,58 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+from bright_chatbot.configs import Settings
+from bright_chatbot.utils.aio import run_in_executor
+
+
+class TestSettings(unittest.TestCase):
+    def test_settings_are_read_once(self):
+        """
+        Checks that the environment is only read again on reload,
+        and that the overrides are undone after their block.
+        """
+        settings = Settings()
+        with mock.patch.dict(os.environ, {"BRIGHT_CHATBOT_MAX_ACTIVE_SESSIONS": "5"}):
+            self.assertEqual(settings.MAX_ACTIVE_SESSIONS, 5)
+            os.environ["BRIGHT_CHATBOT_MAX_ACTIVE_SESSIONS"] = "6"
+            self.assertEqual(settings.MAX_ACTIVE_SESSIONS, 5)
+            settings.reload()
+            self.assertEqual(settings.MAX_ACTIVE_SESSIONS, 6)
+            with settings.override(MAX_ACTIVE_SESSIONS=7):
+                self.assertEqual(settings.MAX_ACTIVE_SESSIONS, 7)
+            self.assertEqual(settings.MAX_ACTIVE_SESSIONS, 6)
+        with self.assertRaises(AttributeError):
+            settings.snapshot.MAX_ACTIVE_SESSIONS = 8
+        with self.assertRaises(AttributeError):
+            settings.NOT_A_SETTING = 8
+
+    def test_overrides_are_request_scoped(self):
+        """
+        Checks that the settings replaced by concurrent requests are only seen
+        by each of them, including from the functions run in an executor.
+        """
+        settings = Settings()
+
+        async def request(platform: str, welcome_message: str):
+            with settings.override(RUNNING_PLATFORM=platform):
+                await asyncio.sleep(0.01)
+                await run_in_executor(
+                    None, settings.update_request, USER_WELCOME_MESSAGE=welcome_message
+                )
+                await asyncio.sleep(0.01)
+                return settings.RUNNING_PLATFORM, settings.USER_WELCOME_MESSAGE
+
+        async def main():
+            return await asyncio.gather(
+                request("WhatsApp", "Hi!"), request("Telegram", "Hello!")
+            )
+
+        self.assertListEqual(
+            asyncio.run(main()), [("WhatsApp", "Hi!"), ("Telegram", "Hello!")]
+        )
+        self.assertEqual(settings.RUNNING_PLATFORM, "WhatsApp")
+        self.assertNotIn(settings.USER_WELCOME_MESSAGE, ("Hi!", "Hello!"))
+        with self.assertRaises(RuntimeError):
+            settings.update_request(USER_WELCOME_MESSAGE="Hi!")
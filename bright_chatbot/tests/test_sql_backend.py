@@ -0,0 +1,17 @@
+import os
+import tempfile
+import unittest
+
+from bright_chatbot.backends.sql import SqlAlchemyBackend
+from bright_chatbot.tests.backend_contract import BackendContractTests
+
+
+class TestSqlAlchemyBackend(BackendContractTests, unittest.TestCase):
+    def make_backend(self) -> SqlAlchemyBackend:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        backend = SqlAlchemyBackend(
+            "sqlite:///" + os.path.join(tmpdir.name, "chatbot.db")
+        )
+        self.addCleanup(backend.close)
+        return backend
@@ -0,0 +1,15 @@
+import os
+import tempfile
+import unittest
+
+from bright_chatbot.backends import SqliteBackend
+from bright_chatbot.tests.backend_contract import BackendContractTests
+
+
+class TestSqliteBackend(BackendContractTests, unittest.TestCase):
+    def make_backend(self) -> SqliteBackend:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        backend = SqliteBackend(os.path.join(tmpdir.name, "chatbot.db"))
+        self.addCleanup(backend.close)
+        return backend
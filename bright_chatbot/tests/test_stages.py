@@ -0,0 +1,93 @@
+import asyncio
+import unittest
+
+from bright_chatbot.utils.stages import StageGraph
+
+
+class TestStageGraph(unittest.TestCase):
+    @staticmethod
+    def _sleep_stage(delay: float, result=None):
+        async def stage(**kwargs):
+            await asyncio.sleep(delay)
+            return result
+
+        return stage
+
+    def test_independent_stages_run_concurrently(self):
+        """
+        Checks that the stages without dependencies between them
+        overlap and that the critical path follows the slowest chain.
+        """
+
+        async def run():
+            graph = StageGraph()
+            graph.add_stage("a", self._sleep_stage(0.05, "a"))
+            graph.add_stage("b", self._sleep_stage(0.1, "b"))
+            graph.add_stage("c", self._sleep_stage(0.01, "c"), depends_on=["a", "b"])
+            result = await graph.result("c")
+            return result, graph.report()
+
+        result, report = asyncio.run(run())
+        self.assertEqual(result, "c")
+        self.assertListEqual(report.critical_path, ["b", "c"])
+        self.assertLess(report.total_duration, report.stages_duration)
+
+    def test_dependencies_results_are_passed(self):
+        """
+        Checks that a stage receives the results of its dependencies.
+        """
+
+        async def run():
+            graph = StageGraph()
+            graph.add_stage("a", self._sleep_stage(0, 2))
+            graph.add_stage("b", self._sleep_stage(0, 3))
+
+            async def add(a, b):
+                return a + b
+
+            graph.add_stage("sum", add, depends_on=["a", "b"])
+            return await graph.result("sum")
+
+        self.assertEqual(asyncio.run(run()), 5)
+
+    def test_failed_dependency_propagates(self):
+        """
+        Checks that a stage fails with the error of its dependency.
+        """
+
+        async def fail():
+            raise ValueError("failed")
+
+        async def run():
+            graph = StageGraph()
+            graph.add_stage("a", fail)
+            graph.add_stage("b", self._sleep_stage(0), depends_on=["a"])
+            await graph.result("b")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(run())
+
+    def test_failed_tasks(self):
+        """
+        Checks that the stages that already failed are returned,
+        even if no other stage depends on them.
+        """
+
+        async def fail():
+            raise ValueError("failed")
+
+        async def run():
+            graph = StageGraph()
+            graph.add_stage("a", fail)
+            graph.add_stage("b", self._sleep_stage(0.01, "b"))
+            await graph.result("b")
+            return graph.failed_tasks()
+
+        failed = asyncio.run(run())
+        self.assertEqual(len(failed), 1)
+        self.assertIsInstance(failed[0].exception(), ValueError)
+
+    def test_undeclared_dependency(self):
+        graph = StageGraph()
+        with self.assertRaises(ValueError):
+            graph.add_stage("a", self._sleep_stage(0), depends_on=["b"])
@@ -0,0 +1,40 @@
+import unittest
+
+from bright_chatbot.services.streaming import StreamingAnswerBuffer
+
+
+class TestStreamingAnswerBuffer(unittest.TestCase):
+    def _feed_all(self, buffer: StreamingAnswerBuffer, text: str, step: int = 3):
+        flushed = []
+        for i in range(0, len(text), step):
+            flushed += buffer.feed(text[i : i + step])
+        return flushed
+
+    def test_flushes_finished_paragraphs(self):
+        """
+        Checks that only the paragraphs followed by a blank line are flushed.
+        """
+        buffer = StreamingAnswerBuffer()
+        flushed = self._feed_all(buffer, "Hello there.\n\nHow are you?\n\nI am")
+        self.assertListEqual(flushed, ["Hello there.", "How are you?"])
+        self.assertEqual(buffer.get_unsent_body(buffer.text.strip()), "I am")
+
+    def test_holds_image_directive(self):
+        """
+        Checks that nothing is flushed from the paragraph with a Dalia directive on.
+        """
+        buffer = StreamingAnswerBuffer()
+        text = "Sure!\n\nI'll ask Dalia.\nDalia(A cat)\n\nEnjoy it!\n\n"
+        flushed = self._feed_all(buffer, text)
+        self.assertListEqual(flushed, ["Sure!"])
+        self.assertTrue(buffer.held)
+
+    def test_reply_directive_is_not_held(self):
+        """
+        Checks that a Reply directive is flushed as any other paragraph,
+        as it is not parsed from the answers streamed.
+        """
+        buffer = StreamingAnswerBuffer()
+        flushed = self._feed_all(buffer, "Hi!\n\nReply(Hello!)\n\nBye")
+        self.assertListEqual(flushed, ["Hi!", "Reply(Hello!)"])
+        self.assertFalse(buffer.held)
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+from bright_chatbot import models
+from bright_chatbot.backends import InMemoryBackend
+from bright_chatbot.backends.base_backend import AsyncBackendAdapter
+from bright_chatbot.backends.unit_of_work import UnitOfWork
+
+
+@mock.patch.dict(os.environ, {"BRIGHT_CHATBOT_SECRET_KEY": "test"})
+class TestUnitOfWork(unittest.TestCase):
+    def test_history_is_read_once(self):
+        """
+        Checks that concurrent reads of the history share a single read
+        of the backend and that the saved messages are merged into it.
+        """
+        backend = InMemoryBackend()
+        user = models.User(user_id="123")
+        session = backend.create_user_session(user)
+        backend.save_message_prompt(
+            models.MessagePrompt(body="Hi", from_user=user), session
+        )
+        unit_of_work = UnitOfWork(AsyncBackendAdapter(backend))
+
+        async def reply():
+            await unit_of_work.save_message_prompt(
+                models.MessagePrompt(body="How are you?", from_user=user), session
+            )
+            return await asyncio.gather(
+                unit_of_work.get_count_of_session_prompts(session),
+                unit_of_work.get_session_chat_history(session),
+            )
+
+        with mock.patch.object(
+            backend,
+            "get_session_chat_history",
+            wraps=backend.get_session_chat_history,
+        ) as get_history:
+            count, history = asyncio.run(reply())
+        get_history.assert_called_once()
+        self.assertEqual(count, 2)
+        self.assertListEqual([m.body for m in history], ["Hi", "How are you?"])
+
+    def test_buffered_writes(self):
+        """
+        Checks that the buffered messages are only written when they are taken
+        and that they are seen by the reads before that.
+        """
+        backend = InMemoryBackend()
+        user = models.User(user_id="123")
+        session = backend.create_user_session(user)
+        unit_of_work = UnitOfWork(AsyncBackendAdapter(backend), buffer_writes=True)
+
+        async def reply():
+            await unit_of_work.save_message_prompt(
+                models.MessagePrompt(body="Hi", from_user=user), session
+            )
+            await unit_of_work.save_message_response(
+                models.MessageResponse(body="Hello!", to_user=user), session
+            )
+            return await unit_of_work.get_count_of_session_prompts(session)
+
+        self.assertEqual(asyncio.run(reply()), 1)
+        self.assertListEqual(backend.get_session_chat_history(session), [])
+        [(messages, buffered_session)] = unit_of_work.pop_buffered_writes()
+        self.assertListEqual([m.body for m in messages], ["Hi", "Hello!"])
+        self.assertEqual(buffered_session.session_id, session.session_id)
+        self.assertListEqual(unit_of_work.pop_buffered_writes(), [])
+
+    def test_backend_without_history_limits(self):
+        """
+        Checks that a backend whose chat history only takes the session,
+        as before the limits were added, is still read with them.
+        """
+
+        class LegacyBackend(InMemoryBackend):
+            def get_session_chat_history(self, session):
+                return super().get_session_chat_history(session)
+
+        backend = LegacyBackend()
+        user = models.User(user_id="123")
+        session = backend.create_user_session(user)
+        for body in ("Hi", "How are you?"):
+            backend.save_message_prompt(
+                models.MessagePrompt(body=body, from_user=user), session
+            )
+        unit_of_work = UnitOfWork(AsyncBackendAdapter(backend))
+        messages = asyncio.run(
+            unit_of_work.get_session_chat_history(session, max_messages=1)
+        )
+        self.assertListEqual([m.body for m in messages], ["How are you?"])
@@ -0,0 +1,22 @@
+import asyncio
+from concurrent.futures import Executor
+import contextvars
+import functools
+from typing import Any, Awaitable, Callable
+
+
+def run_in_executor(
+    executor: Executor, func: Callable[..., Any], *args: Any, **kwargs: Any
+) -> Awaitable[Any]:
+    """
+    Runs a blocking function in an executor from the running event loop.
+
+    The context variables of the caller are propagated to the executor's thread,
+    so request-scoped values remain visible to the blocking function.
+    If `executor` is None, the default executor of the loop is used.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return loop.run_in_executor(
+        executor, functools.partial(ctx.run, func, *args, **kwargs)
+    )
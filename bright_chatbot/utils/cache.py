@@ -0,0 +1,70 @@
+from collections import OrderedDict
+import threading
+import time
+from typing import Any, Callable, Hashable, Tuple
+
+
+class TTLCache:
+    """
+    Thread-safe cache bounded in size and in the age of its entries.
+
+    Entries older than `ttl` seconds are dropped when they are read,
+    and the least recently used entry is dropped when a new one
+    would make the cache hold more than `maxsize` entries.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def lookup(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Returns whether `key` is cached and its value.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def update(self, key: Hashable, func: Callable[[Any], Any]) -> None:
+        """
+        Replaces the value of `key` by `func(value)`, keeping its expiration,
+        if `key` is cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], func(entry[1]))
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
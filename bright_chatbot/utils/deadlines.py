@@ -0,0 +1,114 @@
+import asyncio
+import contextlib
+import contextvars
+import time
+from typing import Any, Awaitable, Iterator, Union
+
+from bright_chatbot.configs import settings
+from bright_chatbot.utils.exceptions import DeadlineExceeded
+from bright_chatbot.utils.metrics import metrics
+
+
+class Deadline:
+    """
+    Point in time by which a request must be done.
+
+    The last `reserve` seconds before the deadline are kept for handling
+    the errors (e.g. notifying the user), so the regular work of the request
+    only has the `available` time. If not given, the reserve defaults to
+    `settings.DEADLINE_RESERVE_SECONDS`.
+    """
+
+    def __init__(self, timeout: float, reserve: float = None):
+        self._expires_at = time.monotonic() + timeout
+        if reserve is None:
+            reserve = settings.DEADLINE_RESERVE_SECONDS
+        self._reserve = reserve
+
+    @classmethod
+    def from_lambda_context(cls, context: Any, reserve: float = None) -> "Deadline":
+        """
+        Builds the deadline of an AWS Lambda invocation from its context object.
+        """
+        return cls(context.get_remaining_time_in_millis() / 1000, reserve=reserve)
+
+    @property
+    def reserve(self) -> float:
+        return self._reserve
+
+    @property
+    def remaining(self) -> float:
+        """
+        Seconds left until the deadline, including the reserve.
+        """
+        return max(self._expires_at - time.monotonic(), 0.0)
+
+    @property
+    def available(self) -> float:
+        """
+        Seconds left for the regular work of the request.
+        """
+        return max(self.remaining - self.reserve, 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.available <= 0
+
+    def can_finish(self, duration: float) -> bool:
+        """
+        Whether a step expected to take `duration` seconds
+        can finish before the reserve is reached.
+        """
+        return self.available >= duration
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining:.3f}s, reserve={self.reserve}s)"
+
+
+_current_deadline: contextvars.ContextVar[Union[Deadline, None]] = (
+    contextvars.ContextVar("bright_chatbot_deadline", default=None)
+)
+
+
+def get_deadline() -> Union[Deadline, None]:
+    """
+    Returns the deadline of the current request, None if it has no deadline.
+    """
+    return _current_deadline.get()
+
+
+@contextlib.contextmanager
+def deadline_scope(deadline: Union[Deadline, None]) -> Iterator[None]:
+    """
+    Sets the deadline of the current request within the context manager.
+
+    The deadline is stored in a context variable, so it is also visible to the
+    tasks created within the scope and to the blocking calls run with
+    `bright_chatbot.utils.aio.run_in_executor`.
+    """
+    token = _current_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+
+async def wait_for(awaitable: Awaitable[Any], use_reserve: bool = False) -> Any:
+    """
+    Awaits an awaitable with the time left by the deadline of the current request
+    as timeout, raising `DeadlineExceeded` if it does not finish in time.
+
+    Only the error handling should `use_reserve`. Without a deadline,
+    the awaitable is awaited without timeout.
+    """
+    deadline = get_deadline()
+    if deadline is None:
+        return await awaitable
+    timeout = deadline.remaining if use_reserve else deadline.available
+    try:
+        return await asyncio.wait_for(awaitable, timeout=timeout)
+    except asyncio.TimeoutError as e:
+        metrics.increment("deadlines.exceeded")
+        raise DeadlineExceeded(
+            f"Could not finish within the deadline of the request ({deadline})"
+        ) from e
@@ -74,3 +74,12 @@ class AuthError(ApplicationError):
     """
 
     pass
+
+
+class DeadlineExceeded(ApplicationError):
+    """
+    Error raised when a step of a request can not finish
+    before the deadline of the request.
+    """
+
+    pass
@@ -0,0 +1,43 @@
+from collections import defaultdict
+import threading
+from typing import Dict, Union
+
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of counters of the running process.
+
+    Counters are identified by a dotted name, e.g. `speculative_completions.wasted`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Union[int, float]] = defaultdict(int)
+
+    def increment(self, name: str, value: Union[int, float] = 1) -> None:
+        """
+        Increments the counter `name` by `value`.
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def get(self, name: str) -> Union[int, float]:
+        """
+        Returns the current value of the counter `name`.
+        """
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self, prefix: str = "") -> Dict[str, Union[int, float]]:
+        """
+        Returns a copy of the counters whose name starts with `prefix`.
+        """
+        with self._lock:
+            return {k: v for k, v in self._counters.items() if k.startswith(prefix)}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+
+
+metrics = MetricsRegistry()
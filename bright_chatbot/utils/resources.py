@@ -0,0 +1,212 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Union
+
+from bright_chatbot.utils.metrics import metrics
+
+
+class Resource:
+    """
+    A long lived object of the process (e.g. a client and its connection pool)
+    and the functions to build it, check its health and release it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        health_check: Union[Callable[[Any], bool], None] = None,
+        close: Union[Callable[[Any], None], None] = None,
+        depends_on: Iterable[str] = (),
+        check_interval: Union[float, None] = None,
+    ):
+        self.name = name
+        self.factory = factory
+        self.health_check = health_check
+        self.close = close
+        self.depends_on = tuple(depends_on)
+        self.check_interval = check_interval
+        self.instance: Any = None
+        self.created_at: Union[float, None] = None
+        self.checked_at: Union[float, None] = None
+
+    @property
+    def created(self) -> bool:
+        return self.created_at is not None
+
+    @property
+    def check_due(self) -> bool:
+        """
+        Whether the health of the resource has to be checked before reusing it.
+        """
+        if self.health_check is None or self.check_interval is None:
+            return False
+        last_check = self.checked_at or self.created_at
+        return time.monotonic() - last_check >= self.check_interval
+
+
+class ResourceRegistry:
+    """
+    Thread-safe registry of the resources of the running process.
+
+    Resources are built lazily the first time they are requested and reused
+    afterwards, e.g. across the invocations served by a warm Lambda container.
+    A resource that fails its health check, or that is invalidated after an error,
+    is released and built again the next time it is requested, along with the
+    resources that depend on it.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._resources: Dict[str, Resource] = {}
+        self._logger = logging.getLogger(f"{__package__}.{self.__class__.__name__}")
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        health_check: Union[Callable[[Any], bool], None] = None,
+        close: Union[Callable[[Any], None], None] = None,
+        depends_on: Iterable[str] = (),
+        check_interval: Union[float, None] = None,
+    ) -> None:
+        """
+        Declares how to build a resource.
+
+        :param factory: Function without arguments that builds the resource.
+        :param health_check: Function that receives the resource and returns
+            whether it can still be used. It may also raise an exception.
+        :param close: Function that receives the resource and releases it.
+        :param depends_on: Names of the resources used by the factory,
+            the resource is built again when any of them is invalidated.
+        :param check_interval: Seconds after which the health of the resource
+            is checked again before reusing it. If None, it is only checked
+            during the warmup or when calling `check`.
+        """
+        with self._lock:
+            if name in self._resources:
+                self.invalidate(name)
+            for dependency in depends_on:
+                if dependency not in self._resources:
+                    raise ValueError(
+                        f"Dependency '{dependency}' of resource '{name}' must be registered before it"
+                    )
+            self._resources[name] = Resource(
+                name, factory, health_check, close, depends_on, check_interval
+            )
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._resources
+
+    def get(self, name: str) -> Any:
+        """
+        Returns the resource, building it if it does not exist yet or
+        if it failed its periodic health check.
+        """
+        with self._lock:
+            resource = self._get_resource(name)
+            if resource.created and resource.check_due:
+                self.check(name)
+            if not resource.created:
+                return self._create(resource)
+            metrics.increment(f"resources.{name}.reused")
+            return resource.instance
+
+    def is_created(self, name: str) -> bool:
+        with self._lock:
+            return self._get_resource(name).created
+
+    def check(self, name: str) -> bool:
+        """
+        Runs the health check of a resource that was already built.
+        An unhealthy resource is invalidated, so it will be built again.
+        """
+        with self._lock:
+            resource = self._get_resource(name)
+            if not resource.created or resource.health_check is None:
+                return resource.created
+            try:
+                healthy = bool(resource.health_check(resource.instance))
+            except Exception:
+                self._logger.exception(f"Health check of resource '{name}' failed")
+                healthy = False
+            resource.checked_at = time.monotonic()
+            if not healthy:
+                self._logger.warning(f"Resource '{name}' is unhealthy, releasing it")
+                metrics.increment(f"resources.{name}.unhealthy")
+                self.invalidate(name)
+            return healthy
+
+    def invalidate(self, name: str) -> None:
+        """
+        Releases a resource and the resources that depend on it,
+        they will be built again the next time they are requested.
+        """
+        with self._lock:
+            for dependent in self._dependents(name):
+                self.invalidate(dependent)
+            resource = self._get_resource(name)
+            if not resource.created:
+                return
+            if resource.close is not None:
+                try:
+                    resource.close(resource.instance)
+                except Exception:
+                    self._logger.exception(f"Error when releasing resource '{name}'")
+            resource.instance = None
+            resource.created_at = None
+            resource.checked_at = None
+
+    def warmup(self, names: Iterable[str] = None) -> Dict[str, bool]:
+        """
+        Builds the resources (all of them by default) and checks their health,
+        e.g. during the init phase of a Lambda function so the first invocation
+        does not pay for the imports and the connections.
+
+        Returns whether each resource is healthy. Errors are logged instead of
+        raised, the failed resources are built again when requested.
+        """
+        health = {}
+        for name in names or list(self._resources):
+            try:
+                self.get(name)
+                health[name] = self.check(name)
+            except Exception:
+                self._logger.exception(f"Could not warm up resource '{name}'")
+                health[name] = False
+        return health
+
+    def clear(self) -> None:
+        """
+        Releases all the resources and forgets how to build them.
+        """
+        with self._lock:
+            for name in list(self._resources):
+                self.invalidate(name)
+            self._resources.clear()
+
+    def _get_resource(self, name: str) -> Resource:
+        try:
+            return self._resources[name]
+        except KeyError:
+            raise KeyError(f"Resource '{name}' is not registered") from None
+
+    def _dependents(self, name: str) -> List[str]:
+        return [r.name for r in self._resources.values() if name in r.depends_on]
+
+    def _create(self, resource: Resource) -> Any:
+        for dependency in resource.depends_on:
+            self.get(dependency)
+        start = time.perf_counter()
+        resource.instance = resource.factory()
+        resource.created_at = time.monotonic()
+        metrics.increment(f"resources.{resource.name}.created")
+        self._logger.debug(
+            f"Built resource '{resource.name}' in "
+            f"{(time.perf_counter() - start) * 1000:.0f}ms"
+        )
+        return resource.instance
+
+
+resources = ResourceRegistry()
@@ -0,0 +1,287 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Union
+
+
+class Stage:
+    """
+    A named step of a `StageGraph`.
+
+    The stage function is called with the results of its dependencies as
+    keyword arguments (named after the dependencies) and must return an awaitable.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Awaitable[Any]],
+        depends_on: Iterable[str] = (),
+    ):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.task: Union[asyncio.Task, None] = None
+        self.started_at: Union[float, None] = None
+        self.finished_at: Union[float, None] = None
+
+    @property
+    def duration(self) -> Union[float, None]:
+        """
+        Time in seconds that the stage function took to run,
+        not counting the time spent waiting for its dependencies.
+        """
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    @property
+    def status(self) -> str:
+        if self.task is None or not self.task.done():
+            return "pending" if self.started_at is None else "running"
+        if self.task.cancelled():
+            return "cancelled"
+        if self.task.exception() is not None:
+            return "failed"
+        return "done"
+
+
+class StageTiming:
+    """
+    Timing of a stage relative to the start of the graph, in seconds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        status: str,
+        start: Union[float, None],
+        end: Union[float, None],
+        depends_on: Iterable[str] = (),
+    ):
+        self.name = name
+        self.status = status
+        self.start = start
+        self.end = end
+        self.depends_on = tuple(depends_on)
+
+    @property
+    def duration(self) -> Union[float, None]:
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "status": self.status,
+            "start": self.start,
+            "end": self.end,
+            "duration": self.duration,
+            "depends_on": list(self.depends_on),
+        }
+
+
+class StageReport:
+    """
+    Timings of the stages of a `StageGraph` and its critical path:
+    the chain of stages that determined when the last stage finished.
+    """
+
+    def __init__(self, timings: List[StageTiming], critical_path: List[str]):
+        self.timings = timings
+        self.critical_path = critical_path
+
+    @property
+    def total_duration(self) -> float:
+        """
+        Time from the start of the graph until the last stage finished.
+        """
+        ends = [t.end for t in self.timings if t.end is not None]
+        return max(ends) if ends else 0.0
+
+    @property
+    def stages_duration(self) -> float:
+        """
+        Sum of the durations of all the stages, i.e. the time
+        it would have taken to run them one after the other.
+        """
+        return sum(t.duration for t in self.timings if t.duration is not None)
+
+    def get(self, name: str) -> Union[StageTiming, None]:
+        for timing in self.timings:
+            if timing.name == name:
+                return timing
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_duration": self.total_duration,
+            "stages_duration": self.stages_duration,
+            "critical_path": list(self.critical_path),
+            "stages": [t.to_dict() for t in self.timings],
+        }
+
+    def format(self) -> str:
+        """
+        Human readable representation of the critical path.
+        """
+        path = " -> ".join(
+            f"{name} ({self.get(name).duration * 1000:.0f}ms)"
+            for name in self.critical_path
+            if self.get(name).duration is not None
+        )
+        return (
+            f"Critical path: {path or 'empty'}. "
+            f"Total: {self.total_duration * 1000:.0f}ms, "
+            f"sum of stages: {self.stages_duration * 1000:.0f}ms"
+        )
+
+
+class StageGraph:
+    """
+    Runs a set of asynchronous stages concurrently, where every stage starts
+    as soon as all of its dependencies have finished.
+
+    Dependencies must be declared before the stages that depend on them, which
+    guarantees that the graph has no cycles. If a dependency fails, the stages
+    that depend on it fail with the same exception.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Stage] = {}
+        self._started_at: Union[float, None] = None
+
+    @property
+    def started(self) -> bool:
+        return self._started_at is not None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._stages
+
+    def get_stage(self, name: str) -> Union[Stage, None]:
+        """
+        Returns the stage with the given name, None if it was not declared.
+        """
+        return self._stages.get(name)
+
+    def add_stage(
+        self,
+        name: str,
+        func: Callable[..., Awaitable[Any]],
+        depends_on: Iterable[str] = (),
+    ) -> Stage:
+        """
+        Declares a new stage in the graph.
+        """
+        if self.started:
+            raise RuntimeError("Can not add stages to a graph that already started")
+        if name in self._stages:
+            raise ValueError(f"Stage '{name}' is already declared")
+        for dependency in depends_on:
+            if dependency not in self._stages:
+                raise ValueError(
+                    f"Dependency '{dependency}' of stage '{name}' must be declared before it"
+                )
+        stage = Stage(name, func, depends_on)
+        self._stages[name] = stage
+        return stage
+
+    def start(self) -> None:
+        """
+        Schedules all the stages in the running event loop.
+        """
+        if self.started:
+            return
+        self._started_at = time.perf_counter()
+        for stage in self._stages.values():
+            stage.task = asyncio.ensure_future(self._run_stage(stage))
+            stage.task.add_done_callback(self._retrieve_exception)
+
+    async def result(self, name: str) -> Any:
+        """
+        Waits for a stage to finish and returns its result.
+        Starts the graph if it was not started yet.
+        """
+        self.start()
+        return await self._stages[name].task
+
+    def cancel(self) -> None:
+        """
+        Cancels the stages that have not finished yet.
+        """
+        for task in self.pending_tasks():
+            task.cancel()
+
+    def pending_tasks(self) -> List[asyncio.Task]:
+        """
+        Returns the tasks of the stages that have not finished yet.
+        """
+        return [
+            stage.task
+            for stage in self._stages.values()
+            if stage.task is not None and not stage.task.done()
+        ]
+
+    def failed_tasks(self) -> List[asyncio.Task]:
+        """
+        Returns the tasks of the stages that finished with an error.
+        """
+        return [
+            stage.task
+            for stage in self._stages.values()
+            if stage.task is not None and stage.status == "failed"
+        ]
+
+    def report(self) -> StageReport:
+        """
+        Returns the timings of the stages and the critical path of the graph.
+        """
+        timings = []
+        for stage in self._stages.values():
+            timings.append(
+                StageTiming(
+                    name=stage.name,
+                    status=stage.status,
+                    start=self._offset(stage.started_at),
+                    end=self._offset(stage.finished_at),
+                    depends_on=stage.depends_on,
+                )
+            )
+        return StageReport(timings, self._critical_path())
+
+    async def _run_stage(self, stage: Stage) -> Any:
+        kwargs = {}
+        for dependency in stage.depends_on:
+            kwargs[dependency] = await self._stages[dependency].task
+        stage.started_at = time.perf_counter()
+        try:
+            return await stage.func(**kwargs)
+        finally:
+            stage.finished_at = time.perf_counter()
+
+    def _critical_path(self) -> List[str]:
+        finished = [s for s in self._stages.values() if s.finished_at is not None]
+        if not finished:
+            return []
+        stage = max(finished, key=lambda s: s.finished_at)
+        path = [stage.name]
+        while stage.depends_on:
+            # The dependency that finished last is the one the stage waited for:
+            stage = max(
+                (self._stages[name] for name in stage.depends_on),
+                key=lambda s: s.finished_at or 0.0,
+            )
+            path.insert(0, stage.name)
+        return path
+
+    def _offset(self, timestamp: Union[float, None]) -> Union[float, None]:
+        if timestamp is None or self._started_at is None:
+            return None
+        return timestamp - self._started_at
+
+    @staticmethod
+    def _retrieve_exception(task: asyncio.Task) -> None:
+        # Errors are re-raised to whoever awaits the stage,
+        # mark them as retrieved to avoid warnings for the stages nobody awaited.
+        if not task.cancelled():
+            task.exception()
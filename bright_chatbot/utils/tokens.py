@@ -0,0 +1,51 @@
+import functools
+import math
+from typing import Dict
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+CHAT_MODEL = "gpt-3.5-turbo"
+# Tokens added by the chat format to every message, and to prime the reply:
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+# Estimate used if tiktoken is not installed, on the safe side for non english text:
+CHARACTERS_PER_TOKEN = 3
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+@functools.lru_cache(maxsize=4096)
+def count_tokens(text: str, model: str = CHAT_MODEL) -> int:
+    """
+    Returns the number of tokens of a text for the model given.
+
+    The tokens are counted with tiktoken if it is installed,
+    otherwise they are estimated from the length of the text.
+    The counts of the latest texts are cached, e.g. the system prompts.
+    """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / CHARACTERS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+
+def count_chat_message_tokens(message: Dict[str, str], model: str = CHAT_MODEL) -> int:
+    """
+    Returns the number of tokens taken by a message of a chat completion,
+    e.g. `{"role": "user", "content": "Hi"}`.
+    """
+    return TOKENS_PER_MESSAGE + sum(
+        count_tokens(value, model) for value in message.values()
+    )
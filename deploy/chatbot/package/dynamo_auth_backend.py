@@ -44,7 +44,8 @@ class DynamoSessionAuthBackend(DynamodbBackend):
         session_obj = self.controller.sessions.record_user_session(
             user.hashed_user_id,
             messages_quota=session_quota,
-            session_config=session_config.dict(),
+            # The welcome message is only sent along with the session created:
+            session_config=session_config.dict(exclude={"welcome_message"}),
         )
         session_id = session_obj["SessionId"]["S"]
         user_session = UserSession(
@@ -54,6 +55,9 @@ class DynamoSessionAuthBackend(DynamodbBackend):
             session_end=session_obj["SessionTTL"]["N"],
             session_quota=session_quota if not user.is_admin else 10e6,
             session_config=session_config,
+            # Counted on the session item, so the quotas are not checked by
+            # reading the messages of the session:
+            session_usage=self._parse_session_usage(session_obj),
         )
         return user_session
 
@@ -81,8 +85,6 @@ class DynamoSessionAuthBackend(DynamodbBackend):
             "- Our Privacy Policy: https://brightbot.chat/privacy\n"
             "- Our Terms and Conditions: https://brightbot.chat/cookies#Terms%20and%20Conditions.\n"
         )
-        # Set the user welcome message:
-        settings.USER_WELCOME_MESSAGE = plan.get_welcome_message(referral_link)
         # Create the user's session config:
         session_config = UserSessionConfig(
             max_image_requests=(
@@ -94,6 +96,7 @@ class DynamoSessionAuthBackend(DynamodbBackend):
             extra_content_system_prompt=extra_content_system_prompt,
             user_referral_link=referral_link,
             user_plan=plan.name,
+            welcome_message=plan.get_welcome_message(referral_link),
         )
         logging.getLogger("bright_chatbot").debug(
             f"Set user session config to '{session_config.dict()}'"
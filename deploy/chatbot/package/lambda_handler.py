@@ -1,7 +1,7 @@
 import json
 import logging
 import os
-from typing import Any, Dict
+from typing import Any, Dict, List, Union
 
 import sentry_sdk
 
@@ -9,9 +9,13 @@ sentry_sdk.init(traces_sample_rate=1.0, enable_tracing=True)
 
 from dynamo_auth_backend import DynamoSessionAuthBackend
 
+from bright_chatbot.backends import CachingBackend
 from bright_chatbot.client import OpenAIChatClient
+from bright_chatbot.configs import settings
 from bright_chatbot.models import MessagePrompt, User
 from bright_chatbot.providers.ws_business.provider import WhatsAppBusinessProvider
+from bright_chatbot.utils.deadlines import Deadline
+from bright_chatbot.utils.resources import resources
 
 
 xray_recorder = None
@@ -30,32 +34,38 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     Handler that receives a callback from twillio
     containing a message sent by the user and responds
     to it with a response generated by an OpenAI model.
+
+    It also accepts a batch of messages from an SQS event source,
+    in which case the failed messages are reported as `batchItemFailures`.
     """
     logger = init_logger()
     if logger.level < 30:
         print(f"Received event:\n{json.dumps(event)}")
+    # Bound the reply by the time left before the Lambda times out:
+    deadline = Deadline.from_lambda_context(context)
+    replay_failed_writes(deadline)
+    if "Records" in event:
+        return handle_messages_batch(event["Records"], deadline=deadline)
     # Parse event:
     body = json.loads(event["body"])
-    # Set the Running Platform:
-    os.environ["BRIGHT_CHATBOT_RUNNING_PLATFORM"] = body.get("platform", "WhatsApp")
-    # Initiate provider and backend:
-    provider = WhatsAppBusinessProvider()
-    backend = DynamoSessionAuthBackend()
-    # Initiate client
-    client = OpenAIChatClient(provider=provider, backend=backend)
+    # Get the client built by a previous invocation of the container:
+    client = resources.get("client")
     # Create User message prompt:
-    user = User(user_id=body["sender"])
-    message_prompt = MessagePrompt(
-        body=body["message"],
-        from_user=user,
-    )
+    message_prompt = parse_message_prompt(body)
+    user = message_prompt.from_user
     # Record the User Id with X-ray using a new subsegment
     if xray_recorder:
         subsegment = xray_recorder.begin_subsegment("bright_chatbot")
         subsegment.put_annotation("user_id", user.hashed_user_id)
     # Record the User Id with Sentry:
     sentry_sdk.set_user({"id": user.hashed_user_id})
-    client.reply(message_prompt)
+    try:
+        # Set the Running Platform:
+        with settings.override(RUNNING_PLATFORM=body.get("platform", "WhatsApp")):
+            client.reply(message_prompt, deadline=deadline)
+    except Exception:
+        check_resources()
+        raise
     return {
         "isBase64Encoded": False,
         "statusCode": 200,
@@ -66,8 +76,137 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     }
 
 
+def handle_messages_batch(
+    records: List[Dict[str, Any]], deadline: Deadline = None
+) -> Dict[str, Any]:
+    """
+    Replies to a batch of SQS records in a single invocation.
+
+    The messages of different users are replied concurrently and the ones
+    that failed are returned so only those are retried by SQS.
+    """
+    bodies = [json.loads(record["body"]) for record in records]
+    client = resources.get("client")
+    results = client.reply_many(
+        [parse_message_prompt(body) for body in bodies],
+        deadline=deadline,
+        # Each message is replied on the platform it was sent from:
+        overrides=[
+            {"RUNNING_PLATFORM": body.get("platform", "WhatsApp")} for body in bodies
+        ],
+    )
+    if not all(result.succeeded for result in results):
+        check_resources()
+    return {
+        "batchItemFailures": [
+            {"itemIdentifier": record["messageId"]}
+            for record, result in zip(records, results)
+            if not result.succeeded
+        ]
+    }
+
+
+def init_client() -> OpenAIChatClient:
+    return OpenAIChatClient(
+        provider=resources.get("provider"), backend=resources.get("backend")
+    )
+
+
+def init_backend() -> Union[DynamoSessionAuthBackend, CachingBackend]:
+    backend = DynamoSessionAuthBackend()
+    if settings.BACKEND_CACHE_ENABLED:
+        # Warm invocations serve the sessions and histories they read from memory:
+        return CachingBackend(backend)
+    return backend
+
+
+def register_resources() -> None:
+    """
+    Declares the objects that are built once per container and reused
+    by its warm invocations, along with their connection pools.
+    """
+    resources.register(
+        "provider", WhatsAppBusinessProvider, health_check=check_provider
+    )
+    resources.register("backend", init_backend, health_check=check_backend)
+    resources.register(
+        "client",
+        init_client,
+        close=lambda client: client.close(),
+        depends_on=["provider", "backend"],
+    )
+
+
+def check_provider(provider: WhatsAppBusinessProvider) -> bool:
+    # Opens the connection to the WhatsApp Business API:
+    provider.client.connect()
+    return True
+
+
+def check_backend(backend: Union[DynamoSessionAuthBackend, CachingBackend]) -> bool:
+    if isinstance(backend, CachingBackend):
+        backend = backend.backend
+    # Opens the connection to DynamoDB and checks that the tables are reachable:
+    controller = backend.controller
+    response = controller.client.describe_table(
+        TableName=controller.sessions.table_name
+    )
+    return response["Table"]["TableStatus"] == "ACTIVE"
+
+
+def replay_failed_writes(deadline: Deadline) -> None:
+    """
+    Retries the writes to the backend that failed in
+    the previous invocations of the container, if any.
+
+    The replay only takes up to `settings.WRITE_RETRY_REPLAY_SECONDS` of the
+    invocation, the writes left are retried by the next ones, and its errors
+    do not fail the reply.
+    """
+    logger = logging.getLogger("bright_chatbot")
+    try:
+        retry_store = resources.get("client").async_client.retry_store
+        if retry_store is None or not retry_store.pending():
+            return
+        replay_deadline = Deadline(
+            min(settings.WRITE_RETRY_REPLAY_SECONDS, deadline.available), reserve=0
+        )
+        replayed, failed = retry_store.replay(
+            resources.get("backend"), deadline=replay_deadline
+        )
+    except Exception:
+        logger.exception("The replay of the failed writes failed")
+        return
+    logger.warning(f"Replayed {replayed} failed writes, {failed} failed again")
+
+
+def check_resources() -> None:
+    """
+    Checks the health of the backend and the provider after a failure,
+    the unhealthy ones are built again by the next invocation.
+    """
+    for name in ["provider", "backend"]:
+        if resources.is_created(name):
+            resources.check(name)
+
+
+def parse_message_prompt(body: Dict[str, Any]) -> MessagePrompt:
+    user = User(user_id=body["sender"])
+    return MessagePrompt(
+        body=body["message"],
+        from_user=user,
+    )
+
+
 def init_logger() -> logging.Logger:
     logging.basicConfig()
     logger = logging.getLogger("bright_chatbot")
     logger.setLevel(os.environ.get("LAMBDA_LOG_LEVEL", "WARNING"))
     return logger
+
+
+register_resources()
+# Build the resources during the init phase of the container,
+# so the first invocation does not pay for them:
+if os.environ.get("LAMBDA_WARMUP_RESOURCES", "true").lower() == "true":
+    resources.warmup()
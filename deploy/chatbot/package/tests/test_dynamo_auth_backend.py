@@ -0,0 +1,57 @@
+import os
+import unittest
+from unittest import mock
+
+from bright_chatbot.models import User
+from bright_chatbot.backends.dynamodb._controller import DynamoTablesController
+
+from dynamo_auth_backend import DynamoSessionAuthBackend
+import subscription_plans as BrightBotPlans
+
+
+class TestDynamoSessionAuthBackend(unittest.TestCase):
+    def setUp(self):
+        environ = {"STRIPE_API_KEY": "test", "BRIGHT_CHATBOT_SECRET_KEY": "test"}
+        patcher = mock.patch.dict(os.environ, environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with mock.patch.object(DynamoTablesController, "__init__", return_value=None):
+            self.backend = DynamoSessionAuthBackend()
+        self.backend._controller = mock.Mock()
+        self.user = User(user_id="whatsapp:+123")
+
+    def test_created_session(self):
+        """
+        Checks that the session created for the plan of the user holds
+        the usage counted on its item, so the quotas are checked without
+        reading the messages of the session, and the welcome message of the plan,
+        without the settings of a reply being replaced.
+        """
+        self.backend.controller.sessions.record_user_session.return_value = {
+            "SessionId": {"S": "abc:1"},
+            "TimestampCreated": {"N": "1700000000"},
+            "SessionTTL": {"N": "1700010800"},
+            "UsageCounted": {"BOOL": True},
+            "PromptsCount": {"N": "0"},
+            "ImagesCount": {"N": "0"},
+            "TokensCount": {"N": "0"},
+        }
+        with mock.patch.object(
+            self.backend,
+            "_get_user_subscription_plan",
+            return_value=BrightBotPlans.BasicPlan,
+        ), mock.patch.object(
+            self.backend, "_get_user_conversation", return_value=[]
+        ), mock.patch.object(
+            self.backend, "_get_user_referral_link", return_value="https://wa.me/1"
+        ):
+            session = self.backend.create_user_session(self.user)
+        self.assertIsNotNone(session.session_usage)
+        self.assertEqual(session.session_usage.prompts, 0)
+        self.assertEqual(session.session_quota, BrightBotPlans.BasicPlan.messages_quota)
+        self.assertEqual(
+            session.session_config.welcome_message,
+            BrightBotPlans.BasicPlan.get_welcome_message("https://wa.me/1"),
+        )
+        session_config = self.backend.controller.sessions.record_user_session.call_args
+        self.assertNotIn("welcome_message", session_config.kwargs["session_config"])
@@ -13,6 +13,7 @@ def read_requirements(dirname=PACKAGE_DIRNAME):
 
 backends = {
     "dynamodb": "backends/dynamodb",
+    "sql": "backends/sql",
 }
 
 providers = {